@@ -3,31 +3,140 @@ AI Dino Arena - WebSocket集成模块
 用于将Python AI训练模块与Node.js后端集成
 """
 
+import argparse
 import asyncio
 import websockets
 import json
-import threading
-import time
+import multiprocessing
+import queue
 from dino_ai_trainer import DinoTrainer
+from broadcast import BroadcastHub
+from inference import InferenceBatcher, RequestPipeline
+from model_registry import ModelRegistry
+import wire_format
+from profiling import PhaseProfiler
+
+def run_training_process(episodes, progress_queue, stop_event, model_path, agent_type='q_table',
+                         telemetry_log=None, profile=False):
+    """训练进程入口：运行训练循环，通过progress_queue向服务器上报进度"""
+    trainer = DinoTrainer(agent_type=agent_type, telemetry_log=telemetry_log)
+    trainer.model_path = model_path
+    trainer.load_model()
+    
+    # 启用剖析时统计训练循环各阶段耗时，随进度一起上报
+    profiler = PhaseProfiler().instrument_trainer(trainer) if profile else None
+    
+    # 检查点写入磁盘后通知服务器重新加载推理模型
+    trainer.on_checkpoint_saved = lambda episode: progress_queue.put(('checkpoint', episode))
+    
+    def progress():
+        trainer.telemetry.update_rates()
+        return {
+            'training_stats': dict(trainer.training_stats),
+            'epsilon': trainer.agent.epsilon,
+            'telemetry': trainer.telemetry.summary(),
+            'profile': profiler.summary() if profiler is not None else None
+        }
+    
+    try:
+        # 逐回合调用训练器的回合循环，回合之间上报状态和保存检查点
+        for episode in range(episodes):
+            if stop_event.is_set():
+                break
+            
+            # 运行一个训练回合（长回合中也及时响应停止请求）
+            total_reward, steps = trainer.run_episode(should_stop=stop_event.is_set)
+            
+            # 更新统计信息（分数不含课程训练的起始分数）
+            score = trainer.episode_score()
+            trainer.agent.episode_rewards.append(total_reward)
+            trainer.agent.episode_scores.append(score)
+            trainer.telemetry.record_episode(score, total_reward, steps,
+                                             epsilon=trainer.agent.epsilon)
+            trainer.training_stats['episode'] = episode + 1
+            trainer.training_stats['best_score'] = max(
+                trainer.training_stats.get('best_score', 0),
+                score
+            )
+            
+            # 最近100回合的平均分数（滚动窗口，O(1)）
+            trainer.training_stats['average_score'] = trainer.telemetry.scores.mean()
+            
+            # 衰减探索率
+            trainer.agent.decay_epsilon()
+            
+            # 发送更新
+            if (episode + 1) % 5 == 0:  # 每5回合发送一次更新
+                progress_queue.put(('status', progress()))
+                progress_queue.put(('log', f"Episode {episode + 1}/{episodes}, "
+                                           f"Score: {score:.1f}, "
+                                           f"Epsilon: {trainer.agent.epsilon:.3f}"))
+            
+            # 定期保存模型（后台线程写入，不阻塞训练）
+            if (episode + 1) % 50 == 0:
+                snapshot_ms = trainer.checkpoint(episode + 1)
+                progress_queue.put(('log', f"检查点已提交 (Episode {episode + 1}, 快照耗时 {snapshot_ms:.1f}ms)"))
+        
+        # 训练完成
+        trainer.checkpoint(trainer.training_stats['episode'])
+        trainer.close_checkpoints()
+        trainer.telemetry.close()
+        progress_queue.put(('done', progress()))
+        
+    except Exception as e:
+        trainer.close_checkpoints()
+        trainer.telemetry.close()
+        progress_queue.put(('error', str(e)))
 
 class AITrainingServer:
     """AI训练WebSocket服务器"""
     
-    def __init__(self, host='localhost', port=8765):
+    def __init__(self, host='localhost', port=8765, agent_type='q_table', profile=False):
         self.host = host
         self.port = port
-        self.trainer = DinoTrainer()
+        self.trainer = DinoTrainer(agent_type=agent_type)
         self.is_training = False
-        self.training_thread = None
-        self.clients = set()
+        self.training_process = None
+        self.progress_queue = None
+        self.progress_task = None
+        self.stop_event = None
+        
+        # 状态和日志经广播中心合并、限速后发给各客户端
+        self.hub = BroadcastHub()
+        
+        # 训练进程上报的滚动统计，回合明细写入JSONL日志
+        self.telemetry = {}
+        self.telemetry_log = 'training_telemetry.jsonl'
+        
+        # profile为True时训练进程统计各阶段耗时，最近一次上报的结果由get_metrics返回
+        self.profile = profile
+        self.training_profile = None
         
-        # 加载已有模型
-        if self.trainer.load_model():
-            print("成功加载已有AI模型")
+        # 推理使用版本库中的只读模型快照，新检查点落盘后原子切换，客户端可固定版本
+        self.registry = ModelRegistry(self.trainer.model_path, self.trainer.legacy_model_path)
+        self.pinned_versions = {}
+        
+        # 同一轮事件循环内的get_action/get_actions请求合并为一次向量化推理
+        self.inference = InferenceBatcher(self.trainer, self.registry)
+        
+        # 每个连接同时在途的推理请求上限
+        self.max_in_flight = 256
+        
+        # 已协商使用二进制帧的连接
+        self.binary_clients = set()
+        
+        # 加载已有模型（只读内存映射，启动时间与模型和训练历史大小无关）
+        if self.trainer.load_model(mmap=True) and self.registry.reload():
+            print(f"成功加载已有AI模型 (版本 {self.registry.current.version})")
+    
+    @property
+    def clients(self):
+        """当前连接的客户端"""
+        return self.hub.channels.keys()
     
     async def register_client(self, websocket):
         """注册客户端"""
-        self.clients.add(websocket)
+        self.hub.add(websocket)
         print(f"客户端已连接: {websocket.remote_address}")
         
         # 发送当前状态
@@ -35,72 +144,78 @@ class AITrainingServer:
     
     async def unregister_client(self, websocket):
         """注销客户端"""
-        self.clients.discard(websocket)
+        self.hub.remove(websocket)
+        self.binary_clients.discard(websocket)
+        version = self.pinned_versions.pop(websocket, None)
+        if version is not None:
+            self.registry.unpin(version)
         print(f"客户端已断开: {websocket.remote_address}")
     
-    async def send_status(self, websocket=None):
-        """发送训练状态"""
-        status = {
-            'type': 'training_status',
-            'data': {
-                'is_training': self.is_training,
-                'episode': self.trainer.training_stats.get('episode', 0),
-                'best_score': self.trainer.training_stats.get('best_score', 0),
-                'average_score': self.trainer.training_stats.get('average_score', 0),
-                'epsilon': self.trainer.agent.epsilon,
-                'learning_rate': self.trainer.agent.learning_rate
-            }
+    def status_data(self):
+        """当前训练状态"""
+        return {
+            'is_training': self.is_training,
+            'episode': self.trainer.training_stats.get('episode', 0),
+            'best_score': self.trainer.training_stats.get('best_score', 0),
+            'average_score': self.trainer.training_stats.get('average_score', 0),
+            'epsilon': self.trainer.agent.epsilon,
+            'learning_rate': self.trainer.agent.learning_rate,
+            'model_version': self.registry.current.version if self.registry.current else None,
+            'telemetry': self.telemetry
         }
-        
-        message = json.dumps(status)
-        
+    
+    async def send_status(self, websocket=None):
+        """发送训练状态（广播时按限速合并，只发送最新状态）"""
         if websocket:
-            await websocket.send(message)
+            self.hub.send(websocket, json.dumps({'type': 'training_status', 'data': self.status_data()}))
         else:
-            # 广播给所有客户端
-            if self.clients:
-                await asyncio.gather(
-                    *[client.send(message) for client in self.clients],
-                    return_exceptions=True
-                )
+            self.hub.publish_status(self.status_data())
     
     async def send_log(self, log_message):
-        """发送训练日志"""
-        log_data = {
-            'type': 'training_log',
-            'data': {
-                'message': log_message,
-                'timestamp': time.time()
-            }
-        }
-        
-        message = json.dumps(log_data)
-        
-        if self.clients:
-            await asyncio.gather(
-                *[client.send(message) for client in self.clients],
-                return_exceptions=True
-            )
+        """发送训练日志（单条日志为training_log消息，短时间内的多条日志合并为一条training_logs消息）"""
+        self.hub.publish_log(log_message)
     
-    async def handle_message(self, websocket, message):
-        """处理客户端消息"""
+    async def handle_message(self, websocket, message, pipeline=None):
+        """处理客户端消息
+        
+        推理请求（get_action/get_actions）在pipeline中并发处理，响应带回请求的id；
+        训练控制命令按到达顺序逐条处理。二进制帧（需先用set_wire_format协商）是特征矩阵形式的推理请求。
+        """
         try:
+            if isinstance(message, bytes):
+                if websocket not in self.binary_clients:
+                    print("未协商二进制格式的连接发送了二进制帧，已忽略")
+                elif pipeline is None:
+                    await self.handle_binary_inference(websocket, message)
+                else:
+                    await pipeline.submit(self.handle_binary_inference(websocket, message))
+                return
+            
             data = json.loads(message)
             command = data.get('command')
             
-            if command == 'start_training':
+            if command in ('get_action', 'get_actions'):
+                if pipeline is None:
+                    await self.handle_inference(websocket, data)
+                else:
+                    await pipeline.submit(self.handle_inference(websocket, data))
+            elif command == 'start_training':
                 await self.start_training(data.get('episodes', 100))
             elif command == 'stop_training':
                 await self.stop_training()
-            elif command == 'get_action':
-                action = await self.get_ai_action(data.get('game_state'))
-                response = {
-                    'type': 'ai_action',
-                    'data': {'action': action}
-                }
-                await websocket.send(json.dumps(response))
             elif command == 'get_status':
                 await self.send_status(websocket)
+            elif command == 'list_models':
+                await self.send_models(websocket)
+            elif command == 'pin_model':
+                await self.pin_model(websocket, data.get('version'))
+            elif command == 'reload_model':
+                self.registry.reload(force=True)
+                await self.send_models(websocket)
+            elif command == 'get_metrics':
+                await self.send_metrics(websocket)
+            elif command == 'set_wire_format':
+                await self.set_wire_format(websocket, data.get('format', 'json'))
                 
         except json.JSONDecodeError:
             print(f"无效的JSON消息: {message}")
@@ -117,12 +232,20 @@ class AITrainingServer:
         await self.send_log(f"开始AI训练，目标回合数: {episodes}")
         await self.send_status()
         
-        # 在单独线程中运行训练
-        self.training_thread = threading.Thread(
-            target=self.run_training,
-            args=(episodes,)
+        # 在独立进程中运行训练，避免与事件循环争用GIL
+        ctx = multiprocessing.get_context('spawn')
+        self.progress_queue = ctx.Queue()
+        self.stop_event = ctx.Event()
+        self.training_process = ctx.Process(
+            target=run_training_process,
+            args=(episodes, self.progress_queue, self.stop_event, self.trainer.model_path,
+                  self.trainer.agent_type, self.telemetry_log, self.profile),
+            daemon=True
         )
-        self.training_thread.start()
+        self.training_process.start()
+        
+        # 由事件循环中的任务读取训练进度
+        self.progress_task = asyncio.create_task(self.drain_progress())
     
     async def stop_training(self):
         """停止训练"""
@@ -130,139 +253,234 @@ class AITrainingServer:
             await self.send_log("当前没有进行训练")
             return
         
-        self.is_training = False
         await self.send_log("正在停止训练...")
+        self.stop_event.set()
         
-        if self.training_thread and self.training_thread.is_alive():
-            self.training_thread.join(timeout=5)
+        # 等待训练进程保存模型并退出，不阻塞事件循环
+        try:
+            await asyncio.wait_for(asyncio.shield(self.progress_task), timeout=5)
+        except asyncio.TimeoutError:
+            self.training_process.terminate()
+            self.is_training = False
         
         await self.send_log("训练已停止")
         await self.send_status()
     
-    def run_training(self, episodes):
-        """在单独线程中运行训练"""
-        try:
-            # 自定义训练循环，支持实时状态更新
-            for episode in range(episodes):
-                if not self.is_training:
+    async def drain_progress(self):
+        """读取训练进程发来的进度消息并转发给客户端"""
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            try:
+                kind, data = await loop.run_in_executor(None, self.progress_queue.get, True, 0.5)
+            except queue.Empty:
+                if not self.training_process.is_alive():
                     break
-                
-                # 运行一个训练回合
-                state = self.trainer.env.reset()
-                total_reward = 0
-                steps = 0
-                
-                while not self.trainer.env.game_over and steps < 10000 and self.is_training:
-                    action = self.trainer.agent.get_action(state)
-                    next_state, reward, done = self.trainer.env.step(action)
-                    
-                    self.trainer.agent.remember(state, action, reward, next_state, done)
-                    self.trainer.agent.update_q_table(state, action, reward, next_state, done)
-                    
-                    state = next_state
-                    total_reward += reward
-                    steps += 1
-                
-                # 更新统计信息
-                self.trainer.agent.episode_rewards.append(total_reward)
-                self.trainer.agent.episode_scores.append(self.trainer.env.score)
-                self.trainer.training_stats['episode'] = episode + 1
-                self.trainer.training_stats['best_score'] = max(
-                    self.trainer.training_stats.get('best_score', 0),
-                    self.trainer.env.score
-                )
-                
-                # 计算平均分数
-                recent_scores = self.trainer.agent.episode_scores[-100:]
-                self.trainer.training_stats['average_score'] = sum(recent_scores) / len(recent_scores)
-                
-                # 衰减探索率
-                self.trainer.agent.decay_epsilon()
-                
-                # 发送更新（异步）
-                if (episode + 1) % 5 == 0:  # 每5回合发送一次更新
-                    asyncio.run_coroutine_threadsafe(
-                        self.send_status(),
-                        asyncio.get_event_loop()
-                    )
-                    
-                    log_message = f"Episode {episode + 1}/{episodes}, Score: {self.trainer.env.score:.1f}, Epsilon: {self.trainer.agent.epsilon:.3f}"
-                    asyncio.run_coroutine_threadsafe(
-                        self.send_log(log_message),
-                        asyncio.get_event_loop()
-                    )
-                
-                # 定期保存模型
-                if (episode + 1) % 50 == 0:
-                    self.trainer.save_model()
-                    asyncio.run_coroutine_threadsafe(
-                        self.send_log(f"模型已保存 (Episode {episode + 1})"),
-                        asyncio.get_event_loop()
-                    )
-            
-            # 训练完成
-            self.trainer.save_model()
-            self.is_training = False
-            
-            asyncio.run_coroutine_threadsafe(
-                self.send_log("训练完成！模型已保存"),
-                asyncio.get_event_loop()
-            )
-            asyncio.run_coroutine_threadsafe(
-                self.send_status(),
-                asyncio.get_event_loop()
-            )
+                continue
             
+            if kind == 'status':
+                self.update_training_stats(data)
+                await self.send_status()
+            elif kind == 'log':
+                await self.send_log(data)
+            elif kind == 'checkpoint':
+                # 新检查点已写入磁盘，映射为新版本并切换
+                await self.reload_model()
+            elif kind == 'done':
+                self.update_training_stats(data)
+                await self.reload_model()
+                await self.send_log("训练完成！模型已保存")
+                break
+            elif kind == 'error':
+                await self.send_log(f"训练出错: {data}")
+                break
+        
+        self.is_training = False
+        await self.send_status()
+        
+        # 训练结束的日志和状态不等待合并窗口
+        self.hub.flush()
+    
+    async def reload_model(self):
+        """切换到训练进程新写入的模型；加载失败时记录日志并保留当前版本，进度消息继续转发"""
+        try:
+            self.registry.reload()
         except Exception as e:
-            self.is_training = False
-            asyncio.run_coroutine_threadsafe(
-                self.send_log(f"训练出错: {str(e)}"),
-                asyncio.get_event_loop()
-            )
+            await self.send_log(f"加载新模型失败，继续使用当前版本: {e}")
+    
+    def update_training_stats(self, data):
+        """用训练进程上报的统计更新本地状态"""
+        self.trainer.training_stats.update(data['training_stats'])
+        self.trainer.agent.epsilon = data['epsilon']
+        self.telemetry = data['telemetry']
+        self.training_profile = data.get('profile')
     
-    async def get_ai_action(self, game_state):
-        """获取AI动作"""
+    async def send_models(self, websocket):
+        """发送模型版本列表"""
+        data = self.registry.describe()
+        data['pinned_version'] = self.pinned_versions.get(websocket)
+        self.hub.send(websocket, json.dumps({'type': 'model_versions', 'data': data}))
+    
+    async def pin_model(self, websocket, version):
+        """固定连接使用的模型版本，version为空时恢复跟随当前版本"""
+        previous = self.pinned_versions.pop(websocket, None)
+        if version is not None and not self.registry.pin(version):
+            if previous is not None:
+                self.pinned_versions[websocket] = previous
+            self.hub.send(websocket, json.dumps({
+                'type': 'error',
+                'data': {'message': f"模型版本不存在: {version}"}
+            }))
+            return
+        
+        if previous is not None:
+            self.registry.unpin(previous)
+        if version is not None:
+            self.pinned_versions[websocket] = version
+        
+        self.hub.send(websocket, json.dumps({'type': 'model_pinned', 'data': {'version': version}}))
+    
+    async def send_metrics(self, websocket):
+        """发送性能指标：训练各阶段耗时（需以--profile启动）、训练吞吐量、推理批处理和广播统计"""
+        metrics = {
+            'training_phases': self.training_profile,
+            'telemetry': self.telemetry,
+            'inference': self.inference.stats(),
+            'models': {'current': self.registry.describe()['current'], 'swaps': self.registry.swaps},
+            'broadcast': self.hub.stats()
+        }
+        self.hub.send(websocket, json.dumps({'type': 'metrics', 'data': metrics}))
+    
+    async def handle_inference(self, websocket, data):
+        """处理推理请求并回复，响应中的id与请求一致"""
+        version = self.pinned_versions.get(websocket)
+        if data['command'] == 'get_action':
+            game_state = data.get('game_state')
+            error = self.game_state_error(game_state)
+            if error is None:
+                response_data = {'action': await self.get_ai_action(game_state, version)}
+            else:
+                response_data = {'action': 'none', 'error': error}
+            response = {'type': 'ai_action', 'data': response_data}
+        else:
+            games = data.get('games') or []
+            if not isinstance(games, list):
+                games = [games]
+            
+            # 格式不正确的条目在对应位置返回 {'id', 'error'}，其余照常推理
+            errors = [self.game_state_error(game.get('game_state')) if isinstance(game, dict)
+                      else "无效的游戏条目：需要包含game_state字典的对象" for game in games]
+            valid = [i for i, error in enumerate(errors) if error is None]
+            actions = await self.get_ai_actions([games[i].get('game_state') for i in valid], version)
+            results = [{'id': game.get('id') if isinstance(game, dict) else None, 'error': error}
+                       for game, error in zip(games, errors)]
+            for i, action in zip(valid, actions):
+                results[i] = {'id': games[i].get('id'), 'action': action}
+            response = {'type': 'ai_actions', 'data': {'actions': results}}
+        
+        if 'id' in data:
+            response['id'] = data['id']
+        self.hub.send(websocket, json.dumps(response))
+    
+    @staticmethod
+    def game_state_error(game_state):
+        """推理请求中game_state的错误说明，可以推理时返回None（未提供game_state时动作为'none'）"""
+        if game_state is None:
+            return None
+        error = DinoTrainer.game_state_error(game_state)
+        return None if error is None else f"无效的游戏状态：{error}"
+    
+    async def handle_binary_inference(self, websocket, frame):
+        """处理二进制推理请求：帧数据直接解码为特征矩阵，响应为每局1字节的动作编号"""
+        try:
+            request_id, states = wire_format.decode_request(frame)
+        except wire_format.WireFormatError as e:
+            print(f"无效的二进制帧: {e}")
+            return
+        
+        actions = await self.inference.get_actions_array(states, self.pinned_versions.get(websocket))
+        self.hub.send(websocket, wire_format.encode_response(request_id, actions))
+    
+    async def set_wire_format(self, websocket, wire):
+        """协商连接的消息格式：'binary' 启用二进制推理帧，'json' 恢复纯JSON"""
+        if wire == 'binary':
+            self.binary_clients.add(websocket)
+            data = wire_format.describe()
+        else:
+            self.binary_clients.discard(websocket)
+            data = {'format': 'json'}
+        
+        self.hub.send(websocket, json.dumps({'type': 'wire_format', 'data': data}))
+    
+    async def get_ai_action(self, game_state, version=None):
+        """获取AI动作（version为空时使用当前模型版本）"""
         if not game_state:
             return 'none'
         
         try:
-            # 这里可以根据游戏状态获取AI动作
-            # 暂时返回随机动作作为示例
-            import random
-            actions = ['none', 'jump', 'duck']
-            return random.choice(actions)
+            return await self.inference.get_action(game_state, version)
         except Exception as e:
             print(f"获取AI动作时出错: {e}")
             return 'none'
     
-    async def handle_client(self, websocket, path):
+    async def get_ai_actions(self, game_states, version=None):
+        """一次获取多局游戏的AI动作，与同一轮次的其他请求合并推理"""
+        if not all(game_states):
+            # 缺少状态的游戏单独返回'none'，其余照常推理
+            valid = [i for i, game_state in enumerate(game_states) if game_state]
+            actions = ['none'] * len(game_states)
+            for i, action in zip(valid, await self.get_ai_actions([game_states[i] for i in valid], version)):
+                actions[i] = action
+            return actions
+        
+        try:
+            return await self.inference.get_actions(game_states, version)
+        except Exception as e:
+            print(f"获取AI动作时出错: {e}")
+            return ['none'] * len(game_states)
+    
+    async def handle_client(self, websocket, path=None):
         """处理客户端连接"""
         await self.register_client(websocket)
+        pipeline = RequestPipeline(self.max_in_flight)
         
         try:
             async for message in websocket:
-                await self.handle_message(websocket, message)
+                await self.handle_message(websocket, message, pipeline)
         except websockets.exceptions.ConnectionClosed:
             pass
         except Exception as e:
             print(f"客户端处理出错: {e}")
         finally:
+            pipeline.cancel()
             await self.unregister_client(websocket)
     
+    async def serve(self):
+        """在当前事件循环中运行服务器"""
+        # 监视模型文件，外部写入的检查点（如命令行训练）同样会被切换为新版本
+        watch_task = asyncio.create_task(self.registry.watch())
+        try:
+            async with websockets.serve(self.handle_client, self.host, self.port):
+                await asyncio.Future()
+        finally:
+            watch_task.cancel()
+    
     def start_server(self):
         """启动服务器"""
         print(f"AI训练服务器启动在 {self.host}:{self.port}")
         
-        start_server = websockets.serve(
-            self.handle_client,
-            self.host,
-            self.port
-        )
-        
-        asyncio.get_event_loop().run_until_complete(start_server)
-        asyncio.get_event_loop().run_forever()
+        asyncio.run(self.serve())
 
 if __name__ == "__main__":
-    server = AITrainingServer()
+    parser = argparse.ArgumentParser(description='AI Dino Arena 训练服务器')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--agent', choices=DinoTrainer.AGENT_TYPES, default='q_table',
+                       help='智能体类型: q_table(表格Q学习), dqn(NumPy多层感知机)')
+    parser.add_argument('--profile', action='store_true',
+                       help='统计训练进程各阶段耗时，通过get_metrics命令查看')
+    args = parser.parse_args()
+    
+    server = AITrainingServer(args.host, args.port, agent_type=args.agent, profile=args.profile)
     server.start_server()
 
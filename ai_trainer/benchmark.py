@@ -0,0 +1,492 @@
+"""
+AI Dino Arena - 性能基准测试
+测量环境、智能体和端到端训练的吞吐量、单次调用延迟分位数和峰值内存，
+输出JSON结果并可与保存的基线比较以发现性能回退；
+可选地比较一步Q学习、n步回报和Q(λ)达到目标分数所需的环境步数
+"""
+
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from dino_ai_trainer import BatchDinoEnvironment, DinoEnvironment, DinoTrainer, QLearningAgent
+
+# 不同规模下每个测试的工作量
+SCALES = {
+    'small': {'steps': 20000, 'episodes': 50, 'num_envs': 256, 'batch_steps': 200, 'repeats': 5},
+    'medium': {'steps': 100000, 'episodes': 300, 'num_envs': 1024, 'batch_steps': 500, 'repeats': 5},
+    'large': {'steps': 500000, 'episodes': 1000, 'num_envs': 4096, 'batch_steps': 1000, 'repeats': 3}
+}
+
+# 吞吐量低于基线的比例超过该值视为性能回退（本次或基线各次运行的相对极差更大时以极差为准）
+DEFAULT_TOLERANCE = 0.10
+
+# 训练测试在tracemalloc下测量峰值内存时运行的回合数上限（tracemalloc会显著拖慢训练）
+MEMORY_EPISODES = 50
+
+# 单次调用延迟的采样次数（与吞吐量分开测量）
+LATENCY_SAMPLES = 20000
+
+# 收敛比较：各更新方式在固定的训练种子上达到目标平均分数（最近100回合）所需的回合数
+# 每种规模的 (回合数上限, 训练种子数)
+CONVERGENCE_SCALES = {'small': (1000, 3), 'medium': (3000, 5), 'large': (5000, 10)}
+CONVERGENCE_CONFIGS = (
+    ('one_step', {}),
+    ('n_step_4', {'n_step': 4}),
+    ('n_step_8', {'n_step': 8}),
+    ('q_lambda_0.5', {'trace_lambda': 0.5}),
+    ('q_lambda_0.8', {'trace_lambda': 0.8, 'trace_interval': 32})
+)
+CONVERGENCE_TARGET = 20.0
+CONVERGENCE_LEARNING_RATE = 0.1
+
+
+def latency_percentiles(samples_ns):
+    """把纳秒延迟样本汇总为微秒分位数"""
+    samples_us = np.asarray(samples_ns, dtype=np.float64) / 1000.0
+    return {
+        'p50': float(np.percentile(samples_us, 50)),
+        'p90': float(np.percentile(samples_us, 90)),
+        'p99': float(np.percentile(samples_us, 99)),
+        'max': float(samples_us.max())
+    }
+
+
+def measure_throughput(run, repeats):
+    """预热一次后重复运行run（返回完成的操作数）repeats次
+    
+    ops_per_sec取各次吞吐量的中位数（单次偶然偏快或偏慢都不会改变结果），max_ops_per_sec为最快的一次；
+    spread为各次吞吐量的相对极差，用于确定与基线比较时的容差。
+    """
+    run()
+    rates = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        ops = run()
+        rates.append(ops / (time.perf_counter() - start))
+    
+    rates = np.array(rates)
+    median = float(np.median(rates))
+    return {
+        'ops_per_sec': median,
+        'max_ops_per_sec': float(rates.max()),
+        'spread': float((rates.max() - rates.min()) / median),
+        'repeats': repeats
+    }
+
+
+def sample_latency(call, count):
+    """单独的循环中对call(i)逐次计时（计时开销不计入吞吐量），返回微秒分位数"""
+    latencies = np.empty(count, dtype=np.int64)
+    clock = time.perf_counter_ns
+    for i in range(count):
+        t0 = clock()
+        call(i)
+        latencies[i] = clock() - t0
+    return latency_percentiles(latencies)
+
+
+def peak_memory_kb(func):
+    """在tracemalloc下运行func，返回Python分配的峰值内存（KB）"""
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024.0
+
+
+def collect_states(count, seed=0):
+    """用随机策略采集一批真实的环境状态，作为智能体测试的输入"""
+    rng = random.Random(seed)
+    env = DinoEnvironment(seed=seed)
+    states = []
+    state = env.reset()
+    while len(states) < count:
+        next_state, _, done = env.step(rng.choice((0, 0, 0, 1, 2)))
+        states.append((state, next_state, done))
+        state = env.reset() if done else next_state
+    return states
+
+
+def bench_env_step(steps, repeats):
+    """DinoEnvironment.step 单局吞吐量"""
+    env = DinoEnvironment(seed=0)
+    rng = random.Random(0)
+    actions = [rng.choice((0, 0, 0, 1, 2)) for _ in range(steps)]
+    
+    def run(count=steps):
+        env.reset()
+        for action in actions[:count]:
+            if env.step(action)[2]:
+                env.reset()
+        return count
+    
+    def step(i):
+        if env.step(actions[i])[2]:
+            env.reset()
+    
+    result = measure_throughput(run, repeats)
+    env.reset()
+    result.update({
+        'unit': 'steps/s',
+        'latency_us': sample_latency(step, min(steps, LATENCY_SAMPLES)),
+        'peak_memory_kb': peak_memory_kb(lambda: run(min(steps, 5000)))
+    })
+    return result
+
+
+def bench_env_step_code(steps, repeats):
+    """DinoEnvironment.step 写入预分配状态数组并增量计算Q表行号（Q表训练循环的用法）"""
+    env = DinoEnvironment(seed=0)
+    env.set_state_codec(QLearningAgent().state_codec())
+    buffers = (np.zeros(9), np.zeros(9))
+    rng = random.Random(0)
+    actions = [rng.choice((0, 0, 0, 1, 2)) for _ in range(steps)]
+    
+    def run(count=steps):
+        env.reset()
+        for i, action in enumerate(actions[:count]):
+            if env.step(action, buffers[i & 1])[2]:
+                env.reset()
+        return count
+    
+    def step(i):
+        if env.step(actions[i], buffers[i & 1])[2]:
+            env.reset()
+    
+    result = measure_throughput(run, repeats)
+    env.reset()
+    result.update({
+        'unit': 'steps/s',
+        'latency_us': sample_latency(step, min(steps, LATENCY_SAMPLES)),
+        'peak_memory_kb': peak_memory_kb(lambda: run(min(steps, 5000)))
+    })
+    return result
+
+
+def bench_batch_env_step(num_envs, batch_steps, repeats):
+    """BatchDinoEnvironment.step 批量吞吐量（按单局步数计）"""
+    rng = np.random.default_rng(0)
+    actions = rng.choice(3, size=(batch_steps, num_envs), p=[0.6, 0.2, 0.2])
+    
+    def run(count=batch_steps):
+        env = BatchDinoEnvironment(num_envs, seeds=list(range(num_envs)))
+        for i in range(count):
+            env.step(actions[i])
+        return num_envs * count
+    
+    env = BatchDinoEnvironment(num_envs, seeds=list(range(num_envs)))
+    result = measure_throughput(run, repeats)
+    result.update({
+        'unit': 'steps/s',
+        'num_envs': num_envs,
+        'latency_us': sample_latency(lambda i: env.step(actions[i]), batch_steps),
+        'peak_memory_kb': peak_memory_kb(lambda: run(min(batch_steps, 50)))
+    })
+    return result
+
+
+def bench_agent(steps, repeats):
+    """QLearningAgent.get_action / update_q_table 单次调用开销"""
+    states = collect_states(min(steps, 20000))
+    agent = QLearningAgent(epsilon=0.1, seed=0)
+    actions = [i % agent.action_size for i in range(len(states))]
+    samples = min(steps, LATENCY_SAMPLES)
+    
+    def run_get_action(count=steps):
+        for i in range(count):
+            agent.get_action(states[i % len(states)][0])
+        return count
+    
+    def run_update(count=steps):
+        for i in range(count):
+            state, next_state, done = states[i % len(states)]
+            agent.update_q_table(state, actions[i % len(states)], 1.0, next_state, done)
+        return count
+    
+    def update(i):
+        state, next_state, done = states[i % len(states)]
+        agent.update_q_table(state, actions[i % len(states)], 1.0, next_state, done)
+    
+    get_action = measure_throughput(run_get_action, repeats)
+    get_action.update({
+        'unit': 'calls/s',
+        'latency_us': sample_latency(lambda i: agent.get_action(states[i % len(states)][0]), samples),
+        'peak_memory_kb': peak_memory_kb(lambda: run_get_action(min(steps, 5000)))
+    })
+    
+    update_q_table = measure_throughput(run_update, repeats)
+    update_q_table.update({
+        'unit': 'calls/s',
+        'latency_us': sample_latency(update, samples),
+        'peak_memory_kb': peak_memory_kb(lambda: run_update(min(steps, 5000)))
+    })
+    
+    return {'get_action': get_action, 'update_q_table': update_q_table}
+
+
+def bench_training(episodes, repeats, num_envs=None):
+    """端到端训练吞吐量（回合/秒），每次运行使用相同种子的新训练器，模型写入临时目录"""
+    last = {}
+    
+    def run(episodes=episodes):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            trainer = DinoTrainer(seed=0)
+            trainer.model_path = os.path.join(tmpdir, 'dino_q_model.bin')
+            trainer.stats_path = os.path.join(tmpdir, 'training_stats.json')
+            trainer.keep_checkpoints = 0
+            
+            # 屏蔽训练过程中的进度输出
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                if num_envs:
+                    trainer.train_batch(episodes=episodes, save_interval=episodes,
+                                        num_envs=num_envs, seeds=list(range(num_envs)))
+                else:
+                    trainer.train(episodes=episodes, save_interval=episodes)
+                elapsed = time.perf_counter() - start
+        
+        last['steps_per_sec'] = trainer.telemetry.total_steps / elapsed
+        last['average_score'] = float(trainer.training_stats['average_score'])
+        return episodes
+    
+    result = measure_throughput(run, repeats)
+    result['unit'] = 'episodes/s'
+    result.update(last)
+    result['peak_memory_kb'] = peak_memory_kb(lambda: run(min(episodes, MEMORY_EPISODES)))
+    return result
+
+
+def episodes_to_target(target, episodes, seed, learning_rate, **multi_step):
+    """训练episodes回合，返回 (最近100回合平均分数首次达到target时的回合数和环境步数或None, 最终平均分数, 总步数)"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        trainer = DinoTrainer(seed=seed, **multi_step)
+        trainer.agent.learning_rate = learning_rate
+        trainer.model_path = os.path.join(tmpdir, 'dino_q_model.bin')
+        trainer.stats_path = os.path.join(tmpdir, 'training_stats.json')
+        trainer.keep_checkpoints = 0
+        
+        # 每回合结束时检查滚动平均分数（窗口填满之后）
+        reached = []
+        finish_episode = trainer.finish_episode
+        
+        def check_target(*args):
+            finish_episode(*args)
+            telemetry = trainer.telemetry
+            if not reached and telemetry.episodes >= telemetry.scores.window and telemetry.scores.mean() >= target:
+                reached.append((telemetry.episodes, telemetry.total_steps))
+        
+        trainer.finish_episode = check_target
+        with contextlib.redirect_stdout(io.StringIO()):
+            trainer.train(episodes=episodes, save_interval=episodes)
+    
+    return (reached[0] if reached else None, float(trainer.telemetry.scores.mean()),
+            trainer.telemetry.total_steps)
+
+
+def bench_convergence(scale='small', target=CONVERGENCE_TARGET, learning_rate=CONVERGENCE_LEARNING_RATE):
+    """在相同的训练种子上比较一步Q学习、n步回报和Q(λ)达到目标平均分数所需的回合数（越少越好）"""
+    episodes, num_seeds = CONVERGENCE_SCALES[scale]
+    results = {}
+    for name, multi_step in CONVERGENCE_CONFIGS:
+        runs = [episodes_to_target(target, episodes, seed, learning_rate, **multi_step) for seed in range(num_seeds)]
+        reached = [result for result, _, _ in runs if result is not None]
+        results[name] = {
+            'config': multi_step,
+            'target_score': target,
+            'max_episodes': episodes,
+            'reached': len(reached),
+            'runs': num_seeds,
+            'median_episodes_to_target': float(np.median([count for count, _ in reached])) if reached else None,
+            'median_steps_to_target': float(np.median([steps for _, steps in reached])) if reached else None,
+            'episodes_to_target': [None if result is None else result[0] for result, _, _ in runs],
+            'final_average_score': float(np.mean([score for _, score, _ in runs])),
+            'total_steps': int(sum(total for _, _, total in runs))
+        }
+    return results
+
+
+def benchmark_groups(config):
+    """基准测试分组 (说明, 结果名, 运行函数)，运行函数返回 {结果名: 结果}，确认回退时按组重跑"""
+    repeats = config['repeats']
+    
+    def agent_group():
+        agent_results = bench_agent(config['steps'], repeats)
+        return {'agent_get_action': agent_results['get_action'],
+                'agent_update_q_table': agent_results['update_q_table']}
+    
+    return [
+        ("DinoEnvironment.step", ('env_step', 'env_step_code'),
+         lambda: {'env_step': bench_env_step(config['steps'], repeats),
+                  'env_step_code': bench_env_step_code(config['steps'], repeats)}),
+        ("BatchDinoEnvironment.step", ('batch_env_step',),
+         lambda: {'batch_env_step': bench_batch_env_step(config['num_envs'], config['batch_steps'], repeats)}),
+        ("QLearningAgent", ('agent_get_action', 'agent_update_q_table'), agent_group),
+        ("端到端训练", ('train_episode',),
+         lambda: {'train_episode': bench_training(config['episodes'], repeats)}),
+        ("批量训练", ('train_batch_episode',),
+         lambda: {'train_batch_episode': bench_training(config['episodes'], repeats,
+                                                        num_envs=min(config['num_envs'], 64))})
+    ]
+
+
+def run_benchmarks(scale='small', convergence=False):
+    """运行全部基准测试，返回可序列化为JSON的结果（convergence为True时附带收敛比较）"""
+    config = SCALES[scale]
+    results = {}
+    
+    print(f"基准测试规模: {scale} {config}")
+    
+    for label, _, run in benchmark_groups(config):
+        print(f"测试 {label} ...")
+        results.update(run())
+    
+    report = {
+        'meta': {
+            'scale': scale,
+            'config': config,
+            'timestamp': time.time(),
+            'python': sys.version.split()[0],
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'results': results
+    }
+    
+    if convergence:
+        print("比较多步更新的收敛速度 ...")
+        report['convergence'] = bench_convergence(scale)
+    
+    return report
+
+
+def compare_with_baseline(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """比较吞吐量（各自多次运行的中位数）与基线，返回回退项列表
+    
+    每项的容差取tolerance与本次、基线测得的相对极差中的最大值，噪声大的测试不会误报回退。
+    """
+    regressions = []
+    for name, result in report['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if not base:
+            continue
+        
+        # 旧版本的结果中ops_per_sec是最快的一次，中位数另存为median_ops_per_sec
+        base_rate = base.get('median_ops_per_sec', base['ops_per_sec'])
+        ratio = result['ops_per_sec'] / base_rate
+        allowed = max(tolerance, result.get('spread', 0.0), base.get('spread', 0.0))
+        result['baseline_ratio'] = ratio
+        result['tolerance'] = allowed
+        if ratio < 1.0 - allowed:
+            regressions.append({
+                'name': name,
+                'ops_per_sec': result['ops_per_sec'],
+                'baseline_ops_per_sec': base_rate,
+                'ratio': ratio,
+                'tolerance': allowed
+            })
+    
+    report['regressions'] = regressions
+    return regressions
+
+
+def confirm_regressions(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """重跑出现回退的测试组，只保留重跑后仍低于基线的回退项
+    
+    单次运行受调度或频率波动影响偶然偏慢时不报告；未复现的回退项记录在unconfirmed_regressions中。
+    """
+    regressions = report.get('regressions', [])
+    regressed = {regression['name'] for regression in regressions}
+    if not regressed:
+        return regressions
+    
+    rerun = {}
+    for label, names, run in benchmark_groups(report['meta']['config']):
+        if regressed.intersection(names):
+            print(f"重新测试 {label} 以确认性能回退 ...")
+            rerun.update(run())
+    
+    rerun_report = {'results': {name: rerun[name] for name in regressed}}
+    reproduced = {regression['name'] for regression in compare_with_baseline(rerun_report, baseline, tolerance)}
+    
+    confirmed = []
+    unconfirmed = []
+    for regression in regressions:
+        result = rerun_report['results'][regression['name']]
+        regression['rerun_ratio'] = result['baseline_ratio']
+        if regression['name'] in reproduced:
+            confirmed.append(regression)
+        else:
+            unconfirmed.append(regression)
+    
+    report['regressions'] = confirmed
+    report['unconfirmed_regressions'] = unconfirmed
+    return confirmed
+
+
+def print_report(report):
+    """打印基准测试结果表"""
+    print("=" * 86)
+    print(f"{'name':<24} {'throughput':>14} {'unit':<12} {'spread':>7} {'p50(us)':>9} {'p99(us)':>9} {'vs base':>8}")
+    for name, result in report['results'].items():
+        latency = result.get('latency_us')
+        p50 = f"{latency['p50']:.2f}" if latency else '-'
+        p99 = f"{latency['p99']:.2f}" if latency else '-'
+        ratio = result.get('baseline_ratio')
+        print(f"{name:<24} {result['ops_per_sec']:>14,.1f} {result['unit']:<12} {result['spread']:>7.1%} "
+              f"{p50:>9} {p99:>9} {'-' if ratio is None else f'{ratio:.2f}x':>8}")
+    
+    for regression in report.get('regressions', []):
+        print(f"性能回退: {regression['name']} 为基线的 {regression['ratio']:.2f} 倍"
+              f"（重跑 {regression['rerun_ratio']:.2f} 倍，容差 {regression['tolerance']:.0%}）")
+    for regression in report.get('unconfirmed_regressions', []):
+        print(f"未复现的回退: {regression['name']} 为基线的 {regression['ratio']:.2f} 倍，"
+              f"重跑为 {regression['rerun_ratio']:.2f} 倍，不计为性能回退")
+    
+    convergence = report.get('convergence')
+    if convergence:
+        first = next(iter(convergence.values()))
+        print("-" * 86)
+        print(f"收敛比较: 最近100回合平均分数达到 {first['target_score']}（每个种子最多 {first['max_episodes']} 回合）")
+        print(f"{'update':<24} {'reached':>8} {'median episodes':>16} {'median steps':>14} "
+              f"{'final avg':>10} {'total steps':>12}")
+        for name, result in convergence.items():
+            episodes = result['median_episodes_to_target']
+            steps = result['median_steps_to_target']
+            print(f"{name:<24} {result['reached']:>4}/{result['runs']:<3} "
+                  f"{'-' if episodes is None else f'{episodes:,.0f}':>16} "
+                  f"{'-' if steps is None else f'{steps:,.0f}':>14} "
+                  f"{result['final_average_score']:>10.1f} {result['total_steps']:>12,}")
+
+
+def main(scale='small', output=None, baseline_path=None, tolerance=DEFAULT_TOLERANCE, convergence=False):
+    """运行基准测试并输出结果，存在性能回退时返回False"""
+    report = run_benchmarks(scale, convergence)
+    
+    regressions = []
+    if baseline_path:
+        with open(baseline_path, 'r') as f:
+            baseline = json.load(f)
+        compare_with_baseline(report, baseline, tolerance)
+        regressions = confirm_regressions(report, baseline, tolerance)
+    
+    print_report(report)
+    
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"基准测试结果已保存到 {output}")
+    
+    return not regressions
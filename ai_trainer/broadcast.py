@@ -0,0 +1,180 @@
+"""
+AI Dino Arena - 消息广播
+训练状态和日志先合并再广播：每条消息只序列化一次，状态按最大频率发送且只保留最新一条，
+日志按时间窗口批量发送；每个客户端有独立的有界发送队列和写任务，慢客户端不会拖住事件循环
+"""
+
+import asyncio
+import json
+import time
+from collections import deque
+
+
+class ClientChannel:
+    """单个客户端的发送队列
+    
+    普通消息按顺序排队（有上限）；状态消息单独占一个槽位，新的直接覆盖尚未发出的旧状态。
+    """
+    
+    def __init__(self, websocket, max_queue):
+        self.websocket = websocket
+        self.max_queue = max_queue
+        self.queue = deque()
+        self.status = None
+        self.closed = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+    
+    def enqueue(self, message):
+        """加入一条消息，队列已满时返回False"""
+        if self.closed or len(self.queue) >= self.max_queue:
+            return False
+        
+        self.queue.append(message)
+        self._wakeup.set()
+        return True
+    
+    def set_status(self, message):
+        """替换待发送的状态消息"""
+        if not self.closed:
+            self.status = message
+            self._wakeup.set()
+    
+    async def _run(self):
+        """写任务：依次发送状态和排队的消息"""
+        try:
+            while True:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                
+                while self.status is not None or self.queue:
+                    if self.status is not None:
+                        message, self.status = self.status, None
+                    else:
+                        message = self.queue.popleft()
+                    await self.websocket.send(message)
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            # 连接已断开，由连接处理协程负责注销
+            pass
+        finally:
+            self.closed = True
+    
+    def close(self):
+        self.closed = True
+        self._task.cancel()
+
+
+class BroadcastHub:
+    """训练状态和日志的广播中心"""
+    
+    def __init__(self, status_interval=0.2, log_interval=0.25, max_queue=256, overflow='disconnect'):
+        # 状态消息的最小发送间隔（秒）和日志的合并窗口（秒）
+        self.status_interval = status_interval
+        self.log_interval = log_interval
+        # 客户端队列超过max_queue时的处理方式：'drop' 丢弃新消息，'disconnect' 断开客户端
+        self.max_queue = max_queue
+        self.overflow = overflow
+        
+        self.channels = {}
+        self.dropped = 0
+        self.disconnected = 0
+        
+        self._status = None
+        self._status_handle = None
+        self._last_status_time = 0.0
+        self._logs = []
+        self._log_handle = None
+    
+    def __len__(self):
+        return len(self.channels)
+    
+    def add(self, websocket):
+        """注册客户端并启动其写任务"""
+        self.channels[websocket] = ClientChannel(websocket, self.max_queue)
+    
+    def remove(self, websocket):
+        """注销客户端并停止其写任务"""
+        channel = self.channels.pop(websocket, None)
+        if channel is not None:
+            channel.close()
+    
+    def send(self, websocket, message):
+        """向单个客户端发送已序列化的消息（与广播消息保持顺序）"""
+        channel = self.channels.get(websocket)
+        if channel is None:
+            return False
+        if not channel.enqueue(message):
+            self._handle_overflow(channel)
+            return False
+        return True
+    
+    def broadcast(self, message):
+        """向全部客户端发送已序列化的消息"""
+        for channel in list(self.channels.values()):
+            if not channel.enqueue(message):
+                self._handle_overflow(channel)
+    
+    def publish_status(self, data):
+        """提交最新训练状态，按status_interval限速发送，期间的旧状态被覆盖"""
+        self._status = data
+        if self._status_handle is not None:
+            return
+        
+        delay = max(0.0, self._last_status_time + self.status_interval - time.monotonic())
+        self._status_handle = asyncio.get_running_loop().call_later(delay, self._flush_status)
+    
+    def publish_log(self, message):
+        """提交一条日志，log_interval内的多条日志合并为一条training_logs消息
+        
+        窗口内只有一条日志时仍发送原来的training_log消息（data为单条日志），旧客户端不受影响。
+        """
+        self._logs.append({'message': message, 'timestamp': time.time()})
+        if self._log_handle is None:
+            self._log_handle = asyncio.get_running_loop().call_later(self.log_interval, self._flush_logs)
+    
+    def flush(self):
+        """立即发送所有合并中的日志和状态"""
+        if self._log_handle is not None:
+            self._log_handle.cancel()
+            self._flush_logs()
+        if self._status_handle is not None:
+            self._status_handle.cancel()
+            self._flush_status()
+    
+    def _flush_status(self):
+        self._status_handle = None
+        self._last_status_time = time.monotonic()
+        
+        message = json.dumps({'type': 'training_status', 'data': self._status})
+        for channel in self.channels.values():
+            channel.set_status(message)
+    
+    def _flush_logs(self):
+        self._log_handle = None
+        logs, self._logs = self._logs, []
+        if len(logs) == 1:
+            self.broadcast(json.dumps({'type': 'training_log', 'data': logs[0]}))
+        elif logs:
+            self.broadcast(json.dumps({'type': 'training_logs', 'data': logs}))
+    
+    def _handle_overflow(self, channel):
+        """客户端发送队列已满"""
+        self.dropped += 1
+        if self.overflow != 'disconnect' or channel.closed:
+            return
+        
+        # 断开跟不上的客户端，其连接处理协程随后会注销它
+        self.disconnected += 1
+        channel.close()
+        self.channels.pop(channel.websocket, None)
+        asyncio.get_running_loop().create_task(channel.websocket.close(code=1013, reason='client too slow'))
+    
+    def stats(self):
+        """广播统计"""
+        return {
+            'clients': len(self.channels),
+            'dropped': self.dropped,
+            'disconnected': self.disconnected
+        }
@@ -0,0 +1,199 @@
+"""
+AI Dino Arena - 后台检查点
+训练线程只做一次Q表内存拷贝（双缓冲），序列化和写盘在后台线程完成，
+保存频率不再影响训练吞吐量
+"""
+
+import os
+import shutil
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+import model_store
+
+
+class CheckpointWriter:
+    """后台检查点写入器
+    
+    submit() 把模型数组（Q表或网络参数）拷贝到空闲缓冲区后立即返回；如果上一个检查点还没写完，
+    新的快照会覆盖尚未开始写入的那一个（只保留最新的），回合统计则会累积下来。
+    每个检查点以原子重命名方式写入model_path，并在checkpoint_dir（默认为模型所在目录下的
+    checkpoints）中保留最近keep个版本；之前运行留下的历史检查点在启动时列出，一起参与轮换。
+    """
+    
+    def __init__(self, model_path, stats_path, keep=3, checkpoint_dir=None, on_saved=None):
+        self.model_path = model_path
+        self.stats_path = stats_path
+        self.keep = keep
+        # 检查点写入完成后在后台线程中调用 on_saved(episode)
+        self.on_saved = on_saved
+        self.checkpoint_dir = checkpoint_dir or os.path.join(os.path.dirname(model_path), 'checkpoints')
+        
+        self._buffers = [None, None]
+        self._writing_index = None
+        self._pending = None
+        self._condition = threading.Condition()
+        self._closed = False
+        
+        # 最近的检查点耗时（毫秒）
+        self.latencies = deque(maxlen=100)
+        self.saved_checkpoints = deque(self._existing_checkpoints())
+        self.completed = 0
+        self.errors = 0
+        
+        self._thread = threading.Thread(target=self._run, name='checkpoint-writer', daemon=True)
+        self._thread.start()
+    
+    def submit(self, agent, training_stats, episode):
+        """快照智能体状态并交给后台线程写入，返回快照耗时（毫秒）"""
+        start = time.perf_counter()
+        
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("检查点写入器已关闭")
+            
+            # 选择后台线程当前没有在写的缓冲区
+            index = 1 if self._writing_index == 0 else 0
+            model = agent.model_array()
+            buffer = self._buffers[index]
+            if buffer is None or buffer.shape != model.shape or buffer.dtype != model.dtype:
+                buffer = self._buffers[index] = np.empty_like(model)
+            np.copyto(buffer, model)
+            
+            scores, rewards = agent.take_unsaved_stats()
+            if self._pending is not None:
+                # 未写入的旧快照被覆盖，但其回合统计需要保留
+                scores = self._pending['scores'] + scores
+                rewards = self._pending['rewards'] + rewards
+            
+            self._pending = {
+                'index': index,
+                'episode': episode,
+                'metadata': agent.model_metadata(),
+                'training_stats': dict(training_stats),
+                'scores': scores,
+                'rewards': rewards,
+                'snapshot_ms': (time.perf_counter() - start) * 1000,
+                'submitted': time.perf_counter()
+            }
+            self._condition.notify()
+            
+            return self._pending['snapshot_ms']
+    
+    def flush(self):
+        """等待已提交的检查点全部写完"""
+        with self._condition:
+            while self._pending is not None or self._writing_index is not None:
+                self._condition.wait()
+    
+    def close(self):
+        """写完剩余检查点并停止后台线程"""
+        self.flush()
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+    
+    def latency_summary(self):
+        """检查点耗时统计"""
+        if not self.latencies:
+            return {'checkpoints': self.completed, 'errors': self.errors}
+        
+        snapshot_ms = [latency['snapshot_ms'] for latency in self.latencies]
+        write_ms = [latency['write_ms'] for latency in self.latencies]
+        return {
+            'checkpoints': self.completed,
+            'snapshot_ms_mean': float(np.mean(snapshot_ms)),
+            'snapshot_ms_max': float(np.max(snapshot_ms)),
+            'write_ms_mean': float(np.mean(write_ms)),
+            'write_ms_max': float(np.max(write_ms)),
+            'errors': self.errors
+        }
+    
+    def _checkpoint_path(self, episode):
+        """第episode回合的历史检查点路径"""
+        name, ext = os.path.splitext(os.path.basename(self.model_path))
+        return os.path.join(self.checkpoint_dir, f"{name}.ep{episode:08d}{ext}")
+    
+    def _existing_checkpoints(self):
+        """checkpoint_dir中已有的本模型历史检查点，按修改时间从旧到新排列"""
+        if not os.path.isdir(self.checkpoint_dir):
+            return []
+        
+        name, ext = os.path.splitext(os.path.basename(self.model_path))
+        prefix = f"{name}.ep"
+        paths = []
+        for entry in os.scandir(self.checkpoint_dir):
+            episode = entry.name[len(prefix):len(entry.name) - len(ext)]
+            if (entry.is_file() and entry.name.startswith(prefix) and entry.name.endswith(ext)
+                    and len(episode) == 8 and episode.isdigit()):
+                paths.append((entry.stat().st_mtime, entry.path))
+        return [path for _, path in sorted(paths)]
+    
+    def _run(self):
+        """后台线程：取出最新快照并写盘"""
+        while True:
+            with self._condition:
+                while self._pending is None and not self._closed:
+                    self._condition.wait()
+                if self._pending is None:
+                    return
+                
+                job = self._pending
+                self._pending = None
+                self._writing_index = job['index']
+            
+            # 任何异常都不能结束后台线程，否则之后的flush()和close()会一直等待
+            start = time.perf_counter()
+            try:
+                self._write(job)
+                self.completed += 1
+                self.latencies.append({
+                    'episode': job['episode'],
+                    'snapshot_ms': job['snapshot_ms'],
+                    'write_ms': (time.perf_counter() - start) * 1000,
+                    'delay_ms': (time.perf_counter() - job['submitted']) * 1000
+                })
+                if self.on_saved is not None:
+                    try:
+                        self.on_saved(job['episode'])
+                    except Exception as e:
+                        print(f"检查点回调出错 (Episode {job['episode']}): {e}")
+            except Exception as e:
+                self.errors += 1
+                print(f"写入检查点失败 (Episode {job['episode']}): {type(e).__name__}: {e}")
+            finally:
+                with self._condition:
+                    self._writing_index = None
+                    self._condition.notify_all()
+    
+    def _write(self, job):
+        """写入模型、回合统计和训练统计，并轮换历史检查点"""
+        model_store.save_array(self.model_path, self._buffers[job['index']], job['metadata'])
+        if job['scores']:
+            model_store.append_stats(self.model_path, job['scores'], job['rewards'])
+        model_store.save_json(self.stats_path, job['training_stats'])
+        
+        if self.keep <= 0:
+            return
+        
+        # 历史检查点通过硬链接保留，不额外拷贝数据
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        checkpoint_path = self._checkpoint_path(job['episode'])
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        if checkpoint_path in self.saved_checkpoints:
+            self.saved_checkpoints.remove(checkpoint_path)
+        try:
+            os.link(self.model_path, checkpoint_path)
+        except OSError:
+            shutil.copyfile(self.model_path, checkpoint_path)
+        
+        self.saved_checkpoints.append(checkpoint_path)
+        while len(self.saved_checkpoints) > self.keep:
+            old_path = self.saved_checkpoints.popleft()
+            if os.path.exists(old_path):
+                os.remove(old_path)
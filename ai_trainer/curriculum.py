@@ -0,0 +1,124 @@
+"""
+AI Dino Arena - 课程训练
+智能体熟练后，从头开始的回合大部分时间都花在已经掌握的低速阶段，
+课程调度器让回合直接从更高的分数（速度）开始，或从保存的中局快照继续，
+并按最近回合长度自适应截断过长的回合，把模拟时间集中在高速、高难度的部分
+"""
+
+import numpy as np
+
+from telemetry import RollingWindow
+
+
+class SnapshotBank:
+    """中局快照库：固定容量，满后随机替换（蓄水池采样），内存占用不随训练长度增长"""
+    
+    def __init__(self, capacity=256, rng=None):
+        self.capacity = capacity
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.snapshots = []
+        self.scores = []
+        self.seen = 0
+    
+    def __len__(self):
+        return len(self.snapshots)
+    
+    def add(self, snapshot, score):
+        """加入一个快照"""
+        self.seen += 1
+        if len(self.snapshots) < self.capacity:
+            self.snapshots.append(snapshot)
+            self.scores.append(score)
+            return
+        
+        i = int(self.rng.integers(self.seen))
+        if i < self.capacity:
+            self.snapshots[i] = snapshot
+            self.scores[i] = score
+    
+    def sample(self):
+        """随机取一个快照"""
+        return self.snapshots[int(self.rng.integers(len(self.snapshots)))]
+
+
+class CurriculumScheduler:
+    """课程调度器：决定每个回合的起点和步数上限
+    
+    - 起始分数在 [0, start_ratio × 已达到的最高分] 内均匀抽取，难度随智能体水平提高；
+    - 以bank_probability的概率改为从快照库中的中局状态（含真实的障碍物布局）开始；
+    - 回合步数上限为最近回合平均步数的truncate_factor倍（限制在[min_steps, max_steps]内）。
+    """
+    
+    def __init__(self, env, seed=None, start_ratio=0.8, bank_probability=0.5, bank_capacity=256,
+                 snapshot_interval=200, min_snapshot_score=50, truncate_factor=3.0,
+                 min_steps=500, max_steps=10000, window=100):
+        self.env = env
+        self.rng = np.random.default_rng(seed)
+        self.start_ratio = start_ratio
+        self.bank_probability = bank_probability
+        self.bank = SnapshotBank(bank_capacity, self.rng)
+        
+        # 每snapshot_interval步把分数不低于min_snapshot_score的状态存入快照库
+        self.snapshot_interval = snapshot_interval
+        self.min_snapshot_score = min_snapshot_score
+        
+        self.truncate_factor = truncate_factor
+        self.min_steps = min_steps
+        self.max_steps = max_steps
+        self.episode_steps = RollingWindow(window)
+        
+        self.best_score = 0
+        self.start_score = 0
+        # 当前回合从中局快照开始时为快照所属回合的种子，否则为None
+        self.snapshot_seed = None
+        self.episodes_from_bank = 0
+        self.truncated = 0
+    
+    def reset(self):
+        """按课程选择起点并重置环境，返回初始状态"""
+        if len(self.bank) and self.rng.random() < self.bank_probability:
+            self.episodes_from_bank += 1
+            state = self.env.restore(self.bank.sample())
+            self.snapshot_seed = self.env.episode_seed
+            
+            # 快照使用已结束回合的随机数状态，这里换成新的回合种子，避免重复相同的障碍物序列；
+            # episode_seed与随机数发生器保持一致，快照来源另由snapshot_seed记录
+            seed = int(self.env.seed_rng.integers(2**63))
+            self.env.episode_seed = seed
+            self.env.rng = np.random.default_rng(seed)
+        else:
+            self.snapshot_seed = None
+            max_start = min(self.start_ratio * self.best_score, self.env.MAX_SCORE / 2)
+            state = self.env.reset(start_score=round(self.rng.uniform(0, max_start), 1) if max_start > 0 else 0)
+        
+        self.start_score = self.env.score
+        return state
+    
+    def step_limit(self):
+        """当前回合的步数上限"""
+        if not len(self.episode_steps):
+            return self.max_steps
+        limit = int(self.truncate_factor * self.episode_steps.mean())
+        return min(self.max_steps, max(self.min_steps, limit))
+    
+    def observe(self, steps):
+        """回合进行中调用：按间隔把中局状态存入快照库"""
+        if steps % self.snapshot_interval == 0 and self.env.score >= self.min_snapshot_score:
+            self.bank.add(self.env.snapshot(), self.env.score)
+    
+    def end_episode(self, steps):
+        """回合结束时更新课程统计"""
+        self.best_score = max(self.best_score, self.env.score)
+        self.episode_steps.append(steps)
+        if not self.env.game_over:
+            self.truncated += 1
+    
+    def stats(self):
+        """课程统计"""
+        return {
+            'best_score': float(self.best_score),
+            'bank_size': len(self.bank),
+            'episodes_from_bank': self.episodes_from_bank,
+            'truncated': self.truncated,
+            'step_limit': self.step_limit()
+        }
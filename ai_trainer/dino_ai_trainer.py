@@ -1,15 +1,114 @@
 import numpy as np
 import json
 import time
-import random
-from collections import deque
 import pickle
 import os
+import model_store
+from checkpoint import CheckpointWriter
+from dqn_agent import DQNAgent
+from replay_buffer import PrioritizedReplayBuffer, ReplayBuffer
+from seeding import UniformStream, spawn_seeds
+from telemetry import TrainingTelemetry
+from curriculum import CurriculumScheduler
+from trajectory import Trajectory, lambda_targets, n_step_targets
+
+class ObstacleBuffer:
+    """按x坐标有序的障碍物环形缓冲区（列式存储）
+    
+    障碍物总是从画布右侧生成并以相同速度左移，因此队列天然按x有序：
+    新障碍物追加到队尾，离开画布的从队首弹出，恐龙前方最近障碍物的位置只会向队尾移动。
+    """
+    
+    __slots__ = ('x', 'y', 'width', 'height', 'is_cactus', 'capacity', 'head', 'count', 'ahead')
+    
+    def __init__(self, capacity=16):
+        self.capacity = capacity
+        self.x = [0] * capacity
+        self.y = [0] * capacity
+        self.width = [0] * capacity
+        self.height = [0] * capacity
+        self.is_cactus = [False] * capacity
+        self.clear()
+    
+    def __len__(self):
+        return self.count
+    
+    def clear(self):
+        """清空缓冲区"""
+        self.head = 0
+        self.count = 0
+        # 已经越过恐龙（x <= 边界）的障碍物数量
+        self.ahead = 0
+    
+    def push(self, x, y, width, height, is_cactus):
+        """在队尾加入一个障碍物"""
+        if self.count == self.capacity:
+            self._grow()
+        
+        i = (self.head + self.count) % self.capacity
+        self.x[i] = x
+        self.y[i] = y
+        self.width[i] = width
+        self.height[i] = height
+        self.is_cactus[i] = is_cactus
+        self.count += 1
+    
+    def _grow(self):
+        """容量不足时按顺序搬到两倍大小的列中"""
+        order = [(self.head + k) % self.capacity for k in range(self.count)]
+        for name in ('x', 'y', 'width', 'height', 'is_cactus'):
+            column = getattr(self, name)
+            setattr(self, name, [column[i] for i in order] + [column[0]] * self.capacity)
+        self.capacity *= 2
+        self.head = 0
+    
+    def advance(self, distance, boundary):
+        """弹出已离开画布的障碍物，其余左移distance，并更新boundary右侧最近障碍物的位置"""
+        x = self.x
+        width = self.width
+        capacity = self.capacity
+        
+        while self.count and x[self.head] + width[self.head] <= 0:
+            self.head = (self.head + 1) % capacity
+            self.count -= 1
+            if self.ahead:
+                self.ahead -= 1
+        
+        i = self.head
+        for _ in range(self.count):
+            x[i] -= distance
+            i += 1
+            if i == capacity:
+                i = 0
+        
+        while self.ahead < self.count and x[(self.head + self.ahead) % capacity] <= boundary:
+            self.ahead += 1
+    
+    def nearest(self):
+        """boundary右侧最近障碍物的槽位，不存在时返回-1"""
+        if self.ahead < self.count:
+            return (self.head + self.ahead) % self.capacity
+        return -1
+    
+    def slot(self, k):
+        """队列中第k个障碍物的槽位"""
+        return (self.head + k) % self.capacity
+    
+    def to_dicts(self):
+        """按x顺序导出为障碍物字典列表"""
+        return [{
+            'x': self.x[i],
+            'y': self.y[i],
+            'width': self.width[i],
+            'height': self.height[i],
+            'type': 'cactus' if self.is_cactus[i] else 'pterodactyl'
+        } for i in map(self.slot, range(self.count))]
+
 
 class DinoEnvironment:
     """Chrome Dino游戏环境模拟"""
     
-    def __init__(self):
+    def __init__(self, seed=None, frame_skip=1):
         # 游戏配置
         self.CANVAS_WIDTH = 800
         self.CANVAS_HEIGHT = 200
@@ -24,25 +123,83 @@ class DinoEnvironment:
         self.ACCELERATION = 0.001
         self.MAX_SCORE = 5000
         
+        # 每次决策推进的帧数（动作重复），中间帧同样做碰撞检测并累计奖励
+        self.frame_skip = frame_skip
+        
+        # 种子流：每次reset从中抽取一个回合种子，回合内的障碍物序列由回合种子完全确定，
+        # 因此任意一局都可以由 (episode_seed, 动作序列) 逐位复现
+        self.seed_rng = np.random.default_rng(seed)
+        self.episode_seed = None
+        self.rng = None
+        
+        # 障碍物按x有序存放在预分配的环形缓冲区中，每步原地更新
+        self.obstacle_buffer = ObstacleBuffer()
+        
+        # 设置离散化参数后，get_state同时给出Q表行号state_code（见set_state_codec）
+        self.state_codec = None
+        self.state_code = None
+        
         # 游戏状态
         self.reset()
     
-    def reset(self):
-        """重置游戏环境"""
+    @property
+    def obstacles(self):
+        """当前障碍物列表（按x排序的字典，仅用于展示和调试）"""
+        return self.obstacle_buffer.to_dicts()
+    
+    def reset(self, seed=None, start_score=0):
+        """重置游戏环境，seed为空时从种子流中抽取新的回合种子
+        
+        start_score大于0时从该分数开始（游戏速度随分数增长，相当于从更高的难度开始）。
+        """
+        if seed is None:
+            seed = int(self.seed_rng.integers(2**63))
+        self.episode_seed = seed
+        self.rng = np.random.default_rng(seed)
+        
         self.dino_y = self.GROUND_Y - self.DINO_HEIGHT
         self.dino_velocity_y = 0
         self.is_jumping = False
         self.is_ducking = False
-        self.obstacles = []
-        self.score = 0
-        self.speed = self.GAME_SPEED
+        self.obstacle_buffer.clear()
+        self.score = start_score
+        self.speed = min(self.MAX_SPEED, self.GAME_SPEED + start_score * self.ACCELERATION)
         self.next_obstacle_distance = 120
         self.game_over = False
         
         return self.get_state()
     
-    def get_state(self):
-        """获取当前游戏状态向量"""
+    def snapshot(self):
+        """保存当前游戏状态（含障碍物和随机数发生器状态），可用restore精确恢复"""
+        obstacles = self.obstacle_buffer
+        order = [obstacles.slot(k) for k in range(obstacles.count)]
+        return (
+            self.dino_y, self.dino_velocity_y, self.is_jumping, self.is_ducking,
+            self.score, self.speed, self.next_obstacle_distance, self.game_over, self.episode_seed,
+            [(obstacles.x[i], obstacles.y[i], obstacles.width[i], obstacles.height[i], obstacles.is_cactus[i])
+             for i in order],
+            obstacles.ahead,
+            self.rng.bit_generator.state
+        )
+    
+    def restore(self, snapshot):
+        """恢复snapshot保存的游戏状态，之后的障碍物序列与保存时继续运行完全一致"""
+        (self.dino_y, self.dino_velocity_y, self.is_jumping, self.is_ducking,
+         self.score, self.speed, self.next_obstacle_distance, self.game_over, self.episode_seed,
+         obstacles, ahead, rng_state) = snapshot
+        
+        buffer = self.obstacle_buffer
+        buffer.clear()
+        for obstacle in obstacles:
+            buffer.push(*obstacle)
+        buffer.ahead = ahead
+        
+        self.rng.bit_generator.state = rng_state
+        
+        return self.get_state()
+    
+    def get_state(self, out=None):
+        """获取当前游戏状态向量（out为预分配的数组时原地写入并返回out，不分配新数组）"""
         # 状态特征：
         # 1. 恐龙Y位置（归一化）
         # 2. 恐龙垂直速度（归一化）
@@ -51,7 +208,7 @@ class DinoEnvironment:
         # 5-8. 最近障碍物信息（距离、高度、类型、是否存在）
         # 9. 游戏速度（归一化）
         
-        state = np.zeros(9)
+        state = np.zeros(9) if out is None else out
         
         # 恐龙状态
         state[0] = (self.dino_y - (self.GROUND_Y - self.DINO_HEIGHT)) / 100.0  # Y位置
@@ -59,15 +216,18 @@ class DinoEnvironment:
         state[2] = 1.0 if self.is_jumping else 0.0
         state[3] = 1.0 if self.is_ducking else 0.0
         
-        # 最近障碍物信息
-        nearest_obstacle = self.get_nearest_obstacle()
-        if nearest_obstacle:
-            state[4] = min(nearest_obstacle['distance'] / 200.0, 1.0)  # 距离
-            state[5] = nearest_obstacle['y'] / self.CANVAS_HEIGHT  # 高度
-            state[6] = 1.0 if nearest_obstacle['type'] == 'cactus' else 0.0  # 类型
+        # 最近障碍物信息（缓存的前方最近障碍物槽位）
+        obstacles = self.obstacle_buffer
+        i = obstacles.nearest()
+        if i >= 0:
+            distance = min((obstacles.x[i] - self.DINO_X) / 200.0, 1.0)  # 距离
+            state[4] = distance
+            state[5] = obstacles.y[i] / self.CANVAS_HEIGHT  # 高度
+            state[6] = 1.0 if obstacles.is_cactus[i] else 0.0  # 类型
             state[7] = 1.0  # 存在障碍物
         else:
-            state[4] = 1.0  # 无障碍物时距离设为最大
+            distance = 1.0  # 无障碍物时距离设为最大
+            state[4] = distance
             state[5] = 0.0
             state[6] = 0.0
             state[7] = 0.0
@@ -75,21 +235,118 @@ class DinoEnvironment:
         # 游戏速度
         state[8] = (self.speed - self.GAME_SPEED) / (self.MAX_SPEED - self.GAME_SPEED)
         
+        if self.state_codec is not None:
+            self._update_state_code(i, distance)
+        
         return state
     
+    def set_state_codec(self, codec):
+        """设置离散化参数（QLearningAgent.state_codec()），之后每次get_state同时更新state_code
+        
+        state_code与agent.discretize_state(get_state())相同，但只重新计算有变化的特征：
+        恐龙的四个特征由 (位置, 速度, 跳跃, 下蹲) 决定，而每次跳跃的轨迹都相同，按该组合缓存；
+        障碍物的高度和类型只在最近障碍物的种类变化时重新计算；每帧只有距离和速度需要重新离散化。
+        """
+        self.state_codec = codec
+        self._dino_codes = {}
+        self._obstacle_key = None
+        self._obstacle_code = 0
+        if codec is not None:
+            # 每帧都要离散化的特征，参数展开为属性
+            self._distance_codec = codec[0][4]
+            self._speed_codec = codec[0][8]
+            self.get_state()
+    
+    @classmethod
+    def dino_states(cls):
+        """恐龙自身的四个状态特征 (Y位置, 垂直速度, 跳跃, 下蹲) 在游戏中可能出现的全部取值
+        
+        恐龙只会站立、在地面下蹲或跳跃，而每次跳跃的轨迹都相同，
+        因此站立、下蹲加上一次完整跳跃的每一帧就覆盖了所有情况（帧跳过只取其中的一部分帧）。
+        """
+        env = cls(seed=0)
+        states = [env.reset()[:4], env.step(2)[0][:4]]
+        env.step(0)
+        while True:
+            state, _, _ = env.step(1)
+            states.append(state[:4])
+            if not env.is_jumping:
+                break
+        return np.array(states)
+    
+    @staticmethod
+    def _feature_code(value, codec):
+        """单个特征离散化后对行号的贡献（截断规则与QLearningAgent.discretize_state一致）"""
+        scale, low, high, multiplier = codec
+        discrete_value = int(value * scale)
+        if discrete_value < low:
+            discrete_value = low
+        elif discrete_value > high:
+            discrete_value = high
+        return discrete_value * multiplier
+    
+    def _update_state_code(self, i, distance):
+        """增量更新state_code，i为最近障碍物槽位（-1表示没有），distance为归一化距离"""
+        codec, offset, dino_rows = self.state_codec
+        feature_code = self._feature_code
+        
+        dino_key = (self.dino_y, self.dino_velocity_y, self.is_jumping, self.is_ducking)
+        dino_code = self._dino_codes.get(dino_key)
+        if dino_code is None:
+            # 恐龙特征的编码经查找表映射为所在行块的起点
+            dino_code = self._dino_codes[dino_key] = dino_rows[offset + (
+                feature_code((self.dino_y - (self.GROUND_Y - self.DINO_HEIGHT)) / 100.0, codec[0]) +
+                feature_code(self.dino_velocity_y / 20.0, codec[1]) +
+                feature_code(1.0 if self.is_jumping else 0.0, codec[2]) +
+                feature_code(1.0 if self.is_ducking else 0.0, codec[3])
+            )]
+        
+        obstacles = self.obstacle_buffer
+        # 障碍物的高度和类型一一对应，高度相同即特征相同
+        obstacle_key = obstacles.y[i] if i >= 0 else None
+        if obstacle_key != self._obstacle_key:
+            self._obstacle_key = obstacle_key
+            if i >= 0:
+                self._obstacle_code = (feature_code(obstacles.y[i] / self.CANVAS_HEIGHT, codec[5]) +
+                                       feature_code(1.0 if obstacles.is_cactus[i] else 0.0, codec[6]) +
+                                       feature_code(1.0, codec[7]))
+            else:
+                self._obstacle_code = (feature_code(0.0, codec[5]) + feature_code(0.0, codec[6]) +
+                                       feature_code(0.0, codec[7]))
+        
+        # 距离和速度每帧都在变化，直接计算
+        self.state_code = (dino_code + self._obstacle_code + feature_code(distance, self._distance_codec) +
+                           feature_code((self.speed - self.GAME_SPEED) / (self.MAX_SPEED - self.GAME_SPEED),
+                                        self._speed_codec))
+    
     def get_nearest_obstacle(self):
         """获取最近的障碍物"""
-        for obstacle in self.obstacles:
-            if obstacle['x'] > self.DINO_X:
-                return {
-                    'distance': obstacle['x'] - self.DINO_X,
-                    'y': obstacle['y'],
-                    'type': obstacle['type']
-                }
-        return None
+        obstacles = self.obstacle_buffer
+        i = obstacles.nearest()
+        if i < 0:
+            return None
+        
+        return {
+            'distance': obstacles.x[i] - self.DINO_X,
+            'y': obstacles.y[i],
+            'type': 'cactus' if obstacles.is_cactus[i] else 'pterodactyl'
+        }
+    
+    def step(self, action, out=None):
+        """执行动作并更新环境（frame_skip大于1时重复动作推进多帧，游戏结束即停止）
+        
+        out为预分配的状态数组时原地写入新状态，调用方需保证它不是仍在使用的当前状态。
+        """
+        reward = self._advance_frame(action)
+        for _ in range(self.frame_skip - 1):
+            if self.game_over:
+                break
+            reward += self._advance_frame(action)
+        
+        return self.get_state(out), reward, self.game_over
     
-    def step(self, action):
-        """执行动作并更新环境"""
+    def _advance_frame(self, action):
+        """推进一帧物理，返回该帧奖励（不构造状态向量）"""
         # 动作：0=无动作, 1=跳跃, 2=下蹲
         if action == 1 and not self.is_jumping and not self.is_ducking:
             self.dino_velocity_y = self.JUMP_FORCE
@@ -116,12 +373,10 @@ class DinoEnvironment:
         self.next_obstacle_distance -= self.speed
         if self.next_obstacle_distance <= 0:
             self.spawn_obstacle()
-            self.next_obstacle_distance = random.randint(120, 200)
+            self.next_obstacle_distance = int(self.rng.integers(120, 201))
         
-        # 更新障碍物位置
-        self.obstacles = [obs for obs in self.obstacles if obs['x'] + obs['width'] > 0]
-        for obstacle in self.obstacles:
-            obstacle['x'] -= self.speed
+        # 移除离开画布的障碍物并原地更新位置
+        self.obstacle_buffer.advance(self.speed, self.DINO_X)
         
         # 碰撞检测
         collision = self.check_collision()
@@ -137,52 +392,35 @@ class DinoEnvironment:
         if collision or self.score >= self.MAX_SCORE:
             self.game_over = True
         
-        return self.get_state(), reward, self.game_over
+        return reward
     
     def spawn_obstacle(self):
         """生成障碍物"""
-        obstacle_type = 'pterodactyl' if random.random() > 0.7 else 'cactus'
-        
-        if obstacle_type == 'cactus':
-            obstacle = {
-                'x': self.CANVAS_WIDTH,
-                'y': self.GROUND_Y - 35,
-                'width': 17,
-                'height': 35,
-                'type': 'cactus'
-            }
+        if self.rng.random() > 0.7:
+            self.obstacle_buffer.push(self.CANVAS_WIDTH, self.GROUND_Y - 80, 46, 40, False)
         else:
-            obstacle = {
-                'x': self.CANVAS_WIDTH,
-                'y': self.GROUND_Y - 80,
-                'width': 46,
-                'height': 40,
-                'type': 'pterodactyl'
-            }
-        
-        self.obstacles.append(obstacle)
+            self.obstacle_buffer.push(self.CANVAS_WIDTH, self.GROUND_Y - 35, 17, 35, True)
     
     def check_collision(self):
         """检查碰撞"""
-        dino_rect = {
-            'x': self.DINO_X + 5,
-            'y': self.dino_y + 5,
-            'width': self.DINO_WIDTH - 10,
-            'height': (26 if self.is_ducking else self.DINO_HEIGHT) - 10
-        }
+        dino_x = self.DINO_X + 5
+        dino_y = self.dino_y + 5
+        dino_right = dino_x + (self.DINO_WIDTH - 10)
+        dino_bottom = dino_y + ((26 if self.is_ducking else self.DINO_HEIGHT) - 10)
         
-        for obstacle in self.obstacles:
-            obs_rect = {
-                'x': obstacle['x'] + 5,
-                'y': obstacle['y'] + 5,
-                'width': obstacle['width'] - 10,
-                'height': obstacle['height'] - 10
-            }
+        obstacles = self.obstacle_buffer
+        for k in range(obstacles.count):
+            i = obstacles.slot(k)
+            obs_x = obstacles.x[i] + 5
+            
+            # 障碍物按x有序，之后的障碍物都在恐龙右侧
+            if dino_right <= obs_x:
+                break
             
-            if (dino_rect['x'] < obs_rect['x'] + obs_rect['width'] and
-                dino_rect['x'] + dino_rect['width'] > obs_rect['x'] and
-                dino_rect['y'] < obs_rect['y'] + obs_rect['height'] and
-                dino_rect['y'] + dino_rect['height'] > obs_rect['y']):
+            obs_y = obstacles.y[i] + 5
+            if (dino_x < obs_x + (obstacles.width[i] - 10) and
+                dino_y < obs_y + (obstacles.height[i] - 10) and
+                dino_bottom > obs_y):
                 return True
         
         return False
@@ -195,11 +433,10 @@ class DinoEnvironment:
         reward = 1  # 存活奖励
         
         # 根据距离障碍物的距离给予奖励
-        nearest_obstacle = self.get_nearest_obstacle()
-        if nearest_obstacle:
-            distance = nearest_obstacle['distance']
-            if distance < 50:  # 成功避开近距离障碍物
-                reward += 5
+        obstacles = self.obstacle_buffer
+        i = obstacles.nearest()
+        if i >= 0 and obstacles.x[i] - self.DINO_X < 50:  # 成功避开近距离障碍物
+            reward += 5
         
         # 分数奖励
         if self.score > 0 and int(self.score) % 100 == 0:
@@ -208,11 +445,289 @@ class DinoEnvironment:
         return reward
 
 
+class BatchDinoEnvironment:
+    """批量Dino游戏环境：用NumPy数组同时推进N局游戏"""
+    
+    # 同一局内同时存在的障碍物上限（生成间距>=120像素，屏幕宽度约容纳8个）
+    MAX_OBSTACLES = 12
+    
+    def __init__(self, num_envs, seeds=None, max_steps=None, frame_skip=1):
+        # 与DinoEnvironment共用同一套物理常量
+        template = DinoEnvironment(seed=0)
+        for name, value in vars(template).items():
+            if name.isupper():
+                setattr(self, name, value)
+        
+        self.num_envs = num_envs
+        self.max_steps = max_steps
+        self.frame_skip = frame_skip
+        
+        # 每局游戏独立的种子流和回合随机数生成器，保证与单个DinoEnvironment逐位一致
+        if seeds is None:
+            seeds = [None] * num_envs
+        if len(seeds) != num_envs:
+            raise ValueError(f"seeds数量({len(seeds)})与环境数量({num_envs})不一致")
+        self.seed_rngs = [np.random.default_rng(seed) for seed in seeds]
+        self.rngs = [None] * num_envs
+        self.episode_seeds = np.zeros(num_envs, dtype=np.int64)
+        
+        # 恐龙状态
+        self.dino_y = np.zeros(num_envs)
+        self.dino_velocity_y = np.zeros(num_envs)
+        self.is_jumping = np.zeros(num_envs, dtype=bool)
+        self.is_ducking = np.zeros(num_envs, dtype=bool)
+        
+        # 游戏状态
+        self.score = np.zeros(num_envs)
+        self.speed = np.zeros(num_envs)
+        self.next_obstacle_distance = np.zeros(num_envs)
+        self.game_over = np.zeros(num_envs, dtype=bool)
+        self.steps = np.zeros(num_envs, dtype=np.int64)
+        
+        # 障碍物（固定形状的槽位数组）
+        shape = (num_envs, self.MAX_OBSTACLES)
+        self.obstacle_x = np.zeros(shape)
+        self.obstacle_y = np.zeros(shape)
+        self.obstacle_width = np.zeros(shape)
+        self.obstacle_height = np.zeros(shape)
+        self.obstacle_is_cactus = np.zeros(shape, dtype=bool)
+        self.obstacle_active = np.zeros(shape, dtype=bool)
+        
+        # 已结束游戏的终局状态与分数（自动重置前保存）
+        self.final_states = np.zeros((num_envs, 9))
+        self.final_scores = np.zeros(num_envs)
+        
+        self._all = np.ones(num_envs, dtype=bool)
+        self._finalized = np.zeros(num_envs, dtype=bool)
+        self.reset()
+    
+    def reset(self, mask=None, episode_seeds=None):
+        """重置全部（或mask选中的）游戏，返回全部状态
+        
+        episode_seeds按顺序给出各选中游戏的回合种子，为空时从各自的种子流中抽取。
+        """
+        if mask is None:
+            mask = self._all
+        
+        for k, i in enumerate(np.flatnonzero(mask)):
+            if episode_seeds is None:
+                seed = int(self.seed_rngs[i].integers(2**63))
+            else:
+                seed = int(episode_seeds[k])
+            self.episode_seeds[i] = seed
+            self.rngs[i] = np.random.default_rng(seed)
+        
+        self.dino_y[mask] = self.GROUND_Y - self.DINO_HEIGHT
+        self.dino_velocity_y[mask] = 0
+        self.is_jumping[mask] = False
+        self.is_ducking[mask] = False
+        self.obstacle_active[mask] = False
+        self.score[mask] = 0
+        self.speed[mask] = self.GAME_SPEED
+        self.next_obstacle_distance[mask] = 120
+        self.game_over[mask] = False
+        self.steps[mask] = 0
+        
+        return self.get_state()
+    
+    def _nearest_obstacle(self):
+        """返回每局最近前方障碍物的(是否存在, 距离, 槽位索引)"""
+        ahead = self.obstacle_active & (self.obstacle_x > self.DINO_X)
+        # 障碍物同速左移且从同一位置生成，x最小者即为列表中的第一个
+        index = np.argmin(np.where(ahead, self.obstacle_x, np.inf), axis=1)
+        rows = np.arange(self.num_envs)
+        exists = ahead[rows, index]
+        distance = self.obstacle_x[rows, index] - self.DINO_X
+        return exists, distance, index
+    
+    def get_state(self):
+        """获取全部游戏的状态矩阵 (N, 9)"""
+        state = np.zeros((self.num_envs, 9))
+        
+        # 恐龙状态
+        state[:, 0] = (self.dino_y - (self.GROUND_Y - self.DINO_HEIGHT)) / 100.0
+        state[:, 1] = self.dino_velocity_y / 20.0
+        state[:, 2] = self.is_jumping
+        state[:, 3] = self.is_ducking
+        
+        # 最近障碍物信息
+        exists, distance, index = self._nearest_obstacle()
+        rows = np.arange(self.num_envs)
+        state[:, 4] = np.where(exists, np.minimum(distance / 200.0, 1.0), 1.0)
+        state[:, 5] = np.where(exists, self.obstacle_y[rows, index] / self.CANVAS_HEIGHT, 0.0)
+        state[:, 6] = exists & self.obstacle_is_cactus[rows, index]
+        state[:, 7] = exists
+        
+        # 游戏速度
+        state[:, 8] = (self.speed - self.GAME_SPEED) / (self.MAX_SPEED - self.GAME_SPEED)
+        
+        return state
+    
+    def step(self, actions):
+        """对全部游戏执行一步，已结束的游戏自动重置
+        
+        frame_skip大于1时重复动作推进多帧，奖励按帧累计；中途结束的游戏
+        不再累计奖励，其终局状态取结束的那一帧。
+        返回 (states, rewards, terminals, truncated)：terminals为真正结束（撞到障碍物）的游戏，
+        truncated为达到max_steps被截断的游戏（截断的经验仍应自举）；两者之一为真的游戏
+        都已自动重置，其终局状态和分数分别保存在 final_states 和 final_scores 中。
+        """
+        actions = np.asarray(actions)
+        rewards = self._advance_frame(actions)
+        ended = self.game_over.copy()
+        
+        for _ in range(self.frame_skip - 1):
+            if ended.all():
+                break
+            if ended.any():
+                # 中途结束的游戏记录当帧的终局结果；之后它仍随批量推进，但结果在自动重置时丢弃
+                self._record_final(ended & ~self._finalized, self.get_state())
+            
+            frame_rewards = self._advance_frame(actions)
+            rewards += np.where(ended, 0.0, frame_rewards)
+            ended |= self.game_over
+        
+        self.steps += 1
+        
+        states = self.get_state()
+        if self.max_steps is not None:
+            truncated = ~ended & (self.steps >= self.max_steps)
+        else:
+            truncated = np.zeros(self.num_envs, dtype=bool)
+        dones = ended | truncated
+        
+        # 自动重置已结束的游戏
+        if dones.any():
+            self._record_final(dones & ~self._finalized, states)
+            self._finalized[:] = False
+            states = self.reset(dones)
+        
+        return states, rewards, ended, truncated
+    
+    def _record_final(self, mask, states):
+        """保存mask选中游戏的终局状态和分数"""
+        self.final_states[mask] = states[mask]
+        self.final_scores[mask] = self.score[mask]
+        self._finalized |= mask
+    
+    def _advance_frame(self, actions):
+        """对全部游戏推进一帧物理，返回该帧奖励"""
+        # 动作：0=无动作, 1=跳跃, 2=下蹲
+        jump = (actions == 1) & ~self.is_jumping & ~self.is_ducking
+        self.dino_velocity_y[jump] = self.JUMP_FORCE
+        self.is_jumping |= jump
+        self.is_ducking |= (actions == 2) & ~self.is_jumping
+        self.is_ducking &= actions != 0
+        
+        # 更新恐龙物理
+        jumping = self.is_jumping
+        self.dino_velocity_y = np.where(jumping, self.dino_velocity_y + self.GRAVITY, self.dino_velocity_y)
+        self.dino_y = np.where(jumping, self.dino_y + self.dino_velocity_y, self.dino_y)
+        landed = jumping & (self.dino_y >= self.GROUND_Y - self.DINO_HEIGHT)
+        self.dino_y[landed] = self.GROUND_Y - self.DINO_HEIGHT
+        self.is_jumping[landed] = False
+        self.dino_velocity_y[landed] = 0
+        
+        # 更新游戏速度
+        self.speed = np.minimum(self.MAX_SPEED, self.GAME_SPEED + self.score * self.ACCELERATION)
+        
+        # 生成障碍物（仅对需要生成的游戏逐个抽取随机数）
+        self.next_obstacle_distance -= self.speed
+        for i in np.flatnonzero(self.next_obstacle_distance <= 0):
+            self.spawn_obstacle(i)
+            self.next_obstacle_distance[i] = self.rngs[i].integers(120, 201)
+        
+        # 更新障碍物位置
+        self.obstacle_active &= self.obstacle_x + self.obstacle_width > 0
+        self.obstacle_x = np.where(self.obstacle_active, self.obstacle_x - self.speed[:, None], self.obstacle_x)
+        
+        # 碰撞检测
+        collision = self.check_collision()
+        
+        # 计算奖励
+        rewards = self.calculate_reward(collision)
+        
+        # 更新分数
+        self.score = np.where(collision, self.score, self.score + 0.1)
+        
+        # 检查游戏结束
+        self.game_over = collision | (self.score >= self.MAX_SCORE)
+        
+        return rewards
+    
+    def spawn_obstacle(self, i):
+        """在第i局游戏中生成障碍物"""
+        free = np.flatnonzero(~self.obstacle_active[i])
+        if len(free) == 0:
+            raise RuntimeError(f"障碍物槽位不足: MAX_OBSTACLES={self.MAX_OBSTACLES}")
+        slot = free[0]
+        
+        is_cactus = not self.rngs[i].random() > 0.7
+        self.obstacle_x[i, slot] = self.CANVAS_WIDTH
+        if is_cactus:
+            self.obstacle_y[i, slot] = self.GROUND_Y - 35
+            self.obstacle_width[i, slot] = 17
+            self.obstacle_height[i, slot] = 35
+        else:
+            self.obstacle_y[i, slot] = self.GROUND_Y - 80
+            self.obstacle_width[i, slot] = 46
+            self.obstacle_height[i, slot] = 40
+        self.obstacle_is_cactus[i, slot] = is_cactus
+        self.obstacle_active[i, slot] = True
+    
+    def check_collision(self):
+        """检查每局游戏是否发生碰撞"""
+        dino_x = self.DINO_X + 5
+        dino_y = (self.dino_y + 5)[:, None]
+        dino_width = self.DINO_WIDTH - 10
+        dino_height = (np.where(self.is_ducking, 26, self.DINO_HEIGHT) - 10)[:, None]
+        
+        obs_x = self.obstacle_x + 5
+        obs_y = self.obstacle_y + 5
+        obs_width = self.obstacle_width - 10
+        obs_height = self.obstacle_height - 10
+        
+        hit = (self.obstacle_active &
+               (dino_x < obs_x + obs_width) &
+               (dino_x + dino_width > obs_x) &
+               (dino_y < obs_y + obs_height) &
+               (dino_y + dino_height > obs_y))
+        
+        return hit.any(axis=1)
+    
+    def calculate_reward(self, collision):
+        """计算每局游戏的奖励"""
+        reward = np.ones(self.num_envs)  # 存活奖励
+        
+        # 根据距离障碍物的距离给予奖励
+        exists, distance, _ = self._nearest_obstacle()
+        reward += np.where(exists & (distance < 50), 5, 0)
+        
+        # 分数奖励
+        reward += np.where((self.score > 0) & (self.score.astype(np.int64) % 100 == 0), 10, 0)
+        
+        return np.where(collision, -100.0, reward)
+
+
 class QLearningAgent:
     """Q-Learning智能体"""
     
+    # 离散化后各特征的取值范围（含两端），超出范围的值会被截断到边界
+    # 顺序与DinoEnvironment.get_state一致：Y位置、垂直速度、跳跃、下蹲、
+    # 障碍物距离、高度、类型、是否存在、游戏速度
+    # 障碍物高度（y / 画布高度）取整后恒为0，只占一个取值
+    STATE_BOUNDS = ((-12, 0), (-6, 6), (0, 1), (0, 1), (0, 10), (0, 0), (0, 1), (0, 1), (0, 10))
+    
+    # 连续值特征（乘以10后取整，分为10个区间）
+    CONTINUOUS_FEATURES = (0, 1, 4, 8)
+    
+    # 前4个特征描述恐龙自身（Y位置、垂直速度、跳跃、下蹲），13×13×2×2种组合中只有二十多种可达
+    DINO_FEATURES = 4
+    
     def __init__(self, state_size=9, action_size=3, learning_rate=0.001, 
-                 epsilon=1.0, epsilon_decay=0.995, epsilon_min=0.01, gamma=0.95):
+                 epsilon=1.0, epsilon_decay=0.995, epsilon_min=0.01, gamma=0.95,
+                 memory_size=10000, prioritized_replay=False, seed=None,
+                 n_step=1, trace_lambda=0.0, trace_interval=0):
         self.state_size = state_size
         self.action_size = action_size
         self.learning_rate = learning_rate
@@ -221,106 +736,434 @@ class QLearningAgent:
         self.epsilon_min = epsilon_min
         self.gamma = gamma
         
-        # Q表（使用字典存储状态-动作值）
-        self.q_table = {}
+        # 多步更新：n_step大于1时使用n步回报，trace_lambda大于0时使用λ回报（Peng's Q(λ)的前向视角）。
+        # 经验先写入轨迹缓冲区，每trace_interval步（0表示只在回合结束时）做一次向量化更新
+        if n_step < 1 or not 0.0 <= trace_lambda <= 1.0:
+            raise ValueError(f"无效的多步参数: n_step={n_step}, trace_lambda={trace_lambda}")
+        self.n_step = n_step
+        self.trace_lambda = trace_lambda
+        self.trace_interval = trace_interval
+        self.trajectory = Trajectory() if n_step > 1 or trace_lambda > 0 else None
+        # n步回报的最后n_step-1步要等窗口完整后才能更新
+        self._trajectory_flush_length = trace_interval + (n_step - 1 if trace_lambda == 0 else 0)
         
-        # 经验回放
-        self.memory = deque(maxlen=10000)
+        # 状态编码：离散状态 -> Q表行号
+        # 恐龙特征的混合进制编码经查找表映射为行块的起点，其余特征的混合进制编码是块内偏移；
+        # 不可达的恐龙特征组合共用最后一个行块（训练中不会出现，Q值保持为0）
+        bounds = np.array(self.STATE_BOUNDS[:state_size], dtype=np.int64)
+        self.state_low = bounds[:, 0]
+        self.state_high = bounds[:, 1]
+        radix = self.state_high - self.state_low + 1
+        n = self.DINO_FEATURES
+        self.state_multipliers = np.concatenate([self._radix_multipliers(radix[:n]),
+                                                 self._radix_multipliers(radix[n:])])
+        self.feature_scale = np.array([10 if i in self.CONTINUOUS_FEATURES else 1
+                                       for i in range(state_size)])
+        self._feature_codec = list(zip(self.feature_scale.tolist(), self.state_low.tolist(),
+                                       self.state_high.tolist(), self.state_multipliers.tolist()))
+        self._dino_codec = self._feature_codec[:n]
+        self._block_codec = self._feature_codec[n:]
+        self._code_offset = -int(self.state_low[:n] @ self.state_multipliers[:n])
         
-        # 训练统计
+        dino_states = DinoEnvironment.dino_states()
+        dino_discrete = np.clip((dino_states * self.feature_scale[:n]).astype(np.int64),
+                                self.state_low[:n], self.state_high[:n])
+        self.dino_codes = np.unique(dino_discrete @ self.state_multipliers[:n] + self._code_offset)
+        block_size = int(np.prod(radix[n:]))
+        dino_blocks = np.full(int(np.prod(radix[:n])), len(self.dino_codes), dtype=np.int64)
+        dino_blocks[self.dino_codes] = np.arange(len(self.dino_codes))
+        self._dino_rows = dino_blocks * block_size - int(self.state_low[n:] @ self.state_multipliers[n:])
+        self._dino_row_list = self._dino_rows.tolist()
+        self.num_states = (len(self.dino_codes) + 1) * block_size
+        
+        # Q表（按状态编码索引的稠密数组，未访问状态的Q值为0）
+        self.q_table = np.zeros((self.num_states, action_size))
+        
+        # 多进程训练时记录上次同步之后更新过的Q表行号（None表示不记录）
+        self.updated_rows = None
+        
+        # 探索和经验采样使用各自独立的随机数流
+        explore_seed, replay_seed = spawn_seeds(seed, 2)
+        self.rng = np.random.default_rng(explore_seed)
+        self._uniform = UniformStream(self.rng)
+        
+        # 经验回放（预分配的环形缓冲区）
+        replay_rng = np.random.default_rng(replay_seed)
+        if prioritized_replay:
+            self.memory = PrioritizedReplayBuffer(memory_size, state_size, rng=replay_rng)
+        else:
+            self.memory = ReplayBuffer(memory_size, state_size, rng=replay_rng)
+        
+        # 上次保存之后结束的回合统计，保存时写入 .stats 文件并清空，内存占用不随训练长度增长
         self.episode_rewards = []
         self.episode_scores = []
     
+    @staticmethod
+    def _radix_multipliers(radix):
+        """混合进制编码各位的乘数（最后一位为1）"""
+        return np.concatenate([np.cumprod(radix[::-1])[::-1][1:], [1]]).astype(np.int64)
+    
     def discretize_state(self, state):
-        """将连续状态离散化"""
-        # 将状态值量化为离散区间
-        discrete_state = []
-        for i, value in enumerate(state):
-            if i in [0, 1, 4, 8]:  # 连续值特征
-                discrete_value = int(value * 10)  # 分为10个区间
-            else:  # 二进制特征
-                discrete_value = int(value)
-            discrete_state.append(discrete_value)
-        
-        return tuple(discrete_state)
+        """将连续状态离散化为Q表行号"""
+        # 纯Python标量循环，单个状态时比NumPy向量运算的调用开销更小
+        values = state.tolist()
+        
+        # 恐龙特征的编码查表得到行块起点，再加上其余特征的块内偏移
+        code = self._code_offset
+        for value, (scale, low, high, multiplier) in zip(values, self._dino_codec):
+            discrete_value = int(value * scale)
+            if discrete_value < low:
+                discrete_value = low
+            elif discrete_value > high:
+                discrete_value = high
+            code += discrete_value * multiplier
+        
+        code = self._dino_row_list[code]
+        for value, (scale, low, high, multiplier) in zip(values[self.DINO_FEATURES:], self._block_codec):
+            discrete_value = int(value * scale)
+            if discrete_value < low:
+                discrete_value = low
+            elif discrete_value > high:
+                discrete_value = high
+            code += discrete_value * multiplier
+        
+        return code
+    
+    def discretize_batch(self, states):
+        """将 (N, state_size) 状态矩阵一次性离散化为行号数组"""
+        # astype向零截断，与int()一致
+        return self.encode_batch((np.asarray(states) * self.feature_scale).astype(np.int64))
+    
+    def encode_batch(self, discrete):
+        """将 (N, state_size) 离散状态矩阵编码为行号数组（超出范围的值截断到边界）"""
+        discrete = np.clip(discrete, self.state_low, self.state_high)
+        n = self.DINO_FEATURES
+        dino_codes = discrete[:, :n] @ self.state_multipliers[:n] + self._code_offset
+        return self._dino_rows[dino_codes] + discrete[:, n:] @ self.state_multipliers[n:]
+    
+    def state_codec(self):
+        """离散化参数，供DinoEnvironment直接给出Q表行号
+        
+        (各特征的(缩放, 下界, 上界, 乘数), 恐龙特征编码的偏移, 恐龙特征编码 -> 行块起点的查找表)
+        """
+        return self._feature_codec, self._code_offset, self._dino_row_list
+    
+    def encode_state(self, discrete_state):
+        """将离散状态元组编码为Q表行号"""
+        return int(self.encode_batch(np.asarray([discrete_state], dtype=np.int64))[0])
     
     def get_action(self, state):
         """选择动作（ε-贪婪策略）"""
-        discrete_state = self.discretize_state(state)
+        if self._uniform.random() < self.epsilon:
+            return int(self._uniform.random() * self.action_size)
         
-        if random.random() < self.epsilon:
-            return random.randint(0, self.action_size - 1)
+        return self.greedy_action(state)
+    
+    def get_action_code(self, code):
+        """按Q表行号选择动作（ε-贪婪策略，与get_action消耗相同的随机数）"""
+        if self._uniform.random() < self.epsilon:
+            return int(self._uniform.random() * self.action_size)
+        
+        return self.greedy_code(code)
+    
+    def get_actions(self, states):
+        """为一批状态选择动作（ε-贪婪策略）"""
+        actions = self.greedy_actions(states)
         
-        if discrete_state not in self.q_table:
-            self.q_table[discrete_state] = np.zeros(self.action_size)
+        explore = self.rng.random(len(actions)) < self.epsilon
+        actions[explore] = self.rng.integers(0, self.action_size, size=int(explore.sum()))
         
-        return np.argmax(self.q_table[discrete_state])
+        return actions
+    
+    def greedy_action(self, state):
+        """按Q值选择最优动作（推理用，不探索也不修改epsilon）"""
+        return self.greedy_code(self.discretize_state(state))
+    
+    def greedy_code(self, code):
+        """按Q表行号选择最优动作"""
+        q_values = self.q_table[code].tolist()
+        return q_values.index(max(q_values))
+    
+    def greedy_actions(self, states):
+        """为一批状态按Q值选择最优动作"""
+        return np.argmax(self.q_table[self.discretize_batch(states)], axis=1)
     
     def update_q_table(self, state, action, reward, next_state, done):
         """更新Q表"""
-        discrete_state = self.discretize_state(state)
-        discrete_next_state = self.discretize_state(next_state)
-        
-        if discrete_state not in self.q_table:
-            self.q_table[discrete_state] = np.zeros(self.action_size)
-        
-        if discrete_next_state not in self.q_table:
-            self.q_table[discrete_next_state] = np.zeros(self.action_size)
+        self.update_code(self.discretize_state(state), action, reward, self.discretize_state(next_state), done)
+    
+    def update_code(self, discrete_state, action, reward, discrete_next_state, done):
+        """按Q表行号更新Q表（启用多步更新时写入轨迹缓冲区，按间隔和在回合结束时批量更新）"""
+        trajectory = self.trajectory
+        if trajectory is not None:
+            trajectory.add(discrete_state, action, reward, discrete_next_state)
+            if done:
+                self.update_trajectory(done=True)
+            elif self.trace_interval and len(trajectory) >= self._trajectory_flush_length:
+                self.update_trajectory(final=False)
+            return
         
         # Q-Learning更新公式
-        current_q = self.q_table[discrete_state][action]
+        current_q = self.q_table.item(discrete_state, action)
         
         if done:
             target_q = reward
         else:
-            target_q = reward + self.gamma * np.max(self.q_table[discrete_next_state])
+            target_q = reward + self.gamma * max(self.q_table[discrete_next_state].tolist())
         
         # 更新Q值
-        self.q_table[discrete_state][action] = current_q + self.learning_rate * (target_q - current_q)
+        self.q_table[discrete_state, action] = current_q + self.learning_rate * (target_q - current_q)
+        if self.updated_rows is not None:
+            self.updated_rows.add(discrete_state)
+    
+    def update_batch(self, states, actions, rewards, next_states, dones, weights=None):
+        """对一批经验做一次向量化Q表更新，返回TD误差
+        
+        同一批次中重复出现的(状态, 动作)只保留最后一次更新；
+        weights为优先级回放的重要性采样权重，按比例缩放各条经验的学习率。
+        """
+        codes = self.discretize_batch(states)
+        next_codes = self.discretize_batch(next_states)
+        
+        current_q = self.q_table[codes, actions]
+        target_q = np.where(dones, rewards, rewards + self.gamma * np.max(self.q_table[next_codes], axis=1))
+        td_errors = target_q - current_q
+        
+        step = self.learning_rate * td_errors
+        if weights is not None:
+            step *= weights
+        self.q_table[codes, actions] = current_q + step
+        if self.updated_rows is not None:
+            self.updated_rows.update(codes.tolist())
+        
+        return td_errors
+    
+    def update_trajectory(self, done=False, final=True):
+        """用轨迹缓冲区中的经验做一次向量化多步更新，返回更新的经验数
+        
+        done表示轨迹以终局结束（末尾不自举）；final为False时是回合中途的更新：
+        n步回报只更新窗口已完整的经验，λ回报在当前位置截断并用Q值自举。
+        """
+        trajectory = self.trajectory
+        length = len(trajectory)
+        if not length:
+            return 0
+        
+        codes = trajectory.codes[:length + 1]
+        actions = trajectory.actions[:length]
+        rewards = trajectory.rewards[:length]
+        
+        # 各步之后状态的自举值（更新前的Q表），终局之后为0
+        bootstrap = np.max(self.q_table[codes], axis=1)
+        if done:
+            bootstrap[length] = 0.0
+        
+        if self.trace_lambda > 0:
+            targets = lambda_targets(rewards, bootstrap, self.gamma, self.trace_lambda, bootstrap[length])
+            count = length
+        else:
+            targets = n_step_targets(rewards, bootstrap, self.gamma, self.n_step, bootstrap[length])
+            count = length if final else length - self.n_step + 1
+        
+        if count > 0:
+            self.apply_targets(codes[:count], actions[:count], targets[:count])
+        trajectory.keep_last(length - count)
+        
+        return max(count, 0)
+    
+    def end_episode(self):
+        """回合结束时调用：更新轨迹中剩余的经验（回合被截断时用最后状态的Q值自举）"""
+        if self.trajectory is not None:
+            self.update_trajectory()
+    
+    def apply_targets(self, codes, actions, targets):
+        """把一批目标值写入Q表
+        
+        同一(状态, 动作)在批内出现c次时，合并为按平均目标连续更新c次的效果：
+        Q += (1 - (1-α)^c) * (平均目标 - Q)，不会因批内重复而丢失更新或越过目标。
+        """
+        keys = codes * self.action_size + actions
+        unique, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        mean_targets = np.bincount(inverse, weights=targets) / counts
+        rows, columns = np.divmod(unique, self.action_size)
+        
+        current = self.q_table[rows, columns]
+        self.q_table[rows, columns] = current + (1 - (1 - self.learning_rate) ** counts) * (mean_targets - current)
+        if self.updated_rows is not None:
+            self.updated_rows.update(rows.tolist())
     
     def remember(self, state, action, reward, next_state, done):
         """存储经验"""
-        self.memory.append((state, action, reward, next_state, done))
+        self.memory.add(state, action, reward, next_state, done)
+    
+    def remember_batch(self, states, actions, rewards, next_states, dones):
+        """一次存储一批经验"""
+        self.memory.add_batch(states, actions, rewards, next_states, dones)
+    
+    def replay(self, batch_size=32):
+        """从经验回放中采样一个小批量做一次向量化Q表更新，返回TD误差（经验不足时返回None）"""
+        if len(self.memory) < batch_size:
+            return None
+        
+        indices, states, actions, rewards, next_states, dones, weights = self.memory.sample(batch_size)
+        td_errors = self.update_batch(states, actions, rewards, next_states, dones, weights)
+        self.memory.update_priorities(indices, td_errors)
+        
+        return td_errors
     
     def decay_epsilon(self):
         """衰减探索率"""
         if self.epsilon > self.epsilon_min:
             self.epsilon *= self.epsilon_decay
     
-    def save_model(self, filepath):
-        """保存模型"""
-        model_data = {
-            'q_table': dict(self.q_table),
-            'epsilon': self.epsilon,
-            'episode_rewards': self.episode_rewards,
-            'episode_scores': self.episode_scores
+    def ensure_writable(self):
+        """内存映射加载的只读Q表在训练前复制到内存"""
+        if not self.q_table.flags.writeable:
+            self.q_table = np.array(self.q_table)
+    
+    def model_array(self):
+        """检查点保存的模型数组"""
+        return self.q_table
+    
+    def model_metadata(self):
+        """模型文件头部的元数据"""
+        return {
+            'model_type': 'q_table',
+            'state_bounds': self.STATE_BOUNDS[:self.state_size],
+            'dino_codes': self.dino_codes.tolist(),
+            'epsilon': self.epsilon
         }
+    
+    def migrate_rows(self, codes, q_values, state_bounds, filepath):
+        """把旧版稠密布局（按state_bounds做混合进制编码，每种特征组合一行）中的行迁移到新的Q表"""
+        bounds = np.asarray(state_bounds, dtype=np.int64)
+        if bounds.shape != (self.state_size, 2):
+            raise ValueError(f"模型的状态离散化范围与当前版本不一致: {filepath}")
+        
+        discrete = np.stack(np.unravel_index(np.asarray(codes, dtype=np.int64), bounds[:, 1] - bounds[:, 0] + 1),
+                            axis=1) + bounds[:, 0]
+        q_table = np.zeros((self.num_states, self.action_size))
+        q_table[self.encode_batch(discrete)] = q_values
+        return q_table
+    
+    def take_unsaved_stats(self):
+        """取出上次保存之后结束的回合统计 (scores, rewards)"""
+        scores, self.episode_scores = self.episode_scores, []
+        rewards, self.episode_rewards = self.episode_rewards, []
+        return scores, rewards
+    
+    def save_model(self, filepath):
+        """保存模型（二进制Q表 + 只追加的回合统计文件）"""
+        model_store.save_array(filepath, self.q_table, self.model_metadata())
         
-        with open(filepath, 'wb') as f:
-            pickle.dump(model_data, f)
+        # 只追加上次保存之后结束的回合
+        scores, rewards = self.take_unsaved_stats()
+        if scores:
+            model_store.append_stats(filepath, scores, rewards)
     
-    def load_model(self, filepath):
-        """加载模型"""
-        if os.path.exists(filepath):
-            with open(filepath, 'rb') as f:
-                model_data = pickle.load(f)
+    def load_model(self, filepath, mmap=False):
+        """加载模型（兼容旧版pickle格式）
+        
+        mmap=True 时Q表以只读内存映射方式加载，适合推理服务；
+        二进制格式不加载历史回合统计，需要时用 model_store.load_stats 读取。
+        旧版每种特征组合占一行的稠密Q表在加载时迁移为当前布局（不使用内存映射）。
+        """
+        if not os.path.exists(filepath):
+            return False
+        
+        if model_store.is_model_file(filepath):
+            q_table, header = model_store.load_array(filepath, mmap=mmap)
+            if 'dino_codes' not in header:
+                rows = np.flatnonzero(q_table.any(axis=1))
+                q_table = self.migrate_rows(rows, q_table[rows], header.get('state_bounds'), filepath)
+            elif (header.get('state_bounds') != [list(bounds) for bounds in self.STATE_BOUNDS[:self.state_size]]
+                    or header['dino_codes'] != self.dino_codes.tolist()):
+                raise ValueError(f"模型的状态离散化范围与当前版本不一致: {filepath}")
             
-            self.q_table = model_data.get('q_table', {})
-            self.epsilon = model_data.get('epsilon', self.epsilon_min)
-            self.episode_rewards = model_data.get('episode_rewards', [])
-            self.episode_scores = model_data.get('episode_scores', [])
+            self.q_table = q_table
+            self.epsilon = header.get('epsilon', self.epsilon_min)
+            self.episode_rewards = []
+            self.episode_scores = []
             
             return True
-        return False
+        
+        # 旧版pickle格式：字典Q表或稀疏行数组，历史统计在下次保存时迁移到 .stats 文件
+        with open(filepath, 'rb') as f:
+            model_data = pickle.load(f)
+        
+        if 'q_values' in model_data:
+            self.q_table = self.migrate_rows(model_data['state_codes'], model_data['q_values'],
+                                             model_data['state_bounds'], filepath)
+        else:
+            self.q_table = np.zeros((self.num_states, self.action_size))
+            for discrete_state, q_values in model_data.get('q_table', {}).items():
+                self.q_table[self.encode_state(discrete_state)] = q_values
+        
+        self.epsilon = model_data.get('epsilon', self.epsilon_min)
+        self.episode_rewards = model_data.get('episode_rewards', [])
+        self.episode_scores = model_data.get('episode_scores', [])
+        
+        return True
 
 
 class DinoTrainer:
     """Dino AI训练器"""
     
-    def __init__(self):
-        self.env = DinoEnvironment()
-        self.agent = QLearningAgent()
-        self.model_path = 'dino_q_model.pkl'
+    # 动作编号对应的前端动作名称
+    ACTION_NAMES = ('none', 'jump', 'duck')
+    
+    # 可选的智能体类型
+    AGENT_TYPES = ('q_table', 'dqn')
+    
+    def __init__(self, replay_batch_size=0, replay_interval=4, prioritized_replay=False, agent_type='q_table',
+                 seed=None, frame_skip=1, telemetry_log=None, curriculum=False,
+                 n_step=1, trace_lambda=0.0, trace_interval=0, agent_params=None):
+        # 运行种子派生出环境、智能体、批量训练和课程调度各自的随机数流，相同种子的训练可完整复现
+        self.seed = seed
+        env_seed, agent_seed, self.batch_seeds, curriculum_seed = spawn_seeds(seed, 4)
+        
+        self.env = DinoEnvironment(seed=env_seed, frame_skip=frame_skip)
+        
+        # 课程训练：回合从更高分数或中局快照开始，并自适应截断（只用于单环境训练）
+        self.curriculum = CurriculumScheduler(self.env, seed=curriculum_seed) if curriculum else None
+        self.agent_type = agent_type
+        # 多步更新（n步回报或Q(λ)）只用于Q表智能体的单环境训练
+        self.multi_step = n_step > 1 or trace_lambda > 0
+        if agent_type == 'dqn':
+            if self.multi_step:
+                raise ValueError("n步回报和Q(λ)只支持 q_table 智能体")
+            self.agent = DQNAgent(prioritized_replay=prioritized_replay, seed=agent_seed)
+            self.model_path = 'dino_dqn_model.bin'
+            self.legacy_model_path = None
+        elif agent_type == 'q_table':
+            # agent_params为其余的智能体超参数（如learning_rate、gamma），用于超参数搜索和多进程训练
+            self.agent = QLearningAgent(prioritized_replay=prioritized_replay, seed=agent_seed,
+                                        n_step=n_step, trace_lambda=trace_lambda, trace_interval=trace_interval,
+                                        **(agent_params or {}))
+            self.model_path = 'dino_q_model.bin'
+            self.legacy_model_path = 'dino_q_model.pkl'
+        else:
+            raise ValueError(f"未知的智能体类型: {agent_type}")
+        
+        # Q表智能体直接使用环境增量计算的Q表行号，训练循环中不再逐步离散化状态向量
+        if agent_type == 'q_table':
+            self.env.set_state_codec(self.agent.state_codec())
+        
+        # 每replay_interval步从经验回放中采样replay_batch_size条经验额外更新一次（0表示不回放）
+        self.replay_batch_size = replay_batch_size
+        self.replay_interval = replay_interval
+        
+        # 单环境训练时新状态轮流写入的两个预分配数组
+        self._state_buffers = (np.zeros(self.agent.state_size), np.zeros(self.agent.state_size))
+        self.stats_path = 'training_stats.json'
+        
+        # 训练中的模型由后台线程写入，并保留最近keep_checkpoints个历史版本
+        self.keep_checkpoints = 3
+        self.checkpoint_writer = None
+        self.on_checkpoint_saved = None
+        
+        # 滚动统计和可选的JSONL回合日志（固定内存）
+        self.telemetry = TrainingTelemetry(window=100, log_path=telemetry_log)
         
         # 训练统计
         self.training_stats = {
@@ -335,116 +1178,267 @@ class DinoTrainer:
         """训练AI智能体"""
         print(f"开始训练，目标回合数: {episodes}")
         start_time = time.time()
-        
-        scores = deque(maxlen=100)
+        self.agent.ensure_writable()
         
         for episode in range(episodes):
-            state = self.env.reset()
-            total_reward = 0
-            steps = 0
+            total_reward, steps = self.run_episode()
+            start_score, snapshot_seed = self.episode_origin()
+            self.finish_episode(episode, episodes, self.episode_score(), total_reward, steps, save_interval,
+                                start_score=start_score, snapshot_seed=snapshot_seed)
+        
+        self.finish_training(start_time)
+    
+    def episode_start_score(self):
+        """当前回合的起始分数（课程训练从更高分数或中局快照开始，否则为0）"""
+        return self.curriculum.start_score if self.curriculum is not None else 0
+    
+    def episode_score(self):
+        """当前回合本身获得的分数（不含起始分数）"""
+        return self.env.score - self.episode_start_score()
+    
+    def episode_origin(self):
+        """当前回合的起点 (起始分数, 快照所属回合的种子)，不是从中局快照开始时种子为None"""
+        if self.curriculum is None:
+            return 0, None
+        return self.curriculum.start_score, self.curriculum.snapshot_seed
+    
+    def run_episode(self, max_steps=10000, should_stop=None):
+        """运行一个训练回合，返回 (总奖励, 步数)
+        
+        启用课程训练时由课程调度决定起点和步数上限；should_stop在长回合中每1000步检查一次，返回True时提前结束。
+        """
+        env = self.env
+        agent = self.agent
+        curriculum = self.curriculum
+        use_codes = env.state_codec is not None
+        
+        # 只有经验回放（或DQN的小批量训练）会读取回放缓冲区，否则不必逐步写入
+        remember = self.replay_batch_size > 0 or self.agent_type == 'dqn'
+        
+        # 新状态轮流写入两个预分配的数组：写入的总是上一步的状态所在的数组，当前状态不会被覆盖
+        # （经验回放写入时复制状态，不持有这两个数组）
+        buffers = self._state_buffers
+        
+        if curriculum is None:
+            state = env.reset()
+        else:
+            state = curriculum.reset()
+            max_steps = curriculum.step_limit()
+        code = env.state_code
+        total_reward = 0
+        steps = 0
+        
+        while not env.game_over and steps < max_steps:
+            if use_codes:
+                action = agent.get_action_code(code)
+            else:
+                action = agent.get_action(state)
+            next_state, reward, done = env.step(action, buffers[steps & 1])
+            
+            if remember:
+                agent.remember(state, action, reward, next_state, done)
+            if use_codes:
+                next_code = env.state_code
+                agent.update_code(code, action, reward, next_code, done)
+                code = next_code
+            else:
+                agent.update_q_table(state, action, reward, next_state, done)
             
-            while not self.env.game_over and steps < 10000:
-                action = self.agent.get_action(state)
-                next_state, reward, done = self.env.step(action)
-                
-                self.agent.remember(state, action, reward, next_state, done)
-                self.agent.update_q_table(state, action, reward, next_state, done)
-                
-                state = next_state
-                total_reward += reward
-                steps += 1
+            state = next_state
+            total_reward += reward
+            steps += 1
             
-            # 记录统计信息
-            scores.append(self.env.score)
-            self.agent.episode_rewards.append(total_reward)
-            self.agent.episode_scores.append(self.env.score)
+            if self.replay_batch_size and steps % self.replay_interval == 0:
+                agent.replay(self.replay_batch_size)
+            if curriculum is not None:
+                curriculum.observe(steps)
+            if should_stop is not None and steps % 1000 == 0 and should_stop():
+                break
+        
+        agent.end_episode()
+        if curriculum is not None:
+            curriculum.end_episode(steps)
+        
+        return total_reward, steps
+    
+    def train_batch(self, episodes=1000, save_interval=100, num_envs=64, seeds=None):
+        """使用BatchDinoEnvironment并行推进num_envs局游戏进行训练"""
+        if self.multi_step:
+            raise ValueError("n步回报和Q(λ)只支持单环境训练")
+        print(f"开始批量训练，目标回合数: {episodes}，并行游戏数: {num_envs}")
+        start_time = time.time()
+        self.agent.ensure_writable()
+        
+        if seeds is None:
+            seeds = self.batch_seeds.spawn(num_envs)
+        env = self.create_batch_env(num_envs, seeds)
+        total_rewards = np.zeros(num_envs)
+        episode_steps = np.zeros(num_envs, dtype=np.int64)
+        episode = 0
+        step = 0
+        
+        states = env.reset()
+        while episode < episodes:
+            actions = self.agent.get_actions(states)
+            next_states, rewards, terminals, truncated = env.step(actions)
+            dones = terminals | truncated
             
-            # 更新训练统计
-            self.training_stats['episode'] = episode + 1
-            self.training_stats['total_episodes'] = episodes
-            self.training_stats['best_score'] = max(self.training_stats['best_score'], self.env.score)
-            self.training_stats['average_score'] = np.mean(scores) if scores else 0
+            # 结束的游戏已被自动重置，经验中使用其终局状态；只有真正的终局不自举
+            transitions = np.where(dones[:, None], env.final_states, next_states)
+            if self.replay_batch_size:
+                self.agent.remember_batch(states, actions, rewards, transitions, terminals)
+            self.agent.update_batch(states, actions, rewards, transitions, terminals)
             
-            # 衰减探索率
-            self.agent.decay_epsilon()
+            step += 1
+            if self.replay_batch_size and step % self.replay_interval == 0:
+                self.agent.replay(self.replay_batch_size)
             
-            # 打印进度
-            if (episode + 1) % 10 == 0:
-                avg_score = np.mean(scores) if scores else 0
-                print(f"Episode {episode + 1}/{episodes}, "
-                      f"Score: {self.env.score:.1f}, "
-                      f"Avg Score: {avg_score:.1f}, "
-                      f"Epsilon: {self.agent.epsilon:.3f}, "
-                      f"Reward: {total_reward:.1f}")
+            states = next_states
+            total_rewards += rewards
+            episode_steps += 1
             
-            # 定期保存模型
-            if (episode + 1) % save_interval == 0:
-                self.save_model()
-                print(f"模型已保存 (Episode {episode + 1})")
+            for i in np.flatnonzero(dones):
+                if episode >= episodes:
+                    break
+                self.finish_episode(episode, episodes, env.final_scores[i], total_rewards[i],
+                                    episode_steps[i], save_interval)
+                episode += 1
+            total_rewards[dones] = 0
+            episode_steps[dones] = 0
+        
+        self.finish_training(start_time)
+    
+    def create_batch_env(self, num_envs, seeds):
+        """批量训练使用的环境（与单环境训练相同的帧跳过，回合上限10000步）"""
+        return BatchDinoEnvironment(num_envs, seeds=seeds, max_steps=10000, frame_skip=self.env.frame_skip)
+    
+    def finish_episode(self, episode, episodes, score, total_reward, steps, save_interval, start_score=0,
+                       snapshot_seed=None):
+        """记录一个回合的统计信息，并按间隔打印进度和保存模型
         
-        # 训练完成
+        score为回合本身获得的分数；课程训练的起始分数start_score单独写入遥测日志，
+        从中局快照开始的回合还记录回合种子和快照所属回合的种子snapshot_seed。
+        """
+        # 记录统计信息
+        self.agent.episode_rewards.append(total_reward)
+        self.agent.episode_scores.append(score)
+        fields = {'start_score': float(start_score)} if start_score else {}
+        if snapshot_seed is not None:
+            fields['episode_seed'] = self.env.episode_seed
+            fields['snapshot_seed'] = snapshot_seed
+        self.telemetry.record_episode(score, total_reward, steps, epsilon=self.agent.epsilon, **fields)
+        
+        # 更新训练统计
+        self.training_stats['episode'] = episode + 1
+        self.training_stats['total_episodes'] = episodes
+        self.training_stats['best_score'] = max(self.training_stats['best_score'], score)
+        self.training_stats['average_score'] = self.telemetry.scores.mean()
+        
+        # 衰减探索率
+        self.agent.decay_epsilon()
+        
+        # 打印进度
+        if (episode + 1) % 10 == 0:
+            self.telemetry.update_rates()
+            self.training_stats['steps_per_second'] = self.telemetry.steps_per_second
+            print(f"Episode {episode + 1}/{episodes}, "
+                  f"Score: {score:.1f}, "
+                  f"Avg Score: {self.training_stats['average_score']:.1f}, "
+                  f"Epsilon: {self.agent.epsilon:.3f}, "
+                  f"Reward: {total_reward:.1f}, "
+                  f"Steps/s: {self.telemetry.steps_per_second:,.0f}")
+        
+        # 定期保存模型（后台写入，不阻塞训练）
+        if (episode + 1) % save_interval == 0:
+            self.checkpoint(episode + 1)
+            print(f"检查点已提交 (Episode {episode + 1})")
+    
+    def finish_training(self, start_time):
+        """训练结束：记录耗时、保存模型并打印总结"""
         self.training_stats['training_time'] = time.time() - start_time
-        self.save_model()
+        self.training_stats['total_steps'] = self.telemetry.total_steps
+        if self.curriculum is not None:
+            self.training_stats['curriculum'] = self.curriculum.stats()
+        self.checkpoint(self.training_stats['episode'])
+        checkpoint_stats = self.close_checkpoints()
+        self.telemetry.close()
         
         print(f"训练完成！")
         print(f"总训练时间: {self.training_stats['training_time']:.2f}秒")
         print(f"最高分数: {self.training_stats['best_score']:.1f}")
         print(f"平均分数: {self.training_stats['average_score']:.1f}")
+        if self.training_stats['training_time'] > 0:
+            print(f"最近{len(self.telemetry.scores)}回合分数 P50/P90: "
+                  f"{self.telemetry.scores.percentile(50):.1f}/{self.telemetry.scores.percentile(90):.1f}, "
+                  f"吞吐量: {self.telemetry.total_steps / self.training_stats['training_time']:,.0f} 步/秒")
+        if checkpoint_stats.get('write_ms_mean') is not None:
+            print(f"检查点: {checkpoint_stats['checkpoints']}个, "
+                  f"快照平均 {checkpoint_stats['snapshot_ms_mean']:.1f}ms, "
+                  f"后台写入平均 {checkpoint_stats['write_ms_mean']:.1f}ms")
+        if self.curriculum is not None:
+            curriculum_stats = self.training_stats['curriculum']
+            print(f"课程训练: 快照库 {curriculum_stats['bank_size']}个, "
+                  f"从快照开始 {curriculum_stats['episodes_from_bank']}回合, "
+                  f"截断 {curriculum_stats['truncated']}回合, 当前步数上限 {curriculum_stats['step_limit']}")
+    
+    def checkpoint(self, episode):
+        """提交一个后台检查点，返回训练线程上的快照耗时（毫秒）"""
+        if self.checkpoint_writer is None:
+            self.checkpoint_writer = CheckpointWriter(self.model_path, self.stats_path,
+                                                      keep=self.keep_checkpoints,
+                                                      on_saved=self.on_checkpoint_saved)
+        return self.checkpoint_writer.submit(self.agent, self.training_stats, episode)
+    
+    def close_checkpoints(self):
+        """等待后台检查点写完，返回检查点耗时统计"""
+        if self.checkpoint_writer is None:
+            return {}
+        
+        self.checkpoint_writer.close()
+        stats = self.checkpoint_writer.latency_summary()
+        self.checkpoint_writer = None
+        return stats
     
-    def test(self, episodes=10):
-        """测试训练好的模型"""
+    def test(self, episodes=10, seed=0, num_envs=256, workers=1):
+        """测试训练好的模型：用固定种子并发运行贪婪策略回合，返回评估汇总"""
+        # evaluation依赖本模块中的环境和智能体，在这里导入以避免循环导入
+        from evaluation import evaluate, print_summary
+        
         if not self.load_model():
             print("未找到训练好的模型")
             return
         
         print(f"开始测试，测试回合数: {episodes}")
         
-        # 设置为贪婪策略（不探索）
-        original_epsilon = self.agent.epsilon
-        self.agent.epsilon = 0
-        
-        scores = []
+        # 多进程评估时各进程从模型文件加载，单进程直接使用已加载的智能体（不修改其探索率）
+        model = self.model_path if workers > 1 and os.path.exists(self.model_path) else self.agent
+        summary = evaluate(model, episodes=episodes, seed=seed, num_envs=num_envs,
+                           workers=workers if model is self.model_path else 1,
+                           frame_skip=self.env.frame_skip)
+        print_summary(summary)
         
-        for episode in range(episodes):
-            state = self.env.reset()
-            steps = 0
-            
-            while not self.env.game_over and steps < 10000:
-                action = self.agent.get_action(state)
-                state, _, _ = self.env.step(action)
-                steps += 1
-            
-            scores.append(self.env.score)
-            print(f"Test Episode {episode + 1}: Score = {self.env.score:.1f}")
-        
-        # 恢复原始epsilon
-        self.agent.epsilon = original_epsilon
-        
-        print(f"测试完成！")
-        print(f"平均分数: {np.mean(scores):.1f}")
-        print(f"最高分数: {np.max(scores):.1f}")
-        print(f"最低分数: {np.min(scores):.1f}")
-        
-        return scores
+        return summary
     
     def save_model(self):
         """保存模型"""
         self.agent.save_model(self.model_path)
         
         # 保存训练统计
-        stats_path = 'training_stats.json'
-        with open(stats_path, 'w') as f:
-            json.dump(self.training_stats, f, indent=2)
+        model_store.save_json(self.stats_path, self.training_stats)
     
-    def load_model(self):
-        """加载模型"""
-        success = self.agent.load_model(self.model_path)
+    def load_model(self, mmap=False):
+        """加载模型（新格式不存在时回退到旧版pickle模型）"""
+        model_path = self.model_path
+        if (not os.path.exists(model_path) and self.legacy_model_path
+                and os.path.exists(self.legacy_model_path)):
+            model_path = self.legacy_model_path
+        
+        success = self.agent.load_model(model_path, mmap=mmap)
         
         if success:
             # 加载训练统计
-            stats_path = 'training_stats.json'
-            if os.path.exists(stats_path):
-                with open(stats_path, 'r') as f:
+            if os.path.exists(self.stats_path):
+                with open(self.stats_path, 'r') as f:
                     self.training_stats.update(json.load(f))
         
         return success
@@ -454,21 +1448,102 @@ class DinoTrainer:
         # 将游戏状态转换为环境状态
         state = self.convert_game_state(game_state)
         
-        # 使用贪婪策略获取动作
-        original_epsilon = self.agent.epsilon
-        self.agent.epsilon = 0
-        action = self.agent.get_action(state)
-        self.agent.epsilon = original_epsilon
+        # 使用贪婪策略获取动作（不修改智能体的探索率）
+        action = self.agent.greedy_action(state)
         
         # 转换动作格式
-        action_map = {0: 'none', 1: 'jump', 2: 'duck'}
-        return action_map.get(action, 'none')
-    
-    def convert_game_state(self, game_state):
-        """将前端游戏状态转换为AI环境状态"""
-        # 这里需要根据前端传来的游戏状态格式进行转换
-        # 暂时返回默认状态
-        return np.zeros(9)
+        return self.ACTION_NAMES[action]
+    
+    def get_actions_for_states(self, game_states):
+        """为多局游戏的状态一次性获取AI动作"""
+        states = np.zeros((len(game_states), self.agent.state_size))
+        for i, game_state in enumerate(game_states):
+            self.convert_game_state(game_state, out=states[i])
+        
+        return [self.ACTION_NAMES[action] for action in self.agent.greedy_actions(states).tolist()]
+    
+    @staticmethod
+    def game_state_error(game_state):
+        """检查convert_game_state读取的字段，格式正确时返回None，否则返回错误说明
+        
+        dino、obstacles和speed可以缺省；出现时数值字段必须是有限的数字（不接受布尔值和字符串）。
+        """
+        def is_number(value):
+            return isinstance(value, (int, float)) and not isinstance(value, bool) and bool(np.isfinite(value))
+        
+        if not isinstance(game_state, dict):
+            return "game_state 不是对象"
+        
+        dino = game_state.get('dino')
+        if dino is not None:
+            if not isinstance(dino, dict):
+                return "dino 不是对象"
+            for key in ('x', 'y', 'velocityY'):
+                if key in dino and not is_number(dino[key]):
+                    return f"dino.{key} 不是数值"
+        
+        obstacles = game_state.get('obstacles')
+        if obstacles is not None:
+            if not isinstance(obstacles, list):
+                return "obstacles 不是数组"
+            for i, obstacle in enumerate(obstacles):
+                if not isinstance(obstacle, dict):
+                    return f"obstacles[{i}] 不是对象"
+                for key in ('x', 'y'):
+                    if not is_number(obstacle.get(key)):
+                        return f"obstacles[{i}].{key} 不是数值"
+        
+        if 'speed' in game_state and not is_number(game_state['speed']):
+            return "speed 不是数值"
+        
+        return None
+    
+    def convert_game_state(self, game_state, out=None):
+        """将前端游戏状态转换为AI环境状态
+        
+        game_state格式与前端DinoGame一致：
+        {'dino': {'x', 'y', 'velocityY', 'isJumping', 'isDucking'},
+         'obstacles': [{'x', 'y', 'width', 'height', 'type'}], 'speed', 'score'}
+        """
+        env = self.env
+        state = np.zeros(9) if out is None else out
+        
+        # 恐龙状态（前端下蹲时会降低y坐标，这里与训练环境一样按站立位置计算）
+        dino = game_state.get('dino') or {}
+        dino_x = dino.get('x', env.DINO_X)
+        is_jumping = bool(dino.get('isJumping', False))
+        is_ducking = bool(dino.get('isDucking', False))
+        dino_y = env.GROUND_Y - env.DINO_HEIGHT
+        if is_jumping:
+            dino_y = dino.get('y', dino_y)
+        
+        state[0] = (dino_y - (env.GROUND_Y - env.DINO_HEIGHT)) / 100.0
+        state[1] = dino.get('velocityY', 0) / 20.0
+        state[2] = 1.0 if is_jumping else 0.0
+        state[3] = 1.0 if is_ducking else 0.0
+        
+        # 最近障碍物信息（恐龙前方x最小的障碍物）
+        nearest_obstacle = None
+        for obstacle in game_state.get('obstacles') or ():
+            if obstacle['x'] > dino_x and (nearest_obstacle is None or obstacle['x'] < nearest_obstacle['x']):
+                nearest_obstacle = obstacle
+        
+        if nearest_obstacle:
+            state[4] = min((nearest_obstacle['x'] - dino_x) / 200.0, 1.0)
+            state[5] = nearest_obstacle['y'] / env.CANVAS_HEIGHT
+            state[6] = 1.0 if nearest_obstacle.get('type') == 'cactus' else 0.0
+            state[7] = 1.0
+        else:
+            state[4] = 1.0
+            state[5] = 0.0
+            state[6] = 0.0
+            state[7] = 0.0
+        
+        # 游戏速度
+        speed = game_state.get('speed', env.GAME_SPEED)
+        state[8] = (speed - env.GAME_SPEED) / (env.MAX_SPEED - env.GAME_SPEED)
+        
+        return state
 
 
 if __name__ == "__main__":
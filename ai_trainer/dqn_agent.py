@@ -0,0 +1,275 @@
+"""
+AI Dino Arena - DQN智能体
+纯NumPy实现的小型多层感知机Q函数，直接使用连续状态特征，
+与QLearningAgent接口一致，可以在DinoTrainer和推理服务中互换
+"""
+
+import os
+
+import numpy as np
+
+import model_store
+from replay_buffer import PrioritizedReplayBuffer, ReplayBuffer
+from seeding import UniformStream, spawn_seeds
+
+
+class DQNAgent:
+    """深度Q网络智能体（CPU，NumPy）
+    
+    所有层的参数存放在一个连续的float32向量中（各层权重是它的视图），
+    Adam优化和目标网络同步都是整块向量运算，检查点和内存映射也只处理这一个数组。
+    """
+    
+    def __init__(self, state_size=9, action_size=3, hidden_sizes=(64, 64), learning_rate=0.001,
+                 epsilon=1.0, epsilon_decay=0.995, epsilon_min=0.01, gamma=0.95,
+                 batch_size=32, train_interval=4, target_update_interval=500,
+                 memory_size=10000, prioritized_replay=False, seed=None):
+        self.state_size = state_size
+        self.action_size = action_size
+        self.learning_rate = learning_rate
+        self.epsilon = epsilon
+        self.epsilon_decay = epsilon_decay
+        self.epsilon_min = epsilon_min
+        self.gamma = gamma
+        
+        # 每train_interval次update_q_table从经验回放采样batch_size条经验训练一次
+        self.batch_size = batch_size
+        self.train_interval = train_interval
+        self.target_update_interval = target_update_interval
+        
+        # 参数初始化与探索、经验采样使用各自独立的随机数流
+        explore_seed, replay_seed = spawn_seeds(seed, 2)
+        self.rng = np.random.default_rng(explore_seed)
+        self._uniform = UniformStream(self.rng)
+        self.build([state_size, *hidden_sizes, action_size])
+        
+        # 经验回放（预分配的环形缓冲区）
+        replay_rng = np.random.default_rng(replay_seed)
+        if prioritized_replay:
+            self.memory = PrioritizedReplayBuffer(memory_size, state_size, rng=replay_rng)
+        else:
+            self.memory = ReplayBuffer(memory_size, state_size, rng=replay_rng)
+        
+        self.update_steps = 0
+        self.train_steps = 0
+        
+        # 上次保存之后结束的回合统计，保存时写入 .stats 文件并清空，内存占用不随训练长度增长
+        self.episode_rewards = []
+        self.episode_scores = []
+    
+    def build(self, layer_sizes, params=None):
+        """按层大小分配参数向量（He初始化），params不为空时直接使用给定参数"""
+        self.layer_sizes = [int(size) for size in layer_sizes]
+        shapes = list(zip(self.layer_sizes[:-1], self.layer_sizes[1:]))
+        size = sum(fan_in * fan_out + fan_out for fan_in, fan_out in shapes)
+        
+        if params is None:
+            params = np.zeros(size, dtype=np.float32)
+            for weights, _ in self._layer_views(params, shapes):
+                weights[:] = self.rng.normal(0.0, np.sqrt(2.0 / weights.shape[0]), weights.shape)
+        elif params.shape != (size,):
+            raise ValueError(f"参数数量 {params.shape} 与网络结构 {self.layer_sizes} 不一致")
+        
+        self._shapes = shapes
+        self.params = params
+        self.layers = self._layer_views(self.params, shapes)
+        self.target_params = np.array(self.params)
+        self.target_layers = self._layer_views(self.target_params, shapes)
+        
+        # 梯度与Adam状态使用相同布局的向量
+        self.grads = np.zeros(size, dtype=np.float32)
+        self.grad_layers = self._layer_views(self.grads, shapes)
+        self.adam_m = np.zeros(size, dtype=np.float32)
+        self.adam_v = np.zeros(size, dtype=np.float32)
+        self.adam_t = 0
+    
+    @staticmethod
+    def _layer_views(flat, shapes):
+        """把参数向量切分为每层的 (权重, 偏置) 视图"""
+        layers = []
+        offset = 0
+        for fan_in, fan_out in shapes:
+            weights = flat[offset:offset + fan_in * fan_out].reshape(fan_in, fan_out)
+            offset += fan_in * fan_out
+            bias = flat[offset:offset + fan_out]
+            offset += fan_out
+            layers.append((weights, bias))
+        return layers
+    
+    def forward(self, states, layers=None):
+        """批量前向传播，返回 (Q值, 各层激活)"""
+        layers = layers or self.layers
+        activations = [np.asarray(states, dtype=np.float32)]
+        
+        for weights, bias in layers[:-1]:
+            hidden = activations[-1] @ weights
+            hidden += bias
+            np.maximum(hidden, 0, out=hidden)
+            activations.append(hidden)
+        
+        weights, bias = layers[-1]
+        return activations[-1] @ weights + bias, activations
+    
+    def q_values(self, states):
+        """计算一批状态的Q值"""
+        return self.forward(states)[0]
+    
+    def get_action(self, state):
+        """选择动作（ε-贪婪策略）"""
+        if self._uniform.random() < self.epsilon:
+            return int(self._uniform.random() * self.action_size)
+        
+        return self.greedy_action(state)
+    
+    def get_actions(self, states):
+        """为一批状态选择动作（ε-贪婪策略）"""
+        actions = self.greedy_actions(states)
+        
+        explore = self.rng.random(len(actions)) < self.epsilon
+        actions[explore] = self.rng.integers(0, self.action_size, size=int(explore.sum()))
+        
+        return actions
+    
+    def greedy_action(self, state):
+        """按Q值选择最优动作（推理用，不探索也不修改epsilon）"""
+        return int(np.argmax(self.q_values(np.reshape(state, (1, -1)))[0]))
+    
+    def greedy_actions(self, states):
+        """为一批状态按Q值选择最优动作，一次前向传播服务整批请求"""
+        return np.argmax(self.q_values(states), axis=1)
+    
+    def update_q_table(self, state, action, reward, next_state, done):
+        """逐步训练接口：经验由remember写入回放缓冲区，这里按间隔做一次小批量训练"""
+        self.update_steps += 1
+        if self.update_steps % self.train_interval == 0:
+            self.replay(self.batch_size)
+    
+    def update_batch(self, states, actions, rewards, next_states, dones, weights=None):
+        """对一批经验做一次梯度下降（Huber损失），返回TD误差"""
+        q_values, activations = self.forward(states)
+        next_q_values = self.forward(next_states, self.target_layers)[0]
+        
+        batch = np.arange(len(actions))
+        target_q = np.where(dones, rewards, rewards + self.gamma * next_q_values.max(axis=1))
+        td_errors = target_q - q_values[batch, actions]
+        
+        # Huber损失对Q值的梯度：TD误差裁剪到[-1, 1]
+        grad_q = np.zeros_like(q_values)
+        grad_q[batch, actions] = -np.clip(td_errors, -1.0, 1.0) / len(actions)
+        if weights is not None:
+            grad_q *= weights[:, None]
+        
+        self._backward(grad_q, activations)
+        self._adam_step()
+        
+        self.train_steps += 1
+        if self.train_steps % self.target_update_interval == 0:
+            np.copyto(self.target_params, self.params)
+        
+        return td_errors
+    
+    def _backward(self, grad_output, activations):
+        """反向传播，梯度写入self.grads"""
+        grad = grad_output.astype(np.float32)
+        for layer in range(len(self.layers) - 1, -1, -1):
+            weights, _ = self.layers[layer]
+            grad_weights, grad_bias = self.grad_layers[layer]
+            
+            np.matmul(activations[layer].T, grad, out=grad_weights)
+            np.sum(grad, axis=0, out=grad_bias)
+            
+            if layer > 0:
+                grad = grad @ weights.T
+                grad *= activations[layer] > 0
+    
+    def _adam_step(self, beta1=0.9, beta2=0.999, eps=1e-8):
+        """对整个参数向量做一次Adam更新"""
+        self.adam_t += 1
+        self.adam_m *= beta1
+        self.adam_m += (1 - beta1) * self.grads
+        self.adam_v *= beta2
+        self.adam_v += (1 - beta2) * np.square(self.grads)
+        
+        step_size = self.learning_rate * np.sqrt(1 - beta2 ** self.adam_t) / (1 - beta1 ** self.adam_t)
+        self.params -= step_size * self.adam_m / (np.sqrt(self.adam_v) + eps)
+    
+    def remember(self, state, action, reward, next_state, done):
+        """存储经验"""
+        self.memory.add(state, action, reward, next_state, done)
+    
+    def remember_batch(self, states, actions, rewards, next_states, dones):
+        """一次存储一批经验"""
+        self.memory.add_batch(states, actions, rewards, next_states, dones)
+    
+    def replay(self, batch_size=32):
+        """从经验回放中采样一个小批量训练一次，返回TD误差（经验不足时返回None）"""
+        if len(self.memory) < batch_size:
+            return None
+        
+        indices, states, actions, rewards, next_states, dones, weights = self.memory.sample(batch_size)
+        td_errors = self.update_batch(states, actions, rewards, next_states, dones, weights)
+        self.memory.update_priorities(indices, td_errors)
+        
+        return td_errors
+    
+    def end_episode(self):
+        """回合结束（DQN每步更新，无需处理）"""
+    
+    def decay_epsilon(self):
+        """衰减探索率"""
+        if self.epsilon > self.epsilon_min:
+            self.epsilon *= self.epsilon_decay
+    
+    def ensure_writable(self):
+        """内存映射加载的只读参数在训练前复制到内存"""
+        if not self.params.flags.writeable:
+            self.build(self.layer_sizes, np.array(self.params))
+    
+    def model_array(self):
+        """检查点保存的模型数组"""
+        return self.params
+    
+    def model_metadata(self):
+        """模型文件头部的元数据"""
+        return {
+            'model_type': 'dqn',
+            'layer_sizes': self.layer_sizes,
+            'epsilon': self.epsilon
+        }
+    
+    def take_unsaved_stats(self):
+        """取出上次保存之后结束的回合统计 (scores, rewards)"""
+        scores, self.episode_scores = self.episode_scores, []
+        rewards, self.episode_rewards = self.episode_rewards, []
+        return scores, rewards
+    
+    def save_model(self, filepath):
+        """保存模型（二进制参数向量 + 只追加的回合统计文件）"""
+        model_store.save_array(filepath, self.params, self.model_metadata())
+        
+        scores, rewards = self.take_unsaved_stats()
+        if scores:
+            model_store.append_stats(filepath, scores, rewards)
+    
+    def load_model(self, filepath, mmap=False):
+        """加载模型，网络结构以模型文件中记录的为准
+        
+        mmap=True 时参数以只读内存映射方式加载，适合推理服务。
+        """
+        if not os.path.exists(filepath):
+            return False
+        
+        params, header = model_store.load_array(filepath, mmap=mmap)
+        if header.get('model_type') != 'dqn':
+            raise ValueError(f"不是DQN模型文件: {filepath}")
+        
+        layer_sizes = header['layer_sizes']
+        if layer_sizes[0] != self.state_size or layer_sizes[-1] != self.action_size:
+            raise ValueError(f"模型的输入输出维度与当前版本不一致: {filepath}")
+        
+        self.build(layer_sizes, params)
+        self.epsilon = header.get('epsilon', self.epsilon_min)
+        self.episode_rewards = []
+        self.episode_scores = []
+        
+        return True
@@ -0,0 +1,151 @@
+"""
+AI Dino Arena - 回合录制与回放
+一局游戏由 (回合种子, 动作序列) 完全确定：录制时保存这两项和终局结果，
+回放时不经过智能体也不渲染，直接按动作序列推进环境并逐位校验结果，
+用于对物理和环境优化做回归测试
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from dino_ai_trainer import DinoEnvironment, DinoTrainer
+
+
+class EpisodeTrace:
+    """一局游戏的录像：回合种子、动作序列、每次决策推进的帧数和终局结果"""
+    
+    __slots__ = ('seed', 'actions', 'score', 'total_reward', 'final_state', 'frame_skip')
+    
+    def __init__(self, seed, actions, score, total_reward, final_state, frame_skip=1):
+        self.seed = seed
+        self.frame_skip = frame_skip
+        self.actions = actions
+        self.score = score
+        self.total_reward = total_reward
+        self.final_state = final_state
+
+
+def record_episode(env, policy, seed=None, max_steps=10000):
+    """用policy(state) -> action运行一局并录制，seed为空时使用环境种子流中的下一个回合种子"""
+    state = env.reset(seed)
+    actions = []
+    total_reward = 0
+    
+    while not env.game_over and len(actions) < max_steps:
+        action = policy(state)
+        state, reward, _ = env.step(action)
+        actions.append(action)
+        total_reward += reward
+    
+    return EpisodeTrace(env.episode_seed, np.array(actions, dtype=np.int8),
+                        env.score, total_reward, state, env.frame_skip)
+
+
+def replay_episode(trace, env=None):
+    """按录制的动作序列重放一局，返回 (score, total_reward, final_state)"""
+    env = env or DinoEnvironment()
+    env.frame_skip = trace.frame_skip
+    state = env.reset(trace.seed)
+    step = env.step
+    total_reward = 0
+    
+    for action in trace.actions.tolist():
+        state, reward, _ = step(action)
+        total_reward += reward
+    
+    return env.score, total_reward, state
+
+
+def verify_trace(trace, env=None):
+    """重放录像并检查结果是否与录制时逐位一致"""
+    score, total_reward, final_state = replay_episode(trace, env)
+    return (score == trace.score and total_reward == trace.total_reward
+            and np.array_equal(final_state, trace.final_state))
+
+
+def save_traces(filepath, traces):
+    """把多局录像保存为一个npz文件（动作序列首尾相接存放）"""
+    lengths = [len(trace.actions) for trace in traces]
+    np.savez_compressed(
+        filepath,
+        seeds=np.array([trace.seed for trace in traces], dtype=np.int64),
+        offsets=np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64),
+        actions=np.concatenate([trace.actions for trace in traces]) if traces else np.zeros(0, dtype=np.int8),
+        scores=np.array([trace.score for trace in traces], dtype=np.float64),
+        total_rewards=np.array([trace.total_reward for trace in traces], dtype=np.float64),
+        final_states=np.array([trace.final_state for trace in traces], dtype=np.float64).reshape(len(traces), -1),
+        frame_skips=np.array([trace.frame_skip for trace in traces], dtype=np.int64)
+    )
+
+
+def load_traces(filepath):
+    """读取save_traces保存的录像"""
+    with np.load(filepath) as data:
+        offsets = data['offsets']
+        return [
+            EpisodeTrace(int(seed), data['actions'][offsets[i]:offsets[i + 1]],
+                         float(data['scores'][i]), float(data['total_rewards'][i]), data['final_states'][i],
+                         int(data['frame_skips'][i]))
+            for i, seed in enumerate(data['seeds'])
+        ]
+
+
+def record(episodes, output, seed=None, use_model=False, frame_skip=1):
+    """录制若干局：加载已训练模型时使用贪婪策略，否则使用带种子的随机策略"""
+    trainer = DinoTrainer(seed=seed, frame_skip=frame_skip)
+    if use_model and trainer.load_model():
+        policy = trainer.agent.greedy_action
+    else:
+        trainer.agent.epsilon = 1.0
+        policy = trainer.agent.get_action
+    
+    traces = [record_episode(trainer.env, policy) for _ in range(episodes)]
+    save_traces(output, traces)
+    
+    steps = sum(len(trace.actions) for trace in traces)
+    print(f"已录制 {episodes} 局（共 {steps} 步）到 {output}")
+    return traces
+
+
+def verify(filepath):
+    """重放文件中的全部录像，返回不一致的局数"""
+    traces = load_traces(filepath)
+    env = DinoEnvironment()
+    
+    mismatches = 0
+    start = time.perf_counter()
+    for i, trace in enumerate(traces):
+        if not verify_trace(trace, env):
+            mismatches += 1
+            print(f"第 {i + 1} 局结果不一致 (seed={trace.seed})")
+    elapsed = time.perf_counter() - start
+    
+    steps = sum(len(trace.actions) for trace in traces)
+    print(f"重放 {len(traces)} 局，{steps} 步，耗时 {elapsed:.2f}秒 "
+          f"({steps / elapsed if elapsed > 0 else 0:,.0f} 步/秒)，不一致 {mismatches} 局")
+    return mismatches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='回合录制与回放校验')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    record_parser = subparsers.add_parser('record', help='录制回合')
+    record_parser.add_argument('--episodes', type=int, default=100)
+    record_parser.add_argument('--seed', type=int, default=0)
+    record_parser.add_argument('--output', default='episode_traces.npz')
+    record_parser.add_argument('--frame-skip', type=int, default=1)
+    record_parser.add_argument('--model', action='store_true',
+                               help='使用已训练模型的贪婪策略（默认随机策略）')
+    
+    verify_parser = subparsers.add_parser('verify', help='重放并校验录像')
+    verify_parser.add_argument('path')
+    
+    args = parser.parse_args()
+    if args.command == 'record':
+        record(args.episodes, args.output, seed=args.seed, use_model=args.model, frame_skip=args.frame_skip)
+    elif verify(args.path):
+        sys.exit(1)
@@ -0,0 +1,178 @@
+"""
+AI Dino Arena - 模型评估
+在BatchDinoEnvironment上并发运行大量贪婪策略回合（批量查询Q值，可选多进程），
+回合种子固定，同一模型的评估结果可复现；返回完整的分数分布、置信区间和吞吐量
+"""
+
+import argparse
+import json
+import math
+import multiprocessing as mp
+import time
+
+import numpy as np
+
+import model_store
+from dino_ai_trainer import BatchDinoEnvironment, QLearningAgent
+from dqn_agent import DQNAgent
+from seeding import seed_sequence
+
+
+def episode_seeds(seed, episodes):
+    """由评估种子派生episodes个回合种子"""
+    return np.random.default_rng(seed_sequence(seed)).integers(2**63, size=episodes).tolist()
+
+
+def load_agent(filepath):
+    """按模型文件中记录的类型创建智能体并以只读内存映射方式加载"""
+    if model_store.is_model_file(filepath) and model_store.read_header(filepath).get('model_type') == 'dqn':
+        agent = DQNAgent()
+    else:
+        agent = QLearningAgent()
+    
+    if not agent.load_model(filepath, mmap=True):
+        raise FileNotFoundError(f"模型文件不存在: {filepath}")
+    return agent
+
+
+def evaluate_agent(agent, seeds, num_envs=256, max_steps=10000, frame_skip=1):
+    """用贪婪策略在给定种子上各跑一局，返回按种子顺序排列的 (分数数组, 步数数组)
+    
+    num_envs局游戏同时推进，结束的游戏立即换上下一个种子，直到全部种子跑完。
+    """
+    seeds = list(seeds)
+    scores = np.zeros(len(seeds))
+    steps = np.zeros(len(seeds), dtype=np.int64)
+    if not seeds:
+        return scores, steps
+    
+    num_envs = min(num_envs, len(seeds))
+    env = BatchDinoEnvironment(num_envs, max_steps=max_steps, frame_skip=frame_skip)
+    states = env.reset(episode_seeds=seeds[:num_envs])
+    
+    # 每个槽位当前回合的序号，-1表示种子已分完、槽位空闲
+    slot_episode = np.arange(num_envs)
+    slot_steps = np.zeros(num_envs, dtype=np.int64)
+    next_episode = num_envs
+    
+    while (slot_episode >= 0).any():
+        states, _, terminals, truncated = env.step(agent.greedy_actions(states))
+        dones = terminals | truncated
+        slot_steps += 1
+        
+        finished = np.flatnonzero(dones & (slot_episode >= 0))
+        if not len(finished):
+            continue
+        
+        episodes = slot_episode[finished]
+        scores[episodes] = env.final_scores[finished]
+        steps[episodes] = slot_steps[finished]
+        slot_steps[finished] = 0
+        
+        # 结束的槽位按顺序换上剩余的种子，没有剩余种子的槽位置为空闲
+        count = min(len(finished), len(seeds) - next_episode)
+        refill = finished[:count]
+        slot_episode[finished[count:]] = -1
+        if count:
+            mask = np.zeros(num_envs, dtype=bool)
+            mask[refill] = True
+            states = env.reset(mask, episode_seeds=seeds[next_episode:next_episode + count])
+            slot_episode[refill] = np.arange(next_episode, next_episode + count)
+            next_episode += count
+    
+    return scores, steps
+
+
+def _evaluate_job(job):
+    filepath, seeds, num_envs, max_steps, frame_skip = job
+    return evaluate_agent(load_agent(filepath), seeds, num_envs, max_steps, frame_skip)
+
+
+def evaluate(model, episodes=1000, seed=0, num_envs=256, workers=1, max_steps=10000, frame_skip=1):
+    """评估一个模型并返回统计汇总
+    
+    model为智能体对象或模型文件路径；workers大于1时种子分给多个进程（需要模型文件路径）。
+    episodes为0时不启动进程，直接返回空的统计汇总。
+    """
+    if episodes < 0:
+        raise ValueError(f"评估回合数不能为负数: {episodes}")
+    seeds = episode_seeds(seed, episodes)
+    start_time = time.time()
+    
+    if workers > 1 and episodes > 0:
+        if not isinstance(model, str):
+            raise ValueError("多进程评估需要模型文件路径")
+        chunk = -(-episodes // workers)
+        jobs = [(model, seeds[start:start + chunk], num_envs, max_steps, frame_skip)
+                for start in range(0, episodes, chunk)]
+        with mp.get_context().Pool(min(workers, len(jobs))) as pool:
+            results = pool.map(_evaluate_job, jobs)
+        scores = np.concatenate([job_scores for job_scores, _ in results])
+        steps = np.concatenate([job_steps for _, job_steps in results])
+    else:
+        agent = load_agent(model) if isinstance(model, str) else model
+        scores, steps = evaluate_agent(agent, seeds, num_envs, max_steps, frame_skip)
+    
+    summary = summarize(scores, steps, time.time() - start_time)
+    summary['seed'] = seed
+    summary['frame_skip'] = frame_skip
+    return summary
+
+
+def summarize(scores, steps, elapsed):
+    """分数分布统计：均值的95%置信区间（正态近似）、分位数和吞吐量，可直接序列化为JSON"""
+    scores = np.asarray(scores, dtype=np.float64)
+    episodes = len(scores)
+    mean = float(scores.mean()) if episodes else 0.0
+    std = float(scores.std(ddof=1)) if episodes > 1 else 0.0
+    half_width = 1.96 * std / math.sqrt(episodes) if episodes else 0.0
+    total_steps = int(np.sum(steps))
+    
+    return {
+        'episodes': episodes,
+        'average_score': mean,
+        'std_score': std,
+        'ci95_low': mean - half_width,
+        'ci95_high': mean + half_width,
+        'score_p10': float(np.percentile(scores, 10)) if episodes else 0.0,
+        'score_p50': float(np.percentile(scores, 50)) if episodes else 0.0,
+        'score_p90': float(np.percentile(scores, 90)) if episodes else 0.0,
+        'max_score': float(scores.max()) if episodes else 0.0,
+        'min_score': float(scores.min()) if episodes else 0.0,
+        'total_steps': total_steps,
+        'seconds': elapsed,
+        'steps_per_second': total_steps / elapsed if elapsed > 0 else 0.0,
+        'scores': scores.tolist()
+    }
+
+
+def print_summary(summary):
+    """打印评估汇总"""
+    print(f"评估完成！{summary['episodes']} 回合，耗时 {summary['seconds']:.2f}秒 "
+          f"({summary['steps_per_second']:,.0f} 步/秒)")
+    print(f"平均分数: {summary['average_score']:.1f} "
+          f"(95%置信区间 {summary['ci95_low']:.1f} ~ {summary['ci95_high']:.1f})")
+    print(f"分数 P10/P50/P90: {summary['score_p10']:.1f}/{summary['score_p50']:.1f}/{summary['score_p90']:.1f}")
+    print(f"最高分数: {summary['max_score']:.1f}")
+    print(f"最低分数: {summary['min_score']:.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='模型评估')
+    parser.add_argument('model', help='模型文件')
+    parser.add_argument('--episodes', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--num-envs', type=int, default=256,
+                       help='每个进程同时推进的游戏数')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--frame-skip', type=int, default=1)
+    parser.add_argument('--output', default=None,
+                       help='评估结果JSON文件（默认不保存）')
+    args = parser.parse_args()
+    
+    summary = evaluate(args.model, episodes=args.episodes, seed=args.seed, num_envs=args.num_envs,
+                       workers=args.workers, frame_skip=args.frame_skip)
+    print_summary(summary)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
@@ -0,0 +1,189 @@
+"""
+AI Dino Arena - 实时推理
+把同一事件循环轮次内到达的get_action/get_actions请求合并，
+转换为特征矩阵后用贪婪策略一次性查询Q表
+"""
+
+import asyncio
+import time
+
+import numpy as np
+
+
+class InferenceBatcher:
+    """get_action请求的微批处理器
+    
+    给定registry时，每个请求在提交时绑定当前（或客户端固定的）模型版本，
+    批处理按版本分组推理，切换版本不影响已排队的请求。
+    """
+    
+    def __init__(self, trainer, registry=None, max_batch_size=1024):
+        self.trainer = trainer
+        self.registry = registry
+        self.max_batch_size = max_batch_size
+        
+        # 预分配的特征矩阵，避免每批重新分配
+        self._states = np.zeros((max_batch_size, trainer.agent.state_size))
+        self._pending = []
+        self._pending_arrays = []
+        self._flush_scheduled = False
+        
+        # 推理统计（get_metrics命令读取）
+        self.flushes = 0
+        self.requests = 0
+        self.rows = 0
+        self.inference_seconds = 0.0
+    
+    async def get_action(self, game_state, version=None):
+        """提交一个游戏状态，等待所在批次推理完成后返回动作名称"""
+        return (await self._submit([game_state], version))[0]
+    
+    async def get_actions(self, game_states, version=None):
+        """提交多局游戏的状态，与同一轮次的其他请求一起推理，按顺序返回动作名称列表"""
+        if not game_states:
+            return []
+        return await self._submit(list(game_states), version)
+    
+    async def get_actions_array(self, states, version=None):
+        """提交已转换好的 (N, state_size) 特征矩阵（二进制协议），返回动作编号数组"""
+        if not len(states):
+            return np.zeros(0, dtype=np.int64)
+        return await self._submit(states, version, self._pending_arrays)
+    
+    def model(self, version=None):
+        """请求使用的智能体：registry中的指定版本或当前版本，尚无模型时使用训练器的智能体"""
+        if self.registry is None:
+            return self.trainer.agent
+        
+        model = self.registry.get(version)
+        if model is None:
+            if version is not None:
+                raise KeyError(f"模型版本不存在: {version}")
+            return self.trainer.agent
+        return model.agent
+    
+    def _submit(self, game_states, version=None, pending=None):
+        """把一组游戏状态加入当前批次，返回在批次推理完成后得到动作列表的future"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        (self._pending if pending is None else pending).append((game_states, future, self.model(version)))
+        
+        # 当前轮次的第一个请求负责安排批处理，后续请求直接排队
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            loop.call_soon(self.flush)
+        
+        return future
+    
+    def flush(self):
+        """对排队的请求执行向量化推理（按模型版本分组，通常只有一组）"""
+        self._flush_scheduled = False
+        pending, self._pending = self._pending, []
+        pending_arrays, self._pending_arrays = self._pending_arrays, []
+        flush_start = time.perf_counter()
+        
+        for agent, group in self._group(pending_arrays):
+            self._flush_arrays(group, agent)
+        for agent, group in self._group(pending):
+            self._flush_game_states(group, agent)
+        
+        self.flushes += 1
+        self.requests += len(pending) + len(pending_arrays)
+        self.rows += sum(len(states) for states, _, _ in pending) + sum(len(states) for states, _, _ in pending_arrays)
+        self.inference_seconds += time.perf_counter() - flush_start
+    
+    @staticmethod
+    def _group(pending):
+        """按请求绑定的智能体分组"""
+        groups = {}
+        for entry in pending:
+            groups.setdefault(entry[2], []).append(entry)
+        return groups.items()
+    
+    def stats(self):
+        """推理批处理统计"""
+        return {
+            'flushes': self.flushes,
+            'requests': self.requests,
+            'rows': self.rows,
+            'mean_batch_rows': self.rows / self.flushes if self.flushes else 0.0,
+            'inference_seconds': self.inference_seconds,
+            'mean_flush_us': self.inference_seconds / self.flushes * 1e6 if self.flushes else 0.0
+        }
+    
+    def _flush_game_states(self, pending, agent):
+        """游戏状态字典请求：按max_batch_size分块转换并推理"""
+        game_states = [game_state for states, _, _ in pending for game_state in states]
+        actions = []
+        for start in range(0, len(game_states), self.max_batch_size):
+            actions.extend(self._run_batch(game_states[start:start + self.max_batch_size], agent))
+        
+        offset = 0
+        for states, future, _ in pending:
+            if not future.done():
+                future.set_result(actions[offset:offset + len(states)])
+            offset += len(states)
+    
+    def _flush_arrays(self, pending, agent):
+        """特征矩阵请求无需转换，拼接后按max_batch_size分块推理"""
+        states = np.concatenate([states for states, _, _ in pending], dtype=np.float64)
+        actions = np.concatenate([
+            agent.greedy_actions(states[start:start + self.max_batch_size])
+            for start in range(0, len(states), self.max_batch_size)
+        ])
+        
+        offset = 0
+        for request_states, future, _ in pending:
+            if not future.done():
+                future.set_result(actions[offset:offset + len(request_states)])
+            offset += len(request_states)
+    
+    def _run_batch(self, game_states, agent):
+        """转换并推理一批游戏状态，返回动作名称列表，无法解析的游戏状态返回'none'"""
+        states = self._states[:len(game_states)]
+        valid = np.ones(len(game_states), dtype=bool)
+        
+        for i, game_state in enumerate(game_states):
+            try:
+                self.trainer.convert_game_state(game_state, out=states[i])
+            except (AttributeError, KeyError, TypeError, ValueError) as e:
+                print(f"无效的游戏状态: {e}")
+                valid[i] = False
+        
+        actions = agent.greedy_actions(states).tolist()
+        
+        return [self.trainer.ACTION_NAMES[action] if ok else 'none'
+                for action, ok in zip(actions, valid.tolist())]
+
+
+class RequestPipeline:
+    """单个连接上的请求流水线
+    
+    推理请求作为独立任务并发执行，客户端不必等上一个响应就能发送下一个请求，
+    响应通过请求id对应；同时在途的请求数不超过max_in_flight，超过时暂停读取该连接。
+    """
+    
+    def __init__(self, max_in_flight=256):
+        self.max_in_flight = max_in_flight
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._tasks = set()
+    
+    def __len__(self):
+        return len(self._tasks)
+    
+    async def submit(self, coro):
+        """等待空闲名额后在后台运行coro"""
+        await self._slots.acquire()
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._done)
+        return task
+    
+    def _done(self, task):
+        self._tasks.discard(task)
+        self._slots.release()
+    
+    def cancel(self):
+        """连接断开时取消尚未完成的请求"""
+        for task in list(self._tasks):
+            task.cancel()
@@ -0,0 +1,132 @@
+"""
+AI Dino Arena - 模型版本库
+推理使用的模型是不可变的版本快照：检查点以原子重命名写入，已映射的旧文件内容不会再变，
+因此新检查点落盘后只需把新文件内存映射为一个新版本，再替换"当前版本"的引用即可，
+推理从不等待训练写入，也不会读到写了一半的模型；客户端可以固定使用某个版本
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+
+from evaluation import load_agent
+
+
+class ModelVersion:
+    """一个只读的模型版本"""
+    
+    __slots__ = ('version', 'agent', 'path', 'file_id', 'loaded_at', 'load_ms')
+    
+    def __init__(self, version, agent, path, file_id, load_ms):
+        self.version = version
+        self.agent = agent
+        self.path = path
+        self.file_id = file_id
+        self.loaded_at = time.time()
+        self.load_ms = load_ms
+    
+    def describe(self):
+        return {
+            'version': self.version,
+            'path': self.path,
+            'loaded_at': self.loaded_at,
+            'load_ms': self.load_ms
+        }
+
+
+class ModelRegistry:
+    """推理模型的版本库
+    
+    reload检测到模型文件变化时加载为新版本并切换为当前版本（一次引用赋值）；
+    保留最近keep个版本，被客户端固定的版本不会被淘汰。
+    """
+    
+    def __init__(self, model_path, legacy_model_path=None, keep=5):
+        self.model_path = model_path
+        self.legacy_model_path = legacy_model_path
+        self.keep = keep
+        
+        self.versions = OrderedDict()
+        self.current = None
+        self.swaps = 0
+        self._next_version = 1
+        self._pins = {}
+    
+    def get(self, version=None):
+        """取指定版本（为空时取当前版本），版本不存在时返回None"""
+        if version is None:
+            return self.current
+        return self.versions.get(version)
+    
+    def reload(self, force=False):
+        """模型文件有变化（或force）时加载为新版本，返回当前版本（没有模型时返回None）"""
+        path = self.model_path
+        if not os.path.exists(path):
+            if not self.legacy_model_path or not os.path.exists(self.legacy_model_path):
+                return self.current
+            path = self.legacy_model_path
+        
+        # 以inode、修改时间和大小识别文件：检查点总是写入新文件再重命名
+        stat = os.stat(path)
+        file_id = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if not force and self.current is not None and self.current.file_id == file_id:
+            return self.current
+        
+        start = time.perf_counter()
+        agent = load_agent(path)
+        agent.model_array().flags.writeable = False
+        return self.publish(agent, path, file_id, (time.perf_counter() - start) * 1000)
+    
+    def publish(self, agent, path=None, file_id=None, load_ms=0.0):
+        """把已加载的智能体登记为新版本并切换为当前版本"""
+        version = ModelVersion(self._next_version, agent, path, file_id, load_ms)
+        self._next_version += 1
+        
+        self.versions[version.version] = version
+        self.current = version
+        self.swaps += 1
+        self._evict()
+        
+        return version
+    
+    def pin(self, version):
+        """固定一个版本（引用计数），返回是否成功"""
+        if version not in self.versions:
+            return False
+        self._pins[version] = self._pins.get(version, 0) + 1
+        return True
+    
+    def unpin(self, version):
+        """取消一次固定"""
+        count = self._pins.get(version, 0) - 1
+        if count > 0:
+            self._pins[version] = count
+        else:
+            self._pins.pop(version, None)
+            self._evict()
+    
+    def _evict(self):
+        """淘汰超出keep的旧版本（跳过当前版本和被固定的版本）"""
+        for version in list(self.versions):
+            if len(self.versions) <= self.keep:
+                break
+            if version != self.current.version and version not in self._pins:
+                del self.versions[version]
+    
+    async def watch(self, interval=0.5):
+        """定期检查模型文件，检查点落盘后自动切换版本"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"重新加载模型时出错: {e}")
+    
+    def describe(self):
+        """版本列表，可直接序列化为JSON"""
+        return {
+            'current': self.current.version if self.current is not None else None,
+            'versions': [version.describe() for version in self.versions.values()],
+            'pinned': sorted(self._pins)
+        }
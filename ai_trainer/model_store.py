@@ -0,0 +1,127 @@
+"""
+AI Dino Arena - 模型文件格式
+二进制模型文件 = 定长头部（魔数、版本、JSON元数据）+ 连续存放的数组数据，
+可以用np.memmap只读映射，推理服务启动时无需反序列化；
+回合统计单独写入只追加的 .stats 文件，保存成本与训练历史长度无关
+"""
+
+import json
+import os
+import struct
+
+import numpy as np
+
+MAGIC = b'DINOQMDL'
+FORMAT_VERSION = 1
+
+# 头部固定长度，数据区按页对齐便于内存映射
+HEADER_SIZE = 4096
+_PREFIX = struct.Struct('<8sII')
+
+# 回合统计记录格式
+STATS_DTYPE = np.dtype([('score', '<f8'), ('reward', '<f8')])
+
+
+def is_model_file(filepath):
+    """判断文件是否为二进制模型格式"""
+    with open(filepath, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def save_array(filepath, array, metadata=None):
+    """原子地写入模型文件：先写临时文件再重命名"""
+    array = np.ascontiguousarray(array)
+    header = dict(metadata or {})
+    header.update({
+        'shape': list(array.shape),
+        'dtype': array.dtype.str
+    })
+    header_bytes = json.dumps(header).encode('utf-8')
+    if _PREFIX.size + len(header_bytes) > HEADER_SIZE:
+        raise ValueError(f"模型元数据过大: {len(header_bytes)} 字节")
+    
+    tmp_path = f"{filepath}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b'\0' * (HEADER_SIZE - _PREFIX.size - len(header_bytes)))
+        f.write(array.data)
+        f.flush()
+        os.fsync(f.fileno())
+    
+    os.replace(tmp_path, filepath)
+
+
+def read_header(filepath):
+    """读取模型文件的元数据"""
+    with open(filepath, 'rb') as f:
+        prefix = f.read(_PREFIX.size)
+        if len(prefix) < _PREFIX.size:
+            raise ValueError(f"模型文件不完整: {filepath}")
+        
+        magic, version, header_length = _PREFIX.unpack(prefix)
+        if magic != MAGIC:
+            raise ValueError(f"不是二进制模型文件: {filepath}")
+        if version > FORMAT_VERSION:
+            raise ValueError(f"不支持的模型格式版本 {version}（当前支持 {FORMAT_VERSION}）: {filepath}")
+        
+        header = json.loads(f.read(header_length).decode('utf-8'))
+    
+    header['format_version'] = version
+    return header
+
+
+def load_array(filepath, mmap=False):
+    """加载模型文件，返回 (数组, 元数据)
+    
+    mmap=True 时返回只读的内存映射数组，加载时间与模型大小无关。
+    """
+    header = read_header(filepath)
+    shape = tuple(header['shape'])
+    dtype = np.dtype(header['dtype'])
+    
+    if mmap:
+        array = np.memmap(filepath, dtype=dtype, mode='r', offset=HEADER_SIZE, shape=shape)
+    else:
+        array = np.fromfile(filepath, dtype=dtype, offset=HEADER_SIZE,
+                            count=int(np.prod(shape))).reshape(shape)
+    
+    return array, header
+
+
+def stats_path(filepath):
+    """模型对应的回合统计文件路径"""
+    return f"{filepath}.stats"
+
+
+def append_stats(filepath, scores, rewards):
+    """把新回合的分数和奖励追加到统计文件"""
+    records = np.empty(len(scores), dtype=STATS_DTYPE)
+    records['score'] = scores
+    records['reward'] = rewards
+    
+    with open(stats_path(filepath), 'ab') as f:
+        f.write(records.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def load_stats(filepath, mmap=True):
+    """读取回合统计（默认内存映射，不随历史长度增加加载时间）"""
+    path = stats_path(filepath)
+    if not os.path.exists(path) or os.path.getsize(path) < STATS_DTYPE.itemsize:
+        return np.empty(0, dtype=STATS_DTYPE)
+    
+    count = os.path.getsize(path) // STATS_DTYPE.itemsize
+    if mmap:
+        return np.memmap(path, dtype=STATS_DTYPE, mode='r', shape=(count,))
+    return np.fromfile(path, dtype=STATS_DTYPE, count=count)
+
+
+def save_json(filepath, data):
+    """原子地写入JSON文件"""
+    tmp_path = f"{filepath}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    
+    os.replace(tmp_path, filepath)
@@ -0,0 +1,268 @@
+"""
+AI Dino Arena - 多进程并行训练
+每个工作进程拥有独立的DinoEnvironment和随机种子，
+本地更新Q表并定期把增量合并到共享内存中的中心Q表
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import queue
+import tempfile
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from dino_ai_trainer import DinoTrainer
+from replay_buffer import PrioritizedReplayBuffer
+from seeding import spawn_seeds
+
+# 等待工作进程上报结果的超时（秒），超时后检查是否有工作进程未上报就退出
+RESULT_TIMEOUT = 1.0
+
+
+def epsilon_after(epsilon, epsilon_decay, epsilon_min, episodes):
+    """计算从epsilon开始经过episodes次decay_epsilon后的探索率"""
+    for _ in range(episodes):
+        if epsilon <= epsilon_min:
+            break
+        epsilon *= epsilon_decay
+    return epsilon
+
+
+def run_worker(worker_id, seed, shm_name, shape, lock, episode_counter, total_episodes,
+               result_queue, sync_seconds, trainer_params):
+    """工作进程：独立环境中运行回合，定期与共享Q表合并
+    
+    回合由DinoTrainer.run_episode运行，与单进程训练使用同一个训练循环；
+    trainer_params为DinoTrainer的构造参数。结束时上报 (worker_id, None, None, 错误信息或None)。
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    shared_q = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    error = None
+    try:
+        # 每个进程的训练器使用从运行种子派生的独立随机数流
+        trainer = DinoTrainer(seed=seed, **trainer_params)
+        agent = trainer.agent
+        start_epsilon = agent.epsilon
+        
+        np.copyto(agent.q_table, shared_q)
+        base_q = agent.q_table.copy()
+        agent.updated_rows = set()
+        
+        scores = []
+        rewards = []
+        episode_steps = []
+        last_sync = time.time()
+        
+        while True:
+            # 领取全局回合号
+            with episode_counter.get_lock():
+                if episode_counter.value >= total_episodes:
+                    break
+                episode = episode_counter.value
+                episode_counter.value += 1
+            
+            # 探索率从主进程智能体的探索率开始按全局回合数衰减，与单进程训练一致
+            agent.epsilon = epsilon_after(start_epsilon, agent.epsilon_decay, agent.epsilon_min, episode)
+            
+            total_reward, steps = trainer.run_episode()
+            
+            scores.append(trainer.episode_score())
+            rewards.append(total_reward)
+            episode_steps.append(steps)
+            
+            # 按时间间隔同步，合并开销不随回合长短变化
+            if time.time() - last_sync >= sync_seconds:
+                sync_q_table(agent, base_q, shared_q, lock)
+                last_sync = time.time()
+                result_queue.put((worker_id, scores, rewards, episode_steps))
+                scores = []
+                rewards = []
+                episode_steps = []
+        
+        sync_q_table(agent, base_q, shared_q, lock)
+        result_queue.put((worker_id, scores, rewards, episode_steps))
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        result_queue.put((worker_id, None, None, error))
+        del shared_q
+        shm.close()
+
+
+def sync_q_table(agent, base_q, shared_q, lock):
+    """把本地Q表相对上次同步的增量累加到共享Q表，再拉取最新共享Q表
+    
+    只合并agent.updated_rows记录的行，持锁时间与本轮更新过的状态数成正比；
+    共享Q表只由各进程在持锁时累加增量，拉取整表是只读操作，在锁外进行。
+    """
+    rows = np.fromiter(agent.updated_rows, dtype=np.int64, count=len(agent.updated_rows))
+    agent.updated_rows.clear()
+    local_q = agent.q_table
+    delta = local_q[rows] - base_q[rows]
+    
+    with lock:
+        shared_q[rows] += delta
+    
+    np.copyto(local_q, shared_q)
+    np.copyto(base_q, local_q)
+
+
+class ParallelTrainer:
+    """多进程并行训练器"""
+    
+    def __init__(self, trainer=None, workers=None, sync_seconds=0.5, seed=None):
+        self.trainer = trainer or DinoTrainer()
+        self.workers = workers or mp.cpu_count()
+        self.sync_seconds = sync_seconds
+        self.seed = seed
+    
+    def train(self, episodes=1000, save_interval=100):
+        """用多个工作进程训练，统计汇总到trainer.training_stats"""
+        trainer = self.trainer
+        agent = trainer.agent
+        
+        print(f"开始并行训练，目标回合数: {episodes}，工作进程数: {self.workers}")
+        start_time = time.time()
+        
+        # 中心Q表放在共享内存中，主进程的智能体直接使用该视图，保存模型时读取
+        shm = shared_memory.SharedMemory(create=True, size=agent.q_table.nbytes)
+        shared_q = np.ndarray(agent.q_table.shape, dtype=np.float64, buffer=shm.buf)
+        np.copyto(shared_q, agent.q_table)
+        agent.q_table = shared_q
+        processes = []
+        try:
+            ctx = mp.get_context()
+            lock = ctx.Lock()
+            episode_counter = ctx.Value('q', 0)
+            result_queue = ctx.Queue()
+            
+            seeds = spawn_seeds(trainer.seed if self.seed is None else self.seed, self.workers)
+            # 工作进程的训练器沿用主进程（可能是加载的模型）的探索率、经验回放和帧跳过设置
+            trainer_params = {
+                'replay_batch_size': trainer.replay_batch_size,
+                'replay_interval': trainer.replay_interval,
+                'prioritized_replay': isinstance(agent.memory, PrioritizedReplayBuffer),
+                'frame_skip': trainer.env.frame_skip,
+                'agent_params': {
+                    'learning_rate': agent.learning_rate,
+                    'epsilon': agent.epsilon,
+                    'epsilon_decay': agent.epsilon_decay,
+                    'epsilon_min': agent.epsilon_min,
+                    'gamma': agent.gamma,
+                    'memory_size': agent.memory.capacity
+                }
+            }
+            processes = [
+                ctx.Process(target=run_worker,
+                            args=(worker_id, seeds[worker_id], shm.name, shared_q.shape, lock,
+                                  episode_counter, episodes, result_queue, self.sync_seconds,
+                                  trainer_params),
+                            daemon=True)
+                for worker_id in range(self.workers)
+            ]
+            for process in processes:
+                process.start()
+            
+            # 汇总各工作进程上报的回合结果
+            episode = 0
+            finished = set()
+            exited = set()
+            while len(finished) < self.workers:
+                try:
+                    worker_id, worker_scores, worker_rewards, worker_steps = result_queue.get(timeout=RESULT_TIMEOUT)
+                except queue.Empty:
+                    # 被强制终止（如内存不足）的工作进程不会再上报，不能无限等待；
+                    # 进程退出前写入的结果在下一个超时周期内一定能读到，连续两次发现才判定为异常退出
+                    for worker_id, process in enumerate(processes):
+                        if worker_id in finished or process.exitcode is None:
+                            continue
+                        if worker_id in exited:
+                            raise RuntimeError(f"工作进程 {worker_id} 未上报结果就退出了（退出码 {process.exitcode}）")
+                        exited.add(worker_id)
+                    continue
+                
+                if worker_scores is None:
+                    if worker_steps is not None:
+                        raise RuntimeError(f"工作进程 {worker_id} 出错: {worker_steps}")
+                    finished.add(worker_id)
+                    continue
+                
+                for score, total_reward, steps in zip(worker_scores, worker_rewards, worker_steps):
+                    trainer.finish_episode(episode, episodes, score, total_reward, steps, save_interval)
+                    episode += 1
+            
+            for process in processes:
+                process.join()
+            
+            elapsed = time.time() - start_time
+            trainer.training_stats['episodes_per_second'] = episode / elapsed if elapsed > 0 else 0
+        finally:
+            # 出错时停止仍在运行的工作进程；释放共享内存前把中心Q表拷回主进程
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+                    process.join()
+            agent.q_table = np.array(shared_q)
+            del shared_q
+            shm.close()
+            shm.unlink()
+        
+        trainer.finish_training(start_time)
+        print(f"吞吐量: {trainer.training_stats['episodes_per_second']:.1f} 回合/秒")
+        
+        return trainer.training_stats
+
+
+def benchmark_speedup(episodes=2000, max_workers=None, seed=0):
+    """测量不同工作进程数下的训练吞吐量与加速比"""
+    max_workers = max_workers or mp.cpu_count()
+    worker_counts = []
+    count = 1
+    while count < max_workers:
+        worker_counts.append(count)
+        count *= 2
+    worker_counts.append(max_workers)
+    
+    results = []
+    for workers in worker_counts:
+        # 模型与统计写入临时目录，不覆盖正式训练结果
+        with tempfile.TemporaryDirectory() as tmpdir:
+            trainer = DinoTrainer(seed=seed)
+            trainer.model_path = os.path.join(tmpdir, 'dino_q_model.bin')
+            trainer.stats_path = os.path.join(tmpdir, 'training_stats.json')
+            parallel = ParallelTrainer(trainer, workers=workers, seed=seed)
+            
+            start_time = time.time()
+            parallel.train(episodes=episodes, save_interval=episodes + 1)
+            elapsed = time.time() - start_time
+        
+        results.append({
+            'workers': workers,
+            'seconds': elapsed,
+            'episodes_per_second': episodes / elapsed
+        })
+    
+    baseline = results[0]['episodes_per_second']
+    print("=" * 50)
+    print(f"{'进程数':>6} {'耗时(秒)':>10} {'回合/秒':>10} {'加速比':>8}")
+    for result in results:
+        result['speedup'] = result['episodes_per_second'] / baseline
+        print(f"{result['workers']:>6} {result['seconds']:>10.2f} "
+              f"{result['episodes_per_second']:>10.1f} {result['speedup']:>8.2f}")
+    
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='并行训练加速比测试')
+    parser.add_argument('--episodes', type=int, default=2000,
+                       help='每种进程数下训练的回合数')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='最大工作进程数（默认CPU核数）')
+    args = parser.parse_args()
+    
+    benchmark_speedup(episodes=args.episodes, max_workers=args.workers)
@@ -0,0 +1,142 @@
+"""
+AI Dino Arena - 性能剖析
+按阶段统计训练循环中各热点函数的累计耗时和调用次数，用于决定下一步优化哪条热路径。
+计时通过在对象实例上替换方法实现：未启用时训练循环中没有任何额外代码，开销为零
+"""
+
+import cProfile
+import functools
+import pstats
+import time
+
+# 训练器中按阶段计时的方法：(阶段名, 对象路径, 方法名)，对象上不存在的方法自动跳过
+TRAINER_PHASES = (
+    ('env.step', 'env', 'step'),
+    ('agent.get_action', 'agent', 'get_action'),
+    ('agent.get_actions', 'agent', 'get_actions'),
+    ('agent.get_action_code', 'agent', 'get_action_code'),
+    ('agent.discretize_state', 'agent', 'discretize_state'),
+    ('agent.update_q_table', 'agent', 'update_q_table'),
+    ('agent.update_code', 'agent', 'update_code'),
+    ('agent.update_trajectory', 'agent', 'update_trajectory'),
+    ('agent.update_batch', 'agent', 'update_batch'),
+    ('agent.remember', 'agent', 'remember'),
+    ('agent.remember_batch', 'agent', 'remember_batch'),
+    ('agent.replay', 'agent', 'replay'),
+    ('trainer.checkpoint', None, 'checkpoint'),
+    ('agent.save_model', 'agent', 'save_model')
+)
+
+# 批量训练在train_batch中创建的BatchDinoEnvironment上计时的方法：(阶段名, 方法名)
+# step内部自动重置结束的游戏，因此batch_env.reset同时是batch_env.step的子阶段
+BATCH_ENV_PHASES = (
+    ('batch_env.step', 'step'),
+    ('batch_env.reset', 'reset')
+)
+
+
+class PhaseProfiler:
+    """按阶段累计耗时和调用次数
+    
+    阶段可以嵌套（如get_action内部调用discretize_state），
+    total为包含子阶段的总耗时，self为扣除子阶段后的自身耗时。
+    """
+    
+    def __init__(self):
+        self.phases = {}
+        self._stack = []
+        self._patched = []
+    
+    def instrument(self, obj, method_name, phase=None):
+        """为obj的方法加上计时（只影响该实例）"""
+        phase = phase or method_name
+        method = getattr(obj, method_name)
+        record = self.phases.setdefault(phase, [0, 0.0, 0.0])
+        stack = self._stack
+        perf_counter = time.perf_counter
+        
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            stack.append(0.0)
+            start = perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = perf_counter() - start
+                child_time = stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+                record[0] += 1
+                record[1] += elapsed
+                record[2] += elapsed - child_time
+        
+        setattr(obj, method_name, timed)
+        self._patched.append((obj, method_name))
+    
+    def instrument_trainer(self, trainer):
+        """为DinoTrainer的环境、智能体和检查点方法加上计时，批量训练创建的环境同样计时"""
+        for phase, path, method_name in TRAINER_PHASES:
+            obj = trainer if path is None else getattr(trainer, path)
+            if hasattr(obj, method_name):
+                self.instrument(obj, method_name, phase)
+        
+        if hasattr(trainer, 'create_batch_env'):
+            create_batch_env = trainer.create_batch_env
+            
+            @functools.wraps(create_batch_env)
+            def create_instrumented(*args, **kwargs):
+                env = create_batch_env(*args, **kwargs)
+                for phase, method_name in BATCH_ENV_PHASES:
+                    self.instrument(env, method_name, phase)
+                return env
+            
+            trainer.create_batch_env = create_instrumented
+            self._patched.append((trainer, 'create_batch_env'))
+        return self
+    
+    def remove(self):
+        """撤销全部计时，恢复原方法"""
+        for obj, method_name in reversed(self._patched):
+            delattr(obj, method_name)
+        self._patched = []
+    
+    def reset(self):
+        """清零统计"""
+        for record in self.phases.values():
+            record[:] = [0, 0.0, 0.0]
+    
+    def summary(self):
+        """各阶段统计（按总耗时降序），可直接序列化为JSON"""
+        rows = [{
+            'phase': phase,
+            'calls': calls,
+            'total_seconds': total,
+            'self_seconds': own,
+            'mean_us': total / calls * 1e6 if calls else 0.0
+        } for phase, (calls, total, own) in self.phases.items()]
+        rows.sort(key=lambda row: row['total_seconds'], reverse=True)
+        return rows
+    
+    def report(self, elapsed=None):
+        """打印阶段耗时表（省略未调用的阶段），elapsed为总运行时间时同时显示自身耗时占比"""
+        print(f"{'阶段':<24} {'调用次数':>10} {'总耗时(秒)':>11} {'自身耗时(秒)':>12} {'平均(微秒)':>11} {'占比':>7}")
+        for row in self.summary():
+            if not row['calls']:
+                continue
+            share = f"{row['self_seconds'] / elapsed:>6.1%}" if elapsed else ''
+            print(f"{row['phase']:<24} {row['calls']:>10} {row['total_seconds']:>11.3f} "
+                  f"{row['self_seconds']:>12.3f} {row['mean_us']:>11.2f} {share:>7}")
+
+
+def run_cprofile(func, output, top=20):
+    """在cProfile下运行func并把统计写入output
+    
+    输出为pstats格式，可用snakeviz、gprof2dot或flameprof转换为调用图或火焰图。
+    """
+    profile = cProfile.Profile()
+    try:
+        return profile.runcall(func)
+    finally:
+        profile.dump_stats(output)
+        print(f"cProfile统计已保存到 {output}")
+        pstats.Stats(profile).sort_stats('cumulative').print_stats(top)
@@ -0,0 +1,121 @@
+"""
+AI Dino Arena - 经验回放
+预分配的环形缓冲区，经验按列存放在连续数组中，
+支持均匀采样和按TD误差的优先级采样
+"""
+
+import numpy as np
+
+
+class ReplayBuffer:
+    """均匀采样的经验回放缓冲区"""
+    
+    def __init__(self, capacity, state_size, rng=None):
+        self.capacity = capacity
+        self.rng = rng or np.random.default_rng()
+        
+        self.states = np.zeros((capacity, state_size))
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity)
+        self.next_states = np.zeros((capacity, state_size))
+        self.dones = np.zeros(capacity, dtype=bool)
+        
+        self.position = 0
+        self.size = 0
+    
+    def __len__(self):
+        return self.size
+    
+    def add(self, state, action, reward, next_state, done):
+        """写入一条经验，缓冲区满时覆盖最旧的经验"""
+        i = self.position
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = next_state
+        self.dones[i] = done
+        
+        self._advance(1)
+        return i
+    
+    def add_batch(self, states, actions, rewards, next_states, dones):
+        """一次写入多条经验，返回写入位置"""
+        count = len(actions)
+        if count > self.capacity:
+            # 超过容量时只保留最新的部分
+            start = count - self.capacity
+            states, actions, rewards = states[start:], actions[start:], rewards[start:]
+            next_states, dones = next_states[start:], dones[start:]
+            count = self.capacity
+        
+        indices = (self.position + np.arange(count)) % self.capacity
+        self.states[indices] = states
+        self.actions[indices] = actions
+        self.rewards[indices] = rewards
+        self.next_states[indices] = next_states
+        self.dones[indices] = dones
+        
+        self._advance(count)
+        return indices
+    
+    def _advance(self, count):
+        self.position = (self.position + count) % self.capacity
+        self.size = min(self.size + count, self.capacity)
+    
+    def sample(self, batch_size):
+        """均匀采样一个小批量，返回 (indices, states, actions, rewards, next_states, dones, weights)"""
+        indices = self.rng.integers(0, self.size, size=batch_size)
+        return self._gather(indices, None)
+    
+    def _gather(self, indices, weights):
+        return (indices, self.states[indices], self.actions[indices], self.rewards[indices],
+                self.next_states[indices], self.dones[indices], weights)
+    
+    def update_priorities(self, indices, td_errors):
+        """均匀采样不使用优先级"""
+
+
+class PrioritizedReplayBuffer(ReplayBuffer):
+    """按TD误差比例采样的经验回放缓冲区（Prioritized Experience Replay）"""
+    
+    def __init__(self, capacity, state_size, alpha=0.6, beta=0.4, priority_epsilon=1e-3, rng=None):
+        super().__init__(capacity, state_size, rng=rng)
+        self.alpha = alpha
+        self.beta = beta
+        self.priority_epsilon = priority_epsilon
+        
+        # 存放已经取alpha次幂的优先级，采样时无需重复计算
+        self.priorities = np.zeros(capacity)
+        self.max_priority = 1.0
+    
+    def add(self, state, action, reward, next_state, done):
+        i = super().add(state, action, reward, next_state, done)
+        # 新经验使用当前最大优先级，保证至少被采样一次
+        self.priorities[i] = self.max_priority
+        return i
+    
+    def add_batch(self, states, actions, rewards, next_states, dones):
+        indices = super().add_batch(states, actions, rewards, next_states, dones)
+        self.priorities[indices] = self.max_priority
+        return indices
+    
+    def sample(self, batch_size):
+        """按优先级采样，同时返回用于修正偏差的重要性采样权重"""
+        priorities = self.priorities[:self.size]
+        cumulative = np.cumsum(priorities)
+        total = cumulative[-1]
+        
+        targets = self.rng.random(batch_size) * total
+        indices = np.minimum(np.searchsorted(cumulative, targets, side='right'), self.size - 1)
+        
+        probabilities = priorities[indices] / total
+        weights = (self.size * probabilities) ** -self.beta
+        weights /= weights.max()
+        
+        return self._gather(indices, weights)
+    
+    def update_priorities(self, indices, td_errors):
+        """用最新的TD误差更新被采样经验的优先级"""
+        priorities = (np.abs(td_errors) + self.priority_epsilon) ** self.alpha
+        self.priorities[indices] = priorities
+        self.max_priority = max(self.max_priority, float(priorities.max()))
@@ -0,0 +1,44 @@
+"""
+AI Dino Arena - 随机数流
+一次运行的全部随机性都从一个运行种子派生：环境、智能体、回放缓冲区和工作进程
+各自拥有独立的numpy.random.Generator，互不干扰且可以完整复现
+"""
+
+import numpy as np
+
+
+def seed_sequence(seed=None):
+    """把整数种子（或None）转换为SeedSequence，已是SeedSequence时原样返回"""
+    if isinstance(seed, np.random.SeedSequence):
+        return seed
+    return np.random.SeedSequence(seed)
+
+
+def spawn_seeds(seed, count):
+    """从种子派生count个互相独立的子种子
+    
+    传入SeedSequence时会记录已派生的数量，重复调用得到新的子种子。
+    """
+    return seed_sequence(seed).spawn(count)
+
+
+class UniformStream:
+    """按块从Generator取[0, 1)均匀随机数，逐个取用时避免每次调用Generator的开销"""
+    
+    __slots__ = ('rng', 'block_size', '_buffer', '_index')
+    
+    def __init__(self, rng, block_size=1024):
+        self.rng = rng
+        self.block_size = block_size
+        self._buffer = []
+        self._index = 0
+    
+    def random(self):
+        """取下一个均匀随机数"""
+        if self._index == len(self._buffer):
+            self._buffer = self.rng.random(self.block_size).tolist()
+            self._index = 0
+        
+        value = self._buffer[self._index]
+        self._index += 1
+        return value
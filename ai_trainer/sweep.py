@@ -0,0 +1,190 @@
+"""
+AI Dino Arena - 超参数搜索
+在进程池中并发训练多组QLearningAgent超参数（网格搜索或随机搜索），
+各进程之间只共享结果：滚动平均分明显落后于当前最好配置的试验提前停止，
+结束后按滚动平均分排名并写入JSON汇总
+"""
+
+import argparse
+import itertools
+import json
+import math
+import multiprocessing as mp
+import time
+
+import numpy as np
+
+from dino_ai_trainer import DinoTrainer
+from seeding import spawn_seeds
+from telemetry import RollingWindow
+
+# 默认搜索空间：网格搜索取全部组合，随机搜索在每个参数的[最小值, 最大值]区间内按对数均匀采样
+SEARCH_SPACE = {
+    'learning_rate': [0.001, 0.01, 0.05, 0.1],
+    'epsilon_decay': [0.99, 0.995, 0.998],
+    'epsilon_min': [0.01, 0.05],
+    'gamma': [0.9, 0.95, 0.99]
+}
+
+# 工作进程中所有试验共享的最好滚动平均分（由进程池initializer设置）
+_best_score = None
+
+
+def grid_configs(space=None):
+    """网格搜索：搜索空间中全部参数组合"""
+    space = space or SEARCH_SPACE
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def random_configs(space=None, trials=20, rng=None):
+    """随机搜索：每个参数在其取值列表的[最小值, 最大值]区间内按对数均匀采样"""
+    space = space or SEARCH_SPACE
+    rng = rng if rng is not None else np.random.default_rng()
+    
+    configs = []
+    for _ in range(trials):
+        config = {}
+        for name, values in space.items():
+            low, high = math.log(min(values)), math.log(max(values))
+            config[name] = float(math.exp(rng.uniform(low, high)))
+        configs.append(config)
+    return configs
+
+
+def _init_worker(best_score):
+    global _best_score
+    _best_score = best_score
+
+
+def run_trial(trial_id, params, seed, episodes, frame_skip=1, window=100,
+              min_episodes=None, check_interval=25, prune_ratio=0.5):
+    """训练一组超参数并返回结果（在工作进程中运行）
+    
+    每个回合由DinoTrainer.run_episode运行，与正式训练使用同一个训练循环；
+    训练超过min_episodes回合后，每check_interval回合把自己的滚动平均分与共享的最好成绩比较，
+    低于其prune_ratio倍时提前停止。
+    """
+    min_episodes = episodes // 4 if min_episodes is None else min_episodes
+    trainer = DinoTrainer(seed=seed, frame_skip=frame_skip, agent_params=params)
+    scores = RollingWindow(window)
+    
+    start_time = time.time()
+    best_score = 0
+    total_steps = 0
+    pruned = False
+    episode = 0
+    
+    while episode < episodes:
+        _, steps = trainer.run_episode()
+        trainer.agent.decay_epsilon()
+        
+        score = trainer.episode_score()
+        scores.append(score)
+        best_score = max(best_score, score)
+        total_steps += steps
+        episode += 1
+        
+        # 早停：与其他试验上报的最好滚动平均分比较
+        if episode >= min_episodes and episode % check_interval == 0 and _best_score is not None:
+            rolling_score = scores.mean()
+            with _best_score.get_lock():
+                if rolling_score > _best_score.value:
+                    _best_score.value = rolling_score
+                shared_best = _best_score.value
+            
+            if episode < episodes and rolling_score < prune_ratio * shared_best:
+                pruned = True
+                break
+    
+    return {
+        'trial': trial_id,
+        'params': params,
+        'episodes': episode,
+        'pruned': pruned,
+        'rolling_score': float(scores.mean()),
+        'score_p90': scores.percentile(90),
+        'best_score': float(best_score),
+        'total_steps': total_steps,
+        'seconds': time.time() - start_time
+    }
+
+
+def _run_trial(args):
+    return run_trial(*args)
+
+
+def sweep(search='grid', trials=20, episodes=500, workers=None, seed=None, frame_skip=1,
+          space=None, output='sweep_results.json', prune_ratio=0.5):
+    """运行超参数搜索，返回按滚动平均分排名的结果列表"""
+    # 所有试验使用相同的环境和智能体种子，配置之间的差异只来自超参数
+    trial_seed, search_seed = spawn_seeds(seed, 2)
+    if search == 'grid':
+        configs = grid_configs(space)
+    elif search == 'random':
+        configs = random_configs(space, trials, np.random.default_rng(search_seed))
+    else:
+        raise ValueError(f"未知的搜索方式: {search}")
+    
+    workers = min(workers or mp.cpu_count(), len(configs))
+    print(f"开始超参数搜索（{search}），共 {len(configs)} 组配置，每组 {episodes} 回合，工作进程数: {workers}")
+    start_time = time.time()
+    
+    ctx = mp.get_context()
+    best_score = ctx.Value('d', 0.0)
+    tasks = [
+        (trial_id, params, trial_seed, episodes, frame_skip, 100, None, 25, prune_ratio)
+        for trial_id, params in enumerate(configs)
+    ]
+    
+    results = []
+    with ctx.Pool(workers, initializer=_init_worker, initargs=(best_score,)) as pool:
+        for result in pool.imap_unordered(_run_trial, tasks):
+            results.append(result)
+            status = '提前停止' if result['pruned'] else '完成'
+            print(f"[{len(results)}/{len(configs)}] 试验 {result['trial']} {status}: "
+                  f"{result['episodes']} 回合, 滚动平均分 {result['rolling_score']:.2f}, {result['params']}")
+    
+    results.sort(key=lambda result: result['rolling_score'], reverse=True)
+    for rank, result in enumerate(results, 1):
+        result['rank'] = rank
+    
+    elapsed = time.time() - start_time
+    summary = {
+        'search': search,
+        'episodes': episodes,
+        'seed': seed,
+        'frame_skip': frame_skip,
+        'workers': workers,
+        'seconds': elapsed,
+        'pruned': sum(result['pruned'] for result in results),
+        'results': results
+    }
+    with open(output, 'w') as f:
+        json.dump(summary, f, indent=2)
+    
+    print("=" * 50)
+    print(f"搜索完成，耗时 {elapsed:.1f}秒，提前停止 {summary['pruned']} 组")
+    print(f"{'排名':>4} {'滚动平均分':>10} {'回合':>6}  参数")
+    for result in results[:10]:
+        print(f"{result['rank']:>4} {result['rolling_score']:>10.2f} {result['episodes']:>6}  {result['params']}")
+    print(f"结果已保存到 {output}")
+    
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='QLearningAgent超参数搜索')
+    parser.add_argument('--search', choices=['grid', 'random'], default='grid')
+    parser.add_argument('--trials', type=int, default=20,
+                       help='随机搜索的配置数')
+    parser.add_argument('--episodes', type=int, default=500,
+                       help='每组配置训练的回合数')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='工作进程数（默认CPU核数）')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='sweep_results.json')
+    args = parser.parse_args()
+    
+    sweep(search=args.search, trials=args.trials, episodes=args.episodes, workers=args.workers,
+          seed=args.seed, output=args.output)
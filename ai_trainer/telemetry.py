@@ -0,0 +1,149 @@
+"""
+AI Dino Arena - 训练遥测
+固定窗口的滚动统计（O(1)更新）和批量刷写的JSONL日志，
+训练任意多回合内存占用都保持不变
+"""
+
+import json
+import time
+
+import numpy as np
+
+
+class RollingWindow:
+    """最近window个值的环形窗口，均值随写入O(1)更新，分位数在查询时计算"""
+    
+    __slots__ = ('values', 'window', 'count', 'position', 'total')
+    
+    def __init__(self, window=100):
+        self.values = np.zeros(window)
+        self.window = window
+        self.count = 0
+        self.position = 0
+        self.total = 0.0
+    
+    def __len__(self):
+        return self.count
+    
+    def append(self, value):
+        """写入一个值，窗口已满时替换最旧的值"""
+        if self.count == self.window:
+            self.total -= self.values[self.position]
+        else:
+            self.count += 1
+        
+        self.values[self.position] = value
+        self.total += value
+        self.position = (self.position + 1) % self.window
+        
+        # 每转一圈重新求和一次，消除增量更新累积的浮点误差（均摊仍为O(1)）
+        if self.position == 0:
+            self.total = float(self.values.sum())
+    
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+    
+    def percentile(self, q):
+        return float(np.percentile(self.values[:self.count], q)) if self.count else 0.0
+
+
+class TelemetryLog:
+    """只追加的JSONL日志，记录先缓存在内存中，每flush_every条一次写入文件"""
+    
+    def __init__(self, filepath, flush_every=100):
+        self.filepath = filepath
+        self.flush_every = flush_every
+        self._buffer = []
+    
+    def write(self, record):
+        self._buffer.append(json.dumps(record))
+        if len(self._buffer) >= self.flush_every:
+            self.flush()
+    
+    def flush(self):
+        if not self._buffer:
+            return
+        
+        with open(self.filepath, 'a') as f:
+            f.write('\n'.join(self._buffer) + '\n')
+        self._buffer = []
+
+
+class TrainingTelemetry:
+    """训练过程的滚动统计：分数、奖励、最高分和吞吐量"""
+    
+    def __init__(self, window=100, log_path=None, flush_every=100):
+        self.scores = RollingWindow(window)
+        self.rewards = RollingWindow(window)
+        self.log = TelemetryLog(log_path, flush_every) if log_path else None
+        
+        self.episodes = 0
+        self.total_steps = 0
+        self.best_score = 0
+        self.start_time = time.time()
+        
+        # 吞吐量按最近一个采样区间计算，反映当前速度而不是整个运行的平均值
+        self._rate_time = self.start_time
+        self._rate_steps = 0
+        self._rate_episodes = 0
+        self.steps_per_second = 0.0
+        self.episodes_per_second = 0.0
+    
+    def record_episode(self, score, reward, steps, **fields):
+        """记录一个回合，额外字段（如epsilon）只写入日志"""
+        self.episodes += 1
+        self.total_steps += int(steps)
+        self.best_score = max(self.best_score, score)
+        self.scores.append(score)
+        self.rewards.append(reward)
+        
+        if self.log is not None:
+            record = {
+                'episode': self.episodes,
+                'score': float(score),
+                'reward': float(reward),
+                'steps': int(steps),
+                'time': time.time()
+            }
+            record.update(fields)
+            self.log.write(record)
+    
+    def update_rates(self):
+        """用上次调用以来的步数和回合数更新吞吐量
+        
+        期间没有新回合时（如训练结束时紧接着最后一次上报再调用）保留上一个区间的吞吐量，
+        区间起点不变，下一次的吞吐量覆盖这段空闲时间。
+        """
+        if self.episodes == self._rate_episodes:
+            return
+        
+        now = time.time()
+        elapsed = now - self._rate_time
+        if elapsed > 0:
+            self.steps_per_second = (self.total_steps - self._rate_steps) / elapsed
+            self.episodes_per_second = (self.episodes - self._rate_episodes) / elapsed
+            self._rate_time = now
+            self._rate_steps = self.total_steps
+            self._rate_episodes = self.episodes
+    
+    def summary(self):
+        """当前滚动统计，可直接序列化为JSON"""
+        elapsed = time.time() - self.start_time
+        return {
+            'episodes': self.episodes,
+            'total_steps': self.total_steps,
+            'best_score': float(self.best_score),
+            'average_score': float(self.scores.mean()),
+            'score_p50': self.scores.percentile(50),
+            'score_p90': self.scores.percentile(90),
+            'average_reward': float(self.rewards.mean()),
+            'steps_per_second': float(self.steps_per_second),
+            'episodes_per_second': float(self.episodes_per_second),
+            'average_steps_per_second': self.total_steps / elapsed if elapsed > 0 else 0.0,
+            'elapsed': elapsed
+        }
+    
+    def close(self):
+        """写出日志中剩余的记录"""
+        if self.log is not None:
+            self.log.flush()
@@ -0,0 +1,99 @@
+"""
+AI Dino Arena - 推理请求测试
+get_action/get_actions中格式不正确的游戏状态返回带错误说明的条目，不影响同一请求中的其他游戏
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from ai_websocket_server import AITrainingServer
+
+GAME_STATE = {
+    'dino': {'x': 50, 'y': 103, 'velocityY': 0, 'isJumping': False, 'isDucking': False},
+    'obstacles': [{'x': 120, 'y': 115, 'width': 17, 'height': 35, 'type': 'cactus'}],
+    'speed': 7,
+    'score': 10
+}
+
+
+def game_state(**changes):
+    """在GAME_STATE基础上修改字段，键名中的双下划线表示嵌套字段（如dino__y）"""
+    state = json.loads(json.dumps(GAME_STATE))
+    for key, value in changes.items():
+        target = state
+        *parents, name = key.split('__')
+        for parent in parents:
+            target = target[parent]
+        target[name] = value
+    return state
+
+
+MALFORMED = {
+    'game_state': ("not a dict", "game_state 不是对象"),
+    'dino': (game_state(dino=[50, 103]), "dino 不是对象"),
+    'dino.x': (game_state(dino__x=None), "dino.x 不是数值"),
+    'dino.y': (game_state(dino__y='high'), "dino.y 不是数值"),
+    'dino.velocityY': (game_state(dino__velocityY=True), "dino.velocityY 不是数值"),
+    'obstacles': (game_state(obstacles={'x': 120}), "obstacles 不是数组"),
+    'obstacle': (game_state(obstacles=[120]), "obstacles[0] 不是对象"),
+    'obstacle.x': (game_state(obstacles=[{'y': 115}]), "obstacles[0].x 不是数值"),
+    'obstacle.y': (game_state(obstacles=[{'x': 120, 'y': '115'}]), "obstacles[0].y 不是数值"),
+    'speed': (game_state(speed='fast'), "speed 不是数值"),
+    'speed.nan': (game_state(speed=float('nan')), "speed 不是数值"),
+}
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    # 在空目录中创建服务器，不加载仓库中的模型文件
+    monkeypatch.chdir(tmp_path)
+    server = AITrainingServer()
+    server.sent = []
+    server.hub.send = lambda websocket, message: server.sent.append(json.loads(message))
+    return server
+
+
+def request(server, data):
+    """处理一个推理请求，返回回复的消息"""
+    asyncio.run(server.handle_inference(None, data))
+    return server.sent.pop()
+
+
+@pytest.mark.parametrize('case', sorted(MALFORMED))
+def test_get_actions_reports_malformed_game_state(server, case):
+    state, error = MALFORMED[case]
+    response = request(server, {'command': 'get_actions', 'id': 3, 'games': [
+        {'id': 'ok', 'game_state': GAME_STATE},
+        {'id': 'bad', 'game_state': state},
+    ]})
+    
+    assert response['type'] == 'ai_actions'
+    assert response['id'] == 3
+    ok, bad = response['data']['actions']
+    assert ok['id'] == 'ok' and ok['action'] in server.trainer.ACTION_NAMES
+    assert bad == {'id': 'bad', 'error': f"无效的游戏状态：{error}"}
+
+
+@pytest.mark.parametrize('case', sorted(MALFORMED))
+def test_get_action_reports_malformed_game_state(server, case):
+    state, error = MALFORMED[case]
+    response = request(server, {'command': 'get_action', 'game_state': state})
+    
+    assert response['data'] == {'action': 'none', 'error': f"无效的游戏状态：{error}"}
+
+
+def test_get_actions_entry_errors(server):
+    response = request(server, {'command': 'get_actions', 'games': [
+        'not a game',
+        {'id': 1},
+        {'id': 2, 'game_state': {}},
+        {'id': 3, 'game_state': game_state(dino=None, obstacles=None)},
+    ]})
+    
+    assert response['data']['actions'][0] == {'id': None, 'error': "无效的游戏条目：需要包含game_state字典的对象"}
+    # 未提供game_state时动作为'none'；缺省的dino和obstacles按默认值推理
+    assert response['data']['actions'][1] == {'id': 1, 'action': 'none'}
+    for entry in response['data']['actions'][2:]:
+        assert 'error' not in entry and entry['action'] in server.trainer.ACTION_NAMES
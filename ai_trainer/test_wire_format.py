@@ -0,0 +1,65 @@
+"""
+AI Dino Arena - 二进制消息格式测试
+真实环境状态经二进制帧编码、解码后，离散化得到的Q表行号必须与JSON请求完全一致
+"""
+
+import json
+
+import numpy as np
+
+import wire_format
+from dino_ai_trainer import DinoEnvironment, DinoTrainer, QLearningAgent
+
+
+def collect_states(seed=0, steps=20000):
+    """用随机策略推进环境，返回 (状态矩阵, 前端格式的游戏状态列表, 环境给出的行号)"""
+    agent = QLearningAgent()
+    env = DinoEnvironment(seed=seed)
+    env.set_state_codec(agent.state_codec())
+    rng = np.random.default_rng(seed)
+    
+    states, game_states, codes = [], [], []
+    state = env.reset()
+    for _ in range(steps):
+        states.append(state.copy())
+        game_states.append({
+            'dino': {'x': env.DINO_X, 'y': env.dino_y, 'velocityY': env.dino_velocity_y,
+                     'isJumping': env.is_jumping, 'isDucking': env.is_ducking},
+            'obstacles': env.obstacles,
+            'speed': env.speed,
+            'score': env.score
+        })
+        codes.append(env.state_code)
+        
+        state, _, done = env.step(int(rng.choice(3, p=[0.7, 0.2, 0.1])))
+        if done:
+            state = env.reset()
+    
+    return np.array(states), game_states, np.array(codes)
+
+
+def test_request_roundtrip():
+    states, _, _ = collect_states(steps=100)
+    request_id, decoded = wire_format.decode_request(wire_format.encode_request(states, request_id=7))
+    
+    assert request_id == 7
+    assert np.array_equal(decoded, states)
+
+
+def test_binary_and_json_states_give_same_codes():
+    trainer = DinoTrainer(seed=0)
+    agent = trainer.agent
+    states, game_states, env_codes = collect_states()
+    
+    # JSON路径：前端游戏状态经JSON序列化后由convert_game_state转换
+    json_states = np.array([trainer.convert_game_state(game_state)
+                            for game_state in json.loads(json.dumps(game_states, default=float))])
+    json_codes = agent.discretize_batch(json_states)
+    
+    # 二进制路径：特征矩阵编码为帧后解码
+    _, binary_states = wire_format.decode_request(wire_format.encode_request(states))
+    binary_codes = agent.discretize_batch(binary_states)
+    
+    assert np.array_equal(binary_codes, json_codes)
+    assert np.array_equal(binary_codes, env_codes)
+    assert np.array_equal(binary_codes, [agent.discretize_state(state) for state in binary_states])
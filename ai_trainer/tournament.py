@@ -0,0 +1,146 @@
+"""
+AI Dino Arena - 无界面对战
+多个模型检查点在相同种子的赛道上各跑一局（障碍物序列只由回合种子决定，与动作无关），
+分数高者获胜。比赛复用evaluation的批量评估，在多个进程中以最高速度运行，不经过前端渲染，
+结果按Elo、胜率和分数分位数排名并写入JSON
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import time
+
+import numpy as np
+
+from evaluation import episode_seeds, evaluate_agent, load_agent
+
+
+def play_matches(filepath, seeds, max_steps=10000, frame_skip=1, num_envs=256):
+    """用贪婪策略在给定种子上各跑一局（批量环境并发推进），返回 (分数列表, 总步数)"""
+    scores, steps = evaluate_agent(load_agent(filepath), seeds, num_envs, max_steps, frame_skip)
+    return scores.tolist(), int(steps.sum())
+
+
+def _play_job(job):
+    model_index, start, filepath, seeds, max_steps, frame_skip = job
+    scores, steps = play_matches(filepath, seeds, max_steps, frame_skip)
+    return model_index, start, scores, steps
+
+
+def elo_ratings(scores, k=16, initial=1000.0):
+    """按种子顺序逐轮更新Elo：每个种子上所有模型两两比较，同一轮的更新使用轮初的评分"""
+    ratings = np.full(scores.shape[0], initial)
+    for round_scores in scores.T:
+        outcome = 0.5 * (np.sign(round_scores[:, None] - round_scores[None, :]) + 1)
+        expected = 1.0 / (1.0 + 10 ** ((ratings[None, :] - ratings[:, None]) / 400))
+        np.fill_diagonal(outcome, 0)
+        np.fill_diagonal(expected, 0)
+        ratings += k * (outcome - expected).sum(axis=1)
+    return ratings
+
+
+def rank_models(paths, scores):
+    """由 (模型数, 比赛数) 分数矩阵计算胜率、两两胜率、分数分位数和Elo，按Elo排名"""
+    num_models, matches = scores.shape
+    # 两两胜率：胜计1，平计0.5
+    outcome = 0.5 * (np.sign(scores[:, None, :] - scores[None, :, :]) + 1)
+    head_to_head = outcome.mean(axis=2)
+    ratings = elo_ratings(scores)
+    
+    models = []
+    for i, path in enumerate(paths):
+        models.append({
+            'model': path,
+            'elo': float(ratings[i]),
+            'win_rate': float((outcome[i].sum() - 0.5 * matches) / (matches * (num_models - 1))),
+            'mean_score': float(scores[i].mean()),
+            'score_p50': float(np.percentile(scores[i], 50)),
+            'score_p90': float(np.percentile(scores[i], 90)),
+            'max_score': float(scores[i].max()),
+            'min_score': float(scores[i].min())
+        })
+    
+    order = np.argsort(-ratings, kind='stable')
+    ranked = [models[i] for i in order]
+    for rank, model in enumerate(ranked, 1):
+        model['rank'] = rank
+    
+    return ranked, {
+        paths[i]: {paths[j]: float(head_to_head[i, j]) for j in range(num_models) if j != i}
+        for i in range(num_models)
+    }
+
+
+def run_tournament(paths, matches=200, seed=0, workers=None, max_steps=10000, frame_skip=1,
+                   output='tournament_results.json'):
+    """让paths中的模型在matches个相同种子的赛道上对战，返回排名并写入output"""
+    if len(paths) < 2:
+        raise ValueError("对战至少需要两个模型")
+    for path in paths:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"模型文件不存在: {path}")
+    
+    # 所有模型使用同一组回合种子
+    seeds = episode_seeds(seed, matches)
+    workers = workers or mp.cpu_count()
+    
+    # 每个模型的比赛按工作进程数分块：块越大批量环境越满，块数又足以让各进程负载均衡
+    chunk = max(1, -(-matches * len(paths) // (workers * 2)))
+    jobs = [
+        (model_index, start, path, seeds[start:start + chunk], max_steps, frame_skip)
+        for model_index, path in enumerate(paths)
+        for start in range(0, matches, chunk)
+    ]
+    
+    print(f"开始对战: {len(paths)} 个模型，每个模型 {matches} 局，工作进程数: {workers}")
+    start_time = time.time()
+    
+    scores = np.zeros((len(paths), matches))
+    total_steps = 0
+    with mp.get_context().Pool(workers) as pool:
+        for model_index, start, job_scores, steps in pool.imap_unordered(_play_job, jobs):
+            scores[model_index, start:start + len(job_scores)] = job_scores
+            total_steps += steps
+    
+    elapsed = time.time() - start_time
+    ranked, head_to_head = rank_models(paths, scores)
+    
+    results = {
+        'matches': matches,
+        'seed': seed,
+        'frame_skip': frame_skip,
+        'workers': workers,
+        'seconds': elapsed,
+        'steps_per_second': total_steps / elapsed if elapsed > 0 else 0,
+        'models': ranked,
+        'head_to_head': head_to_head
+    }
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    
+    print("=" * 50)
+    print(f"对战完成，耗时 {elapsed:.2f}秒（{results['steps_per_second']:,.0f} 步/秒）")
+    print(f"{'排名':>4} {'Elo':>8} {'胜率':>7} {'平均分':>8} {'P50':>8} {'P90':>8}  模型")
+    for model in ranked:
+        print(f"{model['rank']:>4} {model['elo']:>8.1f} {model['win_rate']:>7.1%} {model['mean_score']:>8.1f} "
+              f"{model['score_p50']:>8.1f} {model['score_p90']:>8.1f}  {model['model']}")
+    print(f"结果已保存到 {output}")
+    
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='模型检查点无界面对战')
+    parser.add_argument('models', nargs='+', help='参赛的模型文件')
+    parser.add_argument('--matches', type=int, default=200,
+                       help='每个模型比赛的局数')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None,
+                       help='工作进程数（默认CPU核数）')
+    parser.add_argument('--frame-skip', type=int, default=1)
+    parser.add_argument('--output', default='tournament_results.json')
+    args = parser.parse_args()
+    
+    run_tournament(args.models, matches=args.matches, seed=args.seed, workers=args.workers,
+                   frame_skip=args.frame_skip, output=args.output)
@@ -8,23 +8,97 @@ import sys
 import os
 import argparse
 import json
+import time
 from dino_ai_trainer import DinoTrainer
+from parallel_trainer import ParallelTrainer
+import benchmark
+import sweep
+from profiling import PhaseProfiler, run_cprofile
+import tournament
 
 def main():
     parser = argparse.ArgumentParser(description='AI Dino Arena 训练脚本')
-    parser.add_argument('--mode', choices=['train', 'test', 'demo'], default='train',
-                       help='运行模式: train(训练), test(测试), demo(演示)')
+    parser.add_argument('--mode', choices=['train', 'test', 'demo', 'bench', 'sweep', 'tournament'], default='train',
+                       help='运行模式: train(训练), test(测试), demo(演示), bench(性能基准测试), '
+                            'sweep(超参数搜索), tournament(模型对战)')
     parser.add_argument('--episodes', type=int, default=1000,
                        help='训练或测试的回合数')
     parser.add_argument('--load', action='store_true',
                        help='加载已有模型')
     parser.add_argument('--save-interval', type=int, default=100,
                        help='模型保存间隔')
+    parser.add_argument('--agent', choices=DinoTrainer.AGENT_TYPES, default='q_table',
+                       help='智能体类型: q_table(表格Q学习), dqn(NumPy多层感知机)')
+    parser.add_argument('--seed', type=int, default=None,
+                       help='运行种子（环境、智能体和工作进程的随机数均由它派生）')
+    parser.add_argument('--frame-skip', type=int, default=1,
+                       help='每次决策重复动作推进的帧数')
+    parser.add_argument('--num-envs', type=int, default=1,
+                       help='批量训练时并行推进的游戏数（大于1时使用BatchDinoEnvironment）')
+    parser.add_argument('--workers', type=int, default=1,
+                       help='并行训练的工作进程数（大于1时启用多进程训练）')
+    parser.add_argument('--replay-batch', type=int, default=0,
+                       help='经验回放小批量大小（0表示不使用经验回放）')
+    parser.add_argument('--replay-interval', type=int, default=4,
+                       help='每隔多少步做一次经验回放')
+    parser.add_argument('--prioritized', action='store_true',
+                       help='使用按TD误差的优先级经验回放')
+    parser.add_argument('--curriculum', action='store_true',
+                       help='课程训练：回合从更高分数或中局快照开始，并按最近回合长度自适应截断')
+    parser.add_argument('--n-step', type=int, default=1,
+                       help='n步Q学习的步数（1为一步更新，只支持 q_table 单环境训练）')
+    parser.add_argument('--trace-lambda', type=float, default=0.0,
+                       help='Q(λ)的λ，大于0时使用λ回报代替n步回报')
+    parser.add_argument('--trace-interval', type=int, default=0,
+                       help='多步更新的间隔步数（0表示只在回合结束时更新）')
+    parser.add_argument('--profile', action='store_true',
+                       help='统计训练循环各阶段的耗时和调用次数，结束时打印汇总表')
+    parser.add_argument('--profile-output', default=None,
+                       help='在cProfile下运行训练并把pstats统计写入该文件（可转换为火焰图）')
+    parser.add_argument('--telemetry-log', default=None,
+                       help='训练回合明细的JSONL日志文件（默认不记录）')
+    parser.add_argument('--search', choices=['grid', 'random'], default='grid',
+                       help='超参数搜索方式')
+    parser.add_argument('--trials', type=int, default=20,
+                       help='随机搜索的配置数')
+    parser.add_argument('--sweep-output', default='sweep_results.json',
+                       help='超参数搜索结果JSON文件')
+    parser.add_argument('--models', nargs='+', default=None,
+                       help='对战模式下参赛的模型文件（每个模型比赛的局数由--episodes指定）')
+    parser.add_argument('--tournament-output', default='tournament_results.json',
+                       help='对战结果JSON文件')
+    parser.add_argument('--scale', choices=sorted(benchmark.SCALES), default='small',
+                       help='基准测试规模')
+    parser.add_argument('--bench-output', default='bench_results.json',
+                       help='基准测试结果JSON文件')
+    parser.add_argument('--baseline',
+                       help='用于比较的基准测试结果JSON文件')
+    parser.add_argument('--tolerance', type=float, default=benchmark.DEFAULT_TOLERANCE,
+                       help='吞吐量低于基线超过该比例时视为性能回退')
+    parser.add_argument('--convergence', action='store_true',
+                       help='基准测试同时比较一步Q学习、n步回报和Q(λ)的收敛速度')
     
     args = parser.parse_args()
+    if args.mode == 'train' and args.workers > 1 and args.agent != 'q_table':
+        parser.error('--workers 多进程训练只支持 q_table 智能体')
+    if args.curriculum and (args.workers > 1 or args.num_envs > 1):
+        parser.error('--curriculum 只支持单环境训练')
+    if args.n_step > 1 or args.trace_lambda > 0:
+        if args.agent != 'q_table' or args.workers > 1 or args.num_envs > 1:
+            parser.error('--n-step 和 --trace-lambda 只支持 q_table 智能体的单环境训练')
+    if (args.profile or args.profile_output) and args.workers > 1:
+        parser.error('--profile 只支持单进程训练')
+    if args.mode == 'tournament' and (not args.models or len(args.models) < 2):
+        parser.error('对战模式需要用 --models 指定至少两个模型文件')
+    if args.mode == 'sweep' and args.agent != 'q_table':
+        parser.error('超参数搜索只支持 q_table 智能体')
     
     # 创建训练器
-    trainer = DinoTrainer()
+    trainer = DinoTrainer(replay_batch_size=args.replay_batch, replay_interval=args.replay_interval,
+                          prioritized_replay=args.prioritized, agent_type=args.agent, seed=args.seed,
+                          frame_skip=args.frame_skip, telemetry_log=args.telemetry_log,
+                          curriculum=args.curriculum, n_step=args.n_step, trace_lambda=args.trace_lambda,
+                          trace_interval=args.trace_interval)
     
     print("=" * 50)
     print("AI Dino Arena - 强化学习训练系统")
@@ -39,7 +113,29 @@ def main():
         else:
             print("开始新的训练...")
         
-        trainer.train(episodes=args.episodes, save_interval=args.save_interval)
+        def run_training():
+            if args.workers > 1:
+                ParallelTrainer(trainer, workers=args.workers, seed=args.seed).train(
+                    episodes=args.episodes, save_interval=args.save_interval)
+            elif args.num_envs > 1:
+                trainer.train_batch(episodes=args.episodes, save_interval=args.save_interval,
+                                    num_envs=args.num_envs)
+            else:
+                trainer.train(episodes=args.episodes, save_interval=args.save_interval)
+        
+        # 性能剖析只在指定参数时启用，未启用时训练循环不受影响
+        profiler = PhaseProfiler().instrument_trainer(trainer) if args.profile else None
+        start_time = time.time()
+        
+        if args.profile_output:
+            run_cprofile(run_training, args.profile_output)
+        else:
+            run_training()
+        
+        if profiler is not None:
+            print("=" * 50)
+            print("训练各阶段耗时:")
+            profiler.report(time.time() - start_time)
         
     elif args.mode == 'test':
         print(f"开始测试模式，测试回合数: {args.episodes}")
@@ -48,17 +144,12 @@ def main():
             print("错误: 未找到训练好的模型文件")
             sys.exit(1)
         
-        scores = trainer.test(episodes=args.episodes)
-        
-        # 保存测试结果
-        test_results = {
-            'episodes': args.episodes,
-            'scores': scores,
-            'average_score': sum(scores) / len(scores),
-            'max_score': max(scores),
-            'min_score': min(scores)
-        }
+        test_results = trainer.test(episodes=args.episodes,
+                                    seed=args.seed if args.seed is not None else 0,
+                                    num_envs=args.num_envs if args.num_envs > 1 else 256,
+                                    workers=args.workers)
         
+        # 保存测试结果（完整分数分布、置信区间和吞吐量）
         with open('test_results.json', 'w') as f:
             json.dump(test_results, f, indent=2)
         
@@ -95,6 +186,30 @@ def main():
             step += 1
         
         print(f"演示结束！最终分数: {trainer.env.score:.1f}")
+        
+    elif args.mode == 'bench':
+        print("性能基准测试模式")
+        
+        if not benchmark.main(scale=args.scale, output=args.bench_output,
+                              baseline_path=args.baseline, tolerance=args.tolerance,
+                              convergence=args.convergence):
+            sys.exit(1)
+        
+    elif args.mode == 'sweep':
+        print("超参数搜索模式")
+        
+        # 未指定--workers时使用全部CPU核
+        sweep.sweep(search=args.search, trials=args.trials, episodes=args.episodes,
+                    workers=args.workers if args.workers > 1 else None, seed=args.seed,
+                    frame_skip=args.frame_skip, output=args.sweep_output)
+        
+    elif args.mode == 'tournament':
+        print("模型对战模式")
+        
+        tournament.run_tournament(args.models, matches=args.episodes,
+                                  seed=args.seed if args.seed is not None else 0,
+                                  workers=args.workers if args.workers > 1 else None,
+                                  frame_skip=args.frame_skip, output=args.tournament_output)
 
 if __name__ == "__main__":
     main()
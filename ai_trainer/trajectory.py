@@ -0,0 +1,108 @@
+"""
+AI Dino Arena - 多步回报
+n步Q学习和Q(λ)的轨迹缓冲区：每步只把 (状态编码, 动作, 奖励) 写入预分配的数组，
+按间隔或在回合结束时用向量化的折扣求和一次算出整段轨迹的目标值
+"""
+
+import math
+
+import numpy as np
+
+
+def discounted_sums(values, discount, tail=0.0):
+    """反向折扣累加：G[t] = values[t] + discount * G[t+1]，G[len(values)] = tail
+    
+    分块计算：块内用按discount的幂缩放的累加和，块间传递进位，块长保证幂次不会下溢。
+    """
+    values = np.asarray(values, dtype=np.float64)
+    result = np.empty_like(values)
+    if discount <= 0:
+        result[:] = values
+        if len(values):
+            result[-1] += discount * tail
+        return result
+    
+    block = 256 if discount >= 0.1 else max(1, int(200 / -math.log10(discount)))
+    powers = discount ** np.arange(block + 1)
+    
+    carry = tail
+    for end in range(len(values), 0, -block):
+        start = max(0, end - block)
+        count = end - start
+        weights = powers[:count]
+        sums = np.cumsum((values[start:end] * weights)[::-1])[::-1] / weights
+        # 块内第t项还要加上 discount^(end-t) * carry
+        sums += carry * powers[count:0:-1]
+        result[start:end] = sums
+        carry = sums[0]
+    
+    return result
+
+
+class Trajectory:
+    """单局训练的轨迹缓冲区（列式存储，容量不足时翻倍）
+    
+    codes比其余列多一项：codes[length]是最后一步之后的状态编码，用于自举。
+    """
+    
+    __slots__ = ('codes', 'actions', 'rewards', 'length')
+    
+    def __init__(self, capacity=1024):
+        self.codes = np.zeros(capacity + 1, dtype=np.int64)
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity)
+        self.length = 0
+    
+    def __len__(self):
+        return self.length
+    
+    def add(self, code, action, reward, next_code):
+        """追加一步经验"""
+        i = self.length
+        if i == len(self.actions):
+            self._grow()
+        self.codes[i] = code
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.codes[i + 1] = next_code
+        self.length = i + 1
+    
+    def _grow(self):
+        """容量翻倍"""
+        capacity = len(self.actions)
+        self.codes = np.concatenate([self.codes, np.zeros(capacity, dtype=np.int64)])
+        self.actions = np.concatenate([self.actions, np.zeros(capacity, dtype=np.int64)])
+        self.rewards = np.concatenate([self.rewards, np.zeros(capacity)])
+    
+    def keep_last(self, count):
+        """只保留最后count步（之前的经验已经更新过）"""
+        start = self.length - count
+        if count > 0 and start > 0:
+            self.codes[:count + 1] = self.codes[start:self.length + 1]
+            self.actions[:count] = self.actions[start:self.length]
+            self.rewards[:count] = self.rewards[start:self.length]
+        self.length = max(count, 0)
+    
+    def clear(self):
+        """清空缓冲区"""
+        self.length = 0
+
+
+def n_step_targets(rewards, bootstrap, gamma, n, tail):
+    """n步回报：G[t] = Σ_{i<n} γ^i r[t+i] + γ^n bootstrap[t+n]
+    
+    bootstrap[k]为第k步之前状态的自举值（长度为len(rewards)+1）；
+    窗口超出轨迹末尾时截断，末尾之后的回报由tail（终局为0，截断时为自举值）给出。
+    """
+    returns = discounted_sums(rewards, gamma, tail)
+    length = len(rewards)
+    if n < length:
+        gamma_n = gamma ** n
+        returns[:length - n] += gamma_n * (bootstrap[n:length] - returns[n:])
+    return returns
+
+
+def lambda_targets(rewards, bootstrap, gamma, trace_lambda, tail):
+    """λ回报：G[t] = r[t] + γ((1-λ) bootstrap[t+1] + λ G[t+1])，G[len] = tail"""
+    values = rewards + gamma * (1 - trace_lambda) * bootstrap[1:]
+    return discounted_sums(values, gamma * trace_lambda, tail)
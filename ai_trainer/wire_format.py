@@ -0,0 +1,89 @@
+"""
+AI Dino Arena - 二进制消息格式
+连接协商为二进制格式后，推理请求和响应可以使用固定布局的二进制帧代替JSON：
+服务器直接把请求体解码为NumPy特征矩阵，不经过中间的字典对象
+
+帧格式（小端序）：
+    帧头 8字节: 消息类型(uint8) 保留(uint8) 状态数量N(uint16) 请求id(uint32)
+    请求体: N × 9 个float64，即与DinoEnvironment.get_state相同的9个归一化特征
+            （不用float32：离散化按分箱边界截断，float32舍入会让边界上的值落入相邻分箱）
+    响应体: N 个uint8，动作编号（0=none, 1=jump, 2=duck）
+"""
+
+import struct
+
+import numpy as np
+
+# 消息类型
+GET_ACTIONS = 0x01
+ACTIONS = 0x81
+
+STATE_SIZE = 9
+
+HEADER = struct.Struct('<BBHI')
+STATE_DTYPE = np.dtype('<f8')
+ACTION_DTYPE = np.dtype('u1')
+
+# 单帧最多携带的状态数量（受帧头中uint16的限制）
+MAX_STATES = 0xFFFF
+
+
+class WireFormatError(ValueError):
+    """二进制帧格式错误"""
+
+
+def describe():
+    """协商成功时告知客户端的帧格式说明"""
+    return {
+        'format': 'binary',
+        'header': HEADER.format,
+        'state_size': STATE_SIZE,
+        'state_dtype': STATE_DTYPE.str,
+        'action_dtype': ACTION_DTYPE.str,
+        'request_type': GET_ACTIONS,
+        'response_type': ACTIONS
+    }
+
+
+def encode_request(states, request_id=0):
+    """把 (N, 9) 特征矩阵编码为请求帧（客户端使用）"""
+    states = np.ascontiguousarray(states, dtype=STATE_DTYPE).reshape(-1, STATE_SIZE)
+    if len(states) > MAX_STATES:
+        raise WireFormatError(f"单帧最多 {MAX_STATES} 个状态")
+    return HEADER.pack(GET_ACTIONS, 0, len(states), request_id) + states.tobytes()
+
+
+def decode_request(frame):
+    """解码请求帧，返回 (请求id, (N, 9) float64特征矩阵)
+    
+    特征矩阵是帧数据上的只读视图，不复制。
+    """
+    if len(frame) < HEADER.size:
+        raise WireFormatError(f"帧长度不足: {len(frame)} 字节")
+    
+    kind, _, count, request_id = HEADER.unpack_from(frame)
+    if kind != GET_ACTIONS:
+        raise WireFormatError(f"未知的消息类型: {kind:#04x}")
+    if len(frame) != HEADER.size + count * STATE_SIZE * STATE_DTYPE.itemsize:
+        raise WireFormatError(f"帧长度 {len(frame)} 与状态数量 {count} 不一致")
+    
+    states = np.frombuffer(frame, dtype=STATE_DTYPE, count=count * STATE_SIZE, offset=HEADER.size)
+    return request_id, states.reshape(count, STATE_SIZE)
+
+
+def encode_response(request_id, actions):
+    """把动作编号数组编码为响应帧"""
+    actions = np.asarray(actions, dtype=ACTION_DTYPE)
+    return HEADER.pack(ACTIONS, 0, len(actions), request_id) + actions.tobytes()
+
+
+def decode_response(frame):
+    """解码响应帧，返回 (请求id, 动作编号数组)（客户端使用）"""
+    if len(frame) < HEADER.size:
+        raise WireFormatError(f"帧长度不足: {len(frame)} 字节")
+    
+    kind, _, count, request_id = HEADER.unpack_from(frame)
+    if kind != ACTIONS or len(frame) != HEADER.size + count:
+        raise WireFormatError("无效的响应帧")
+    
+    return request_id, np.frombuffer(frame, dtype=ACTION_DTYPE, count=count, offset=HEADER.size)
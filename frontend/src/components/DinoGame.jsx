@@ -461,6 +461,7 @@ const DinoGame = ({ mode = 'player', onScoreUpdate, onGameStateChange }) => {
             dino: {
               x: game.dino.x,
               y: game.dino.y,
+              velocityY: game.dino.velocityY,
               isJumping: game.dino.isJumping,
               isDucking: game.dino.isDucking
             },